@@ -3,13 +3,31 @@ import os
 import json
 import tempfile
 import subprocess
+import threading
+import time
 from datetime import datetime
 import warnings
 
+from utils.capabilities import get_capabilities
+from utils.glossary import get_glossary_engine, load_glossary, save_glossary
+from utils.language_id import SPEECH_RECOGNITION_CODES, detect_language, get_cached_language
+from utils.model_selector import WHISPER_MODELS, log_selection, record_rtf, select_model
+from utils.openai_client import OpenAIError, get_openai_client
+from utils.response_cache import ResponseCache, make_cache_key, record_usage, get_usage_summary
+from transcribers.daemon import get_daemon_stats
+from transcribers.registry import TRANSCRIBERS, DEFAULT_TRANSCRIBER, available_transcribers, \
+    get_transcriber, get_transcriber_class
+
 warnings.filterwarnings("ignore")
 
 AI_CONFIG_FILE = "config/ai_config.json"
 
+# Модель Whisper по умолчанию для всех путей транскрипции
+DEFAULT_WHISPER_MODEL = 'base'
+
+# Значение whisper_model, при котором модель подбирается под запись и железо
+AUTO_WHISPER_MODEL = 'auto'
+
 
 def load_ai_config():
     """Загружает конфигурацию AI"""
@@ -23,9 +41,28 @@ def load_ai_config():
     return {
         'openai_api_key': '',
         'openai_model': 'gpt-4o-mini',
-        'whisper_model': 'base',
+        'whisper_model': DEFAULT_WHISPER_MODEL,
+        'transcription_target_minutes': 15,
+        'transcription_backend': DEFAULT_TRANSCRIBER,
+        'transcription_threads': 0,
+        'transcription_workers': 1,
+        'transcription_daemon_url': '',
         'max_tokens': 150,
         'temperature': 0.7,
+        'cache_ttl_hours': 24,
+        'batch_max_input_tokens': 6000,
+        'batch_max_items': 10,
+        'batch_concurrency': 4,
+        'summary_threshold_tokens': 3000,
+        'early_generation_minutes': 0,
+        'speech_recognition_workers': 4,
+        'speech_recognition_endpoint': '',
+        'summary_chunk_tokens': 2500,
+        'openai_api_base': '',
+        'openai_timeout_s': 60,
+        'openai_max_retries': 4,
+        'openai_max_concurrency': 4,
+        'openai_part_minutes': 10,
         'authenticated': False,
         'last_updated': None
     }
@@ -57,19 +94,18 @@ def is_ai_configured():
     return config.get('authenticated', False) and config.get('openai_api_key', '')
 
 
-def test_openai_connection(api_key, model="gpt-4o-mini"):
+def test_openai_connection(api_key, model="gpt-4o-mini", api_base=None):
     """Тестирует подключение к OpenAI"""
     try:
-        import openai
-        openai.api_key = api_key
-
-        response = openai.ChatCompletion.create(
+        client = get_openai_client({**get_ai_config(), 'openai_api_base': api_base}, api_key=api_key)
+        response = client.chat(
             model=model,
             messages=[{"role": "user", "content": "Тест"}],
-            max_tokens=10
+            max_tokens=10,
+            timeout=20
         )
 
-        return bool(response and response.choices)
+        return bool(response and response.get('choices'))
     except Exception as e:
         print(f"Ошибка подключения к OpenAI: {e}")
         return False
@@ -77,105 +113,64 @@ def test_openai_connection(api_key, model="gpt-4o-mini"):
 
 def fix_common_transcription_errors(text):
     """Исправляет типичные ошибки транскрипции для смешанной речи"""
-    import re
-
-    # Словарь замен для частых ошибок
-    replacements = {
-        # Социальные сети
-        'ютуб': 'YouTube',
-        'ютьюб': 'YouTube',
-        'ю-туб': 'YouTube',
-        'тикток': 'TikTok',
-        'тик-ток': 'TikTok',
-        'инстаграм': 'Instagram',
-        'инста': 'Instagram',
-
-        # Технические термины
-        'апи': 'API',
-        'эйпиай': 'API',
-        'юай': 'UI',
-        'юикс': 'UX',
-        'апдейт': 'update',
-        'аплоад': 'upload',
-        'даунлоад': 'download',
-        'стрим': 'stream',
-        'контент': 'content',
-        'браузер': 'browser',
-        'юзер': 'user',
-        'юзеры': 'users',
-
-        # Частые английские слова
-        'окей': 'okay',
-        'оке': 'OK',
-        'плиз': 'please',
-        'сори': 'sorry',
-        'хай': 'hi',
-        'бай': 'bye',
-
-        # Исправление слитного написания
-        'видеона': 'видео на',
-        'этовидео': 'это видео',
-        'навидео': 'на видео',
-
-        'хардскилл': 'hardskill',
-        'лид': 'lead',
-        'дев': 'dev',
-        'арты': 'arts',
-        'юайка': 'UI',
-    }
+    return get_glossary_engine().apply(text)
 
-    # Применяем замены (с учетом регистра)
-    for wrong, correct in replacements.items():
-        # Заменяем с учетом границ слова
-        pattern = r'\b' + re.escape(wrong) + r'\b'
-        text = re.sub(pattern, correct, text, flags=re.IGNORECASE)
 
-    # Дополнительные исправления
-    # Убираем лишние пробелы
-    text = re.sub(r'\s+', ' ', text)
+def check_transcription_methods():
+    """Проверяет доступные методы транскрипции (по кэшу фоновой проверки окружения)"""
+    capabilities = get_capabilities(wait=False)
+    if capabilities is None:
+        with st.spinner("Проверяем окружение..."):
+            capabilities = get_capabilities(wait=True)
 
-    # Исправляем пунктуацию вокруг английских слов
-    text = re.sub(r'\s+([.,!?])', r'\1', text)
+    methods = dict(capabilities['methods'])
 
-    return text.strip()
+    # OpenAI API зависит от настроек, а не от окружения
+    methods['openai_api'] = is_ai_configured()
 
+    return methods
 
-def check_transcription_methods():
-    """Проверяет доступные методы транскрипции"""
-    methods = {}
 
-    # Проверяем Whisper
-    try:
-        import whisper
-        methods['whisper'] = True
-    except ImportError:
-        methods['whisper'] = False
+DEFAULT_TRANSCRIPTION_LANGUAGE = 'ru'
 
-    # Проверяем Speech Recognition
-    try:
-        import speech_recognition
-        methods['speech_recognition'] = True
-    except ImportError:
-        methods['speech_recognition'] = False
+# Подсказки Whisper для сегментов: термины и стиль речи канала
+SEGMENT_PROMPTS = {
+    'ru': "Это продолжение видео на русском языке с техническими терминами.",
+    'en': "This is a continuation of an English video with technical terms.",
+}
 
-    # Проверяем FFmpeg
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        methods['ffmpeg'] = True
-    except:
-        methods['ffmpeg'] = False
 
-    # Проверяем MoviePy
-    try:
-        import moviepy
-        methods['moviepy'] = True
-    except ImportError:
-        methods['moviepy'] = False
+def load_transcriber(model_name):
+    """Движок транскрипции из настроек с уже загруженной моделью"""
+    config = get_ai_config()
+    backend = config.get('transcription_backend', DEFAULT_TRANSCRIBER)
 
-    # OpenAI API
-    methods['openai_api'] = is_ai_configured()
+    # Сервер моделей держит одну копию модели на все сессии и процессы
+    daemon_url = config.get('transcription_daemon_url')
+    if daemon_url:
+        from transcribers.daemon import DaemonTranscriber
+        try:
+            transcriber = DaemonTranscriber(daemon_url, backend, model_name).load()
+            st.info(f"🎤 Whisper {model_name} ({backend}) на сервере моделей {daemon_url}")
+            return transcriber
+        except Exception as e:
+            st.warning(f"Сервер моделей недоступен ({e}), загружаем модель локально")
+
+    st.info(f"🎤 Загружаем модель Whisper {model_name} ({backend})...")
+    return get_transcriber(backend, model_name, config.get('transcription_threads', 0))
 
-    return methods
+
+def detect_transcription_language(audio, transcriber=None, client=None):
+    """
+    Определяет язык записи по нескольким окнам (один раз на файл, результат в кэше)
+    и запоминает его вместе с уверенностью для транскрипции. Возвращает код языка
+    """
+    detected = detect_language(audio, transcriber=transcriber, client=client)
+    st.session_state['last_transcription_language'] = detected
+    if detected:
+        st.info(f"🌐 Язык: {detected['language']} ({detected['confidence']:.0%})")
+        return detected['language']
+    return DEFAULT_TRANSCRIPTION_LANGUAGE
 
 
 def extract_audio_with_ffmpeg(video_path):
@@ -247,33 +242,30 @@ def extract_audio_simple(video_path):
         return None
 
 
-def transcribe_with_whisper(audio_path, model_name="medium"):
+def transcribe_with_whisper(audio_path, model_name=DEFAULT_WHISPER_MODEL):
     """Транскрипция через Whisper с исправлениями для Windows"""
     try:
-        import whisper
+        from utils.audio import as_decoded_audio
 
-        st.info(f"🎤 Загружаем модель Whisper {model_name}...")
+        # Загружаем модель выбранным движком (на CPU)
+        transcriber = load_transcriber(model_name)
 
-        # Загружаем модель (используем CPU для стабильности)
-        model = whisper.load_model(model_name)
+        audio = as_decoded_audio(audio_path).resampled(transcriber.SAMPLE_RATE)
+        language = detect_transcription_language(audio, transcriber=transcriber)
 
         st.info("📝 Начинаем транскрипцию...")
 
         # Транскрибируем с параметрами для лучшего качества
-        result = model.transcribe(
-            audio_path,
-            language='ru',  # Явно указываем русский язык
-            task='transcribe',  # transcribe, а не translate
-            fp16=False,  # Отключаем FP16 для CPU
-            verbose=False,  # Убираем verbose для получения всех сегментов
+        result = transcriber.transcribe(
+            audio.float32(),
+            language=language,  # Язык определен заранее, повторно модель его не ищет
             # Дополнительные параметры для качества
-            temperature=0.0,  # Меньше креативности, больше точности
             compression_ratio_threshold=2.4,
             logprob_threshold=-1.0,
             no_speech_threshold=0.6,
             condition_on_previous_text=True,  # Учитывать контекст
             # Подсказка для смешанной речи
-            initial_prompt="Это видео на русском языке с английскими техническими терминами. English words: YouTube, TikTok, Instagram, upload, video, stream, content, API, browser, UI, UX, hardskill."
+            initial_prompt="Это видео на русском языке с английскими техническими терминами. English words: YouTube, TikTok, Instagram, upload, video, stream, content, API, browser, UI, UX, hardskill." if language == 'ru' else None
         )
 
         # Получаем все сегменты для проверки
@@ -324,90 +316,175 @@ def transcribe_with_whisper(audio_path, model_name="medium"):
         print(f"error: {e}")
 
 
-def transcribe_with_whisper_segments(audio_path, model_name="medium"):
-    """Альтернативный метод транскрипции Whisper по сегментам для избежания пропусков"""
-    try:
-        import whisper
-        from pydub import AudioSegment
-
-        st.info(f"🎤 Загружаем модель Whisper {model_name}...")
-        model = whisper.load_model(model_name)
-
-        # Загружаем аудио
-        audio = AudioSegment.from_wav(audio_path)
-
-        # Разбиваем на сегменты по 30 секунд с перекрытием
-        segment_length_ms = 20000    # 20 секунд
-        overlap_ms = 10000   # 10 секунд перекрытия
-
-        segments = []
-        for start_ms in range(0, len(audio), segment_length_ms - overlap_ms):
-            end_ms = min(start_ms + segment_length_ms, len(audio))
-            segment = audio[start_ms:end_ms]
-            segments.append((start_ms, end_ms, segment))
-
-        st.info(f"📝 Обрабатываем {len(segments)} сегментов...")
-        progress_bar = st.progress(0)
-
-        all_transcriptions = []
-
-        for i, (start_ms, end_ms, segment) in enumerate(segments):
-            progress_bar.progress((i + 1) / len(segments))
-
-            # Сохраняем временный файл
-            temp_path = f"temp_segment_{i}.wav"
-            segment.export(temp_path, format="wav")
+def strip_segment_overlap(previous_text, text):
+    """Убирает из начала сегмента слова, повторяющие конец предыдущего (сегменты перекрываются)"""
+    if not previous_text:
+        return text
 
-            try:
-                # Транскрибируем сегмент
-                result = model.transcribe(
-                    temp_path,
-                    language='ru',
-                    task='transcribe',
-                    fp16=False,
-                    temperature=0.0,
-                    initial_prompt="Это продолжение видео на русском языке с техническими терминами."
-                )
-
-                if result and result['text'].strip():
-                    all_transcriptions.append({
-                        'start': start_ms / 1000,
-                        'end': end_ms / 1000,
-                        'text': result['text'].strip()
-                    })
-
-            finally:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+    # Берем последние слова предыдущего сегмента
+    prev_words = previous_text.split()[-10:]
+    curr_words = text.split()[:10]
+
+    # Ищем перекрытие
+    overlap_idx = 0
+    for j in range(min(len(prev_words), len(curr_words))):
+        if prev_words[-j - 1:] == curr_words[:j + 1]:
+            overlap_idx = j + 1
+
+    # Убираем перекрывающуюся часть
+    if overlap_idx > 0:
+        text = ' '.join(text.split()[overlap_idx:])
+    return text
+
+
+# Whisper по сегментам: длина окна и перекрытие соседних окон
+WHISPER_SEGMENT_MS = 20000
+WHISPER_OVERLAP_MS = 10000
+
+# Дополнительные параметры декодирования сегментов (temperature, beam_size и т.п.),
+# по умолчанию - параметры движка
+WHISPER_DECODE_OPTIONS = {}
+
+
+def iter_whisper_segments(audio, model_name=DEFAULT_WHISPER_MODEL):
+    """
+    Транскрибирует аудио кусками по WHISPER_SEGMENT_MS и отдает сегменты по мере готовности:
+    {'index', 'total', 'start', 'end', 'text'}. Текст уже без перекрытия с предыдущим сегментом
+    и может быть пустым, если в куске нет речи. audio - DecodedAudio или путь к файлу.
+    Файл декодируется потоком: ffmpeg читает следующие секунды, пока модель распознает
+    текущие, и в памяти только ограниченный буфер, а не вся запись.
+    Каждый сегмент сразу пишется в чекпоинт: после падения повторный запуск
+    продолжает с последнего готового сегмента
+    """
+    import numpy as np
+    from utils.audio import DecodedAudio, PCMStream, decode_window, file_fingerprint, probe_duration
+    from utils.language_id import DETECTION_WINDOW_S, sample_windows
+    from utils.transcript_checkpoint import TranscriptCheckpoint, cleanup_checkpoints
+
+    transcriber = load_transcriber(model_name)
+    sample_rate = transcriber.SAMPLE_RATE
+
+    if isinstance(audio, DecodedAudio):
+        # Движок принимает массив 16 кГц напрямую - без временных файлов и ffmpeg
+        audio = audio.resampled(sample_rate)
+        duration_s = audio.duration_s
+        probe = audio
+    else:
+        duration_s = probe_duration(audio)
+        if duration_s is None:
+            raise RuntimeError("Не удалось определить длительность записи")
+        # Для определения языка декодируем только окна, которые слушает детектор
+        probe = DecodedAudio.from_windows(
+            [decode_window(audio, start_s, DETECTION_WINDOW_S, sample_rate) for start_s in sample_windows(duration_s)],
+            sample_rate, audio, fingerprint=file_fingerprint(audio))
+    language = detect_transcription_language(probe, transcriber=transcriber)
+    duration_ms = int(duration_s * 1000)
+
+    # Разбиваем на сегменты с перекрытием
+    segment_length_ms = WHISPER_SEGMENT_MS
+    overlap_ms = WHISPER_OVERLAP_MS
+
+    segments = []
+    for start_ms in range(0, duration_ms, segment_length_ms - overlap_ms):
+        end_ms = min(start_ms + segment_length_ms, duration_ms)
+        segments.append((start_ms, end_ms))
+
+    cleanup_checkpoints()
+    checkpoint = TranscriptCheckpoint(probe.fingerprint(), {
+        'backend': get_ai_config().get('transcription_backend', DEFAULT_TRANSCRIBER),
+        'model': model_name,
+        'language': language,
+        'segment_length_ms': segment_length_ms,
+        'overlap_ms': overlap_ms,
+        'options': WHISPER_DECODE_OPTIONS,
+    })
+    done = checkpoint.load()
+
+    previous_text = None
+    if done:
+        st.info(f"♻️ Продолжаем с {done[-1]['end'] / 60:.1f} мин: {len(done)} из {len(segments)} сегментов уже готовы")
+        for segment in done:
+            if segment['text']:
+                previous_text = segment['text']
+            yield segment
+
+    st.info(f"📝 Обрабатываем {len(segments) - len(done)} сегментов...")
+
+    if len(done) >= len(segments):
+        windows = iter(())
+    elif isinstance(audio, DecodedAudio):
+        windows = ((start_ms / 1000, end_ms / 1000,
+                    audio.samples[start_ms * sample_rate // 1000:end_ms * sample_rate // 1000])
+                   for start_ms, end_ms in segments[len(done):])
+    else:
+        # После перезапуска ffmpeg сразу перематывает к первому неготовому сегменту
+        stream = PCMStream(audio, sample_rate, start_s=segments[len(done)][0] / 1000)
+        windows = ((start_s, start_s + len(window) / sample_rate, window)
+                   for start_s, window in stream.windows(segment_length_ms / 1000,
+                                                         (segment_length_ms - overlap_ms) / 1000))
+
+    # Для автовыбора модели: сколько записи распознано и сколько на это ушло
+    first_start_s = None
+    inference_s = 0.0
+
+    for i, (start_s, end_s, window) in enumerate(windows, start=len(done)):
+        # Транскрибируем сегмент (в float32 переводим только текущее окно)
+        started = time.perf_counter()
+        result = transcriber.transcribe(window.astype(np.float32) / 32768.0, language=language,
+                                        initial_prompt=SEGMENT_PROMPTS.get(language), **WHISPER_DECODE_OPTIONS)
+        inference_s += time.perf_counter() - started
+        first_start_s = start_s if first_start_s is None else first_start_s
+
+        # Словарь применяем сразу к сегменту, а не ко всему тексту в конце
+        text = fix_common_transcription_errors(result['text']) if result else ''
+        if text:
+            text = strip_segment_overlap(previous_text, text)
+            previous_text = text
+
+        # Длительность из заголовка бывает неточной, поэтому total не меньше номера сегмента
+        entry = {'index': i, 'total': max(len(segments), i + 1), 'start': start_s, 'end': end_s, 'text': text}
+        checkpoint.append(entry)
+        yield entry
+
+    checkpoint.remove()
+
+    # У сервера моделей во время входит ожидание в общей очереди - такой замер не показателен
+    if first_start_s is not None and transcriber.name != 'daemon':
+        config = get_ai_config()
+        record_rtf(config.get('transcription_backend', DEFAULT_TRANSCRIBER), model_name,
+                   config.get('transcription_threads', 0) or os.cpu_count() or 1,
+                   end_s - first_start_s, inference_s)
 
-        progress_bar.empty()
 
-        # Объединяем транскрипции, убирая дубликаты из перекрытий
-        final_text = []
-        for i, trans in enumerate(all_transcriptions):
-            text = trans['text']
+def transcribe_with_whisper_segments(audio, model_name=DEFAULT_WHISPER_MODEL, on_segment=None):
+    """
+    Альтернативный метод транскрипции Whisper по сегментам для избежания пропусков.
+    on_segment(segment) вызывается для каждого готового непустого сегмента
+    """
+    try:
+        progress_bar = None
+        transcribed = []
 
-            # Если это не первый сегмент, пытаемся убрать дубликаты
-            if i > 0 and final_text:
-                # Берем последние слова предыдущего сегмента
-                prev_words = final_text[-1].split()[-10:]
-                curr_words = text.split()[:10]
+        for segment in iter_whisper_segments(audio, model_name):
+            if progress_bar is None:
+                progress_bar = st.progress(0)
+            progress_bar.progress((segment['index'] + 1) / segment['total'])
 
-                # Ищем перекрытие
-                overlap_idx = 0
-                for j in range(min(len(prev_words), len(curr_words))):
-                    if prev_words[-j - 1:] == curr_words[:j + 1]:
-                        overlap_idx = j + 1
+            if segment['text']:
+                transcribed.append(segment)
+                if on_segment:
+                    on_segment(segment)
 
-                # Убираем перекрывающуюся часть
-                if overlap_idx > 0:
-                    text = ' '.join(text.split()[overlap_idx:])
+        if progress_bar is not None:
+            progress_bar.empty()
 
-            final_text.append(text)
+        # Сегменты уже обработаны словарем, остается только склеить
+        full_text = ' '.join(segment['text'] for segment in transcribed)
 
-        # Объединяем весь текст
-        full_text = ' '.join(final_text)
-        full_text = fix_common_transcription_errors(full_text)
+        # Версия с таймкодами нужна для пересказа длинных видео
+        st.session_state['last_transcription_segments'] = "\n".join(
+            f"[{segment['start']:.3f} --> {segment['end']:.3f}] {segment['text']}" for segment in transcribed
+        )
 
         return full_text
 
@@ -439,24 +516,74 @@ def transcribe_with_whisper_segments(audio_path, model_name="medium"):
         return None
 
 
-def transcribe_with_whisper_multilingual(audio_path, model_name="base"):
-    """Альтернативный метод - мультиязычная транскрипция"""
+# Запись короче этого транскрибируется в одном процессе даже при нескольких процессах в настройках
+SHARDED_MIN_MINUTES = 10
+
+# Запись длиннее этого Whisper читает потоком, не декодируя ее в память целиком
+STREAMING_MIN_MINUTES = 30
+
+
+def transcribe_with_whisper_sharded(audio, model_name=DEFAULT_WHISPER_MODEL, on_segment=None):
+    """
+    Транскрипция длинной записи в нескольких процессах: запись делится по тишине на шарды,
+    в каждом процессе своя модель. on_segment получает шарды по порядку по мере готовности
+    """
+    from transcribers.sharded import ShardedTranscriber
+
+    config = get_ai_config()
+    backend = config.get('transcription_backend', DEFAULT_TRANSCRIBER)
+    workers = config.get('transcription_workers', 1)
+
     try:
-        import whisper
-
-        model = whisper.load_model(model_name)
-
-        # Транскрибируем БЕЗ указания языка - пусть модель сама определит
-        result = model.transcribe(
-            audio_path,
-            task='transcribe',
-            fp16=False,
-            temperature=0.0,
-            # Не указываем язык!
-            # language='ru',
+        st.info(f"🎤 Загружаем модель Whisper {model_name} ({backend}) в {workers} процессах...")
+        with ShardedTranscriber(backend, model_name, workers, config.get('transcription_threads', 0)) as sharded:
+            audio = audio.resampled(sharded.SAMPLE_RATE)
+            language = detect_transcription_language(audio, transcriber=sharded)
+
+            progress_bar = st.progress(0)
+
+            def on_shard(shard, total):
+                progress_bar.progress((shard['index'] + 1) / total)
+                for segment in shard['segments']:
+                    text = fix_common_transcription_errors(segment['text'])
+                    if text and on_segment:
+                        on_segment({'index': shard['index'], 'total': total,
+                                    'start': segment['start'], 'end': segment['end'], 'text': text})
+
+            result = sharded.transcribe(audio, language=language, initial_prompt=SEGMENT_PROMPTS.get(language),
+                                        on_shard=on_shard)
+            progress_bar.empty()
+
+        slowest = max(shard['transcribe_s'] for shard in result['shards'])
+        record_rtf(backend, model_name, sharded.threads, audio.duration_s,
+                   sum(shard['transcribe_s'] for shard in result['shards']))
+        st.info(f"Обработано шардов: {len(result['shards'])}, самый долгий {slowest:.0f} с")
+
+        segments = [segment for segment in result['segments'] if segment['text'].strip()]
+        st.session_state['last_transcription_segments'] = "\n".join(
+            f"[{segment['start']:.3f} --> {segment['end']:.3f}] {fix_common_transcription_errors(segment['text'])}"
+            for segment in segments
         )
+        return fix_common_transcription_errors(result['text'])
+
+    except Exception as e:
+        st.error(f"Ошибка многопроцессной транскрипции: {e}")
+        return None
+
+
+def transcribe_with_whisper_multilingual(audio_path, model_name=DEFAULT_WHISPER_MODEL):
+    """Альтернативный метод - мультиязычная транскрипция"""
+    try:
+        from utils.audio import as_decoded_audio
+
+        transcriber = load_transcriber(model_name)
+
+        # Язык определяется один раз по нескольким окнам и фиксируется для всей записи
+        audio = as_decoded_audio(audio_path).resampled(transcriber.SAMPLE_RATE)
+        language = detect_transcription_language(audio, transcriber=transcriber)
+
+        result = transcriber.transcribe(audio.float32(), language=language)
 
-        # Модель сама определит язык для каждого сегмента
         text = result['text'].strip()
 
         # Применяем постобработку
@@ -469,132 +596,313 @@ def transcribe_with_whisper_multilingual(audio_path, model_name="base"):
         return None
 
 
-def transcribe_with_speech_recognition(audio_path):
-    """Транскрипция через Speech Recognition с поддержкой длинных аудио"""
+# Языки Speech Recognition в порядке проверки
+SPEECH_RECOGNITION_LANGUAGES = ('ru-RU', 'en-US')
+
+
+def make_speech_recognizer(endpoint=None):
+    """
+    Возвращает функцию recognize(audio_data, language) -> текст или None, если речь не распознана.
+    endpoint - URL локального распознавателя-заглушки вместо Google (для проверки и бенчмарков)
+    """
+    import speech_recognition as sr
+
+    if endpoint:
+        import requests
+
+        session = requests.Session()
+
+        def recognize_with_endpoint(audio_data, language):
+            response = session.post(endpoint, params={'lang': language}, data=audio_data.get_wav_data(),
+                                    headers={'Content-Type': 'audio/wav'}, timeout=60)
+            if response.status_code != 200:
+                raise sr.RequestError(f"HTTP {response.status_code}")
+            return response.json().get('transcript') or None
+
+        return recognize_with_endpoint
+
+    # Recognizer хранит настройки, поэтому у каждого потока свой экземпляр
+    local = threading.local()
+
+    def recognize_with_google(audio_data, language):
+        if not hasattr(local, 'recognizer'):
+            local.recognizer = sr.Recognizer()
+        try:
+            return local.recognizer.recognize_google(audio_data, language=language)
+        except sr.UnknownValueError:
+            return None
+
+    return recognize_with_google
+
+
+def transcribe_with_speech_recognition(audio, on_segment=None, recognize=None):
+    """
+    Транскрипция через Speech Recognition с поддержкой длинных аудио.
+    Части распознаются параллельно прямо из памяти, язык определяется один раз на файл
+    по первым частям. Порядок текста сохраняется; on_segment получает части по порядку.
+    audio - путь к файлу или DecodedAudio
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from utils.audio import as_decoded_audio
+
     try:
         import speech_recognition as sr
-        from pydub import AudioSegment
 
-        recognizer = sr.Recognizer()
+        config = get_ai_config()
+        if recognize is None:
+            recognize = make_speech_recognizer(config.get('speech_recognition_endpoint') or None)
 
-        # Загружаем аудио файл
-        audio = AudioSegment.from_wav(audio_path)
+        audio = as_decoded_audio(audio)
 
-        # Длина чанка в миллисекундах (15 секунд для надежности)
-        chunk_length_ms = 15000
+        # Длина чанка в секундах (15 секунд для надежности)
+        chunk_length_s = 15
         chunks = []
 
-        # Разбиваем аудио на части
-        for i in range(0, len(audio), chunk_length_ms):
-            chunk = audio[i:i + chunk_length_ms]
-            chunks.append(chunk)
+        # Разбиваем аудио на части без временных файлов
+        start_s = 0
+        while start_s < audio.duration_s:
+            end_s = min(start_s + chunk_length_s, audio.duration_s)
+            chunks.append({
+                'index': len(chunks),
+                'start': start_s,
+                'end': end_s,
+                'audio': sr.AudioData(audio.pcm_bytes(start_s, end_s), audio.sample_rate, 2)
+            })
+            start_s += chunk_length_s
+
+        if not chunks:
+            return ""
 
         # Прогресс бар для пользователя
         progress_text = st.empty()
         progress_bar = st.progress(0)
 
-        full_transcript = []
-
-        for i, chunk in enumerate(chunks):
-            progress_text.text(f"Обработка части {i + 1} из {len(chunks)}...")
-            progress_bar.progress((i + 1) / len(chunks))
-
-            # Экспортируем чанк во временный файл
-            chunk_filename = f"temp_chunk_{i}.wav"
-            chunk.export(chunk_filename, format="wav")
+        texts = [None] * len(chunks)
+        done = set()
+        errors = []
+        next_index = 0
 
+        def recognize_chunk(chunk, language):
             try:
-                with sr.AudioFile(chunk_filename) as source:
-                    audio_data = recognizer.record(source)
-
-                    try:
-                        # Пробуем распознать на русском
-                        text = recognizer.recognize_google(audio_data, language='ru-RU')
-                        full_transcript.append(text)
-                    except sr.UnknownValueError:
-                        # Если не удалось на русском, пробуем английский
-                        try:
-                            text = recognizer.recognize_google(audio_data, language='en-US')
-                            full_transcript.append(text)
-                        except sr.UnknownValueError:
-                            # Пропускаем непонятные части
-                            st.warning(f"Не удалось распознать часть {i + 1}")
-                    except sr.RequestError as e:
-                        st.error(f"Ошибка API: {e}")
-
-            finally:
-                # Удаляем временный файл
-                if os.path.exists(chunk_filename):
-                    os.remove(chunk_filename)
+                return recognize(chunk['audio'], language)
+            except sr.RequestError as e:
+                errors.append(f"часть {chunk['index'] + 1}: {e}")
+                return None
+
+        def collect(index, text):
+            nonlocal next_index
+            texts[index] = fix_common_transcription_errors(text) if text else None
+            done.add(index)
+            progress_text.text(f"Обработано частей: {len(done)} из {len(chunks)}")
+            progress_bar.progress(len(done) / len(chunks))
+            # Отдаем готовые части строго по порядку
+            while next_index < len(chunks) and next_index in done:
+                if texts[next_index] and on_segment:
+                    chunk = chunks[next_index]
+                    on_segment({'index': next_index, 'total': len(chunks), 'start': chunk['start'],
+                                'end': chunk['end'], 'text': texts[next_index]})
+                next_index += 1
+
+        workers = max(1, config.get('speech_recognition_workers', 4))
+        probes = chunks[:min(3, len(chunks))]
+        language = SPEECH_RECOGNITION_LANGUAGES[0]
+
+        # Если язык файла уже известен, пробуем только его
+        known = get_cached_language(audio.fingerprint())
+        candidates = SPEECH_RECOGNITION_LANGUAGES
+        if known and known['language'] in SPEECH_RECOGNITION_CODES:
+            candidates = (SPEECH_RECOGNITION_CODES[known['language']],)
+            st.session_state['last_transcription_language'] = known
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Определяем язык по первым частям; результаты удачной пробы идут в транскрипцию
+            probe_results = {}
+            for candidate in candidates:
+                results = list(executor.map(lambda chunk: recognize_chunk(chunk, candidate), probes))
+                if any(results):
+                    language = candidate
+                    probe_results = dict(zip((chunk['index'] for chunk in probes), results))
+                    break
+
+            if not known and probe_results:
+                # Доля распознанных проб - грубая оценка уверенности
+                st.session_state['last_transcription_language'] = {
+                    'language': language.split('-')[0],
+                    'confidence': sum(1 for text in probe_results.values() if text) / len(probes),
+                    'method': 'speech_recognition',
+                    'windows': len(probes)
+                }
+
+            print(f"Speech Recognition: язык {language}, частей {len(chunks)}, потоков {workers}")
+            for index, text in probe_results.items():
+                collect(index, text)
+
+            futures = {executor.submit(recognize_chunk, chunk, language): chunk['index']
+                       for chunk in chunks if chunk['index'] not in probe_results}
+            for future in as_completed(futures):
+                collect(futures[future], future.result())
 
         # Очищаем прогресс
         progress_text.empty()
         progress_bar.empty()
 
+        for error in errors[:5]:
+            st.error(f"Ошибка API: {error}")
+        missed = sum(1 for text in texts if not text)
+        if missed:
+            st.warning(f"Не удалось распознать частей: {missed} из {len(chunks)}")
+
+        # Версия с таймкодами нужна для пересказа длинных видео
+        st.session_state['last_transcription_segments'] = "\n".join(
+            f"[{chunk['start']:.3f} --> {chunk['end']:.3f}] {text}" for chunk, text in zip(chunks, texts) if text
+        )
+
         # Объединяем все части
-        return " ".join(full_transcript)
+        return " ".join(text for text in texts if text)
 
     except ImportError:
-        st.error("Установите pydub: pip install pydub")
+        st.error("Установите SpeechRecognition: pip install SpeechRecognition")
         return None
     except Exception as e:
         print(f"Ошибка Speech Recognition: {e}")
         return None
 
 
-def transcribe_with_openai_api(audio_path):
-    """Транскрипция через OpenAI API"""
+def transcribe_with_openai_api(audio, on_segment=None):
+    """
+    Транскрипция через OpenAI API. Аудио сжимается в Opus и делится по паузам на части
+    меньше лимита в 25 МБ; части распознаются параллельно и склеиваются по таймкодам.
+    audio - путь к файлу или DecodedAudio
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.audio import OPENAI_MAX_UPLOAD_BYTES, as_decoded_audio, plan_silence_splits
+
     try:
         if not is_ai_configured():
             return None
 
         config = get_ai_config()
-        api_key = config.get('openai_api_key')
-
-        import openai
-        openai.api_key = api_key
-
-        # Проверяем размер файла
-        if os.path.getsize(audio_path) > 25 * 1024 * 1024:
-            print("Файл слишком большой для OpenAI API")
-            return None
+        client = get_openai_client(config)
+        audio = as_decoded_audio(audio)
+        samples, sample_rate = audio.samples, audio.sample_rate
+        language = detect_transcription_language(audio, client=client)
+
+        # Части короче лимита еще и распознаются параллельно; если сжатие недоступно
+        # и часть все равно не влезает в лимит, делим мельче
+        part_s = config.get('openai_part_minutes', 10) * 60
+        while True:
+            parts = plan_silence_splits(samples, sample_rate, part_s)
+            with ThreadPoolExecutor(max_workers=config.get('openai_max_concurrency', 4)) as executor:
+                encoded = list(executor.map(lambda part: audio.compressed(*part), parts))
+            if max(len(data) for data, _ in encoded) <= OPENAI_MAX_UPLOAD_BYTES or part_s <= 60:
+                break
+            part_s /= 2
+
+        upload_bytes = sum(len(data) for data, _ in encoded)
+        print(f"OpenAI API: {len(parts)} частей, {samples.nbytes / 1024 / 1024:.1f} МБ PCM -> "
+              f"{upload_bytes / 1024 / 1024:.1f} МБ {encoded[0][1]}")
+
+        futures = [
+            client.submit(client.atranscribe(data, filename=f"part_{i}.{extension}", model="whisper-1",
+                                             language=language, response_format="verbose_json", timeout=600))
+            for i, (data, extension) in enumerate(encoded)
+        ]
 
-        with open(audio_path, 'rb') as audio_file:
-            transcript = openai.Audio.transcribe(
-                model="whisper-1",
-                file=audio_file,
-                language="ru"
-            )
+        # Склеиваем части по порядку, сдвигая таймкоды сегментов на начало части
+        segments = []
+        for (part_start, part_end), future in zip(parts, futures):
+            result = future.result()
+            offset = part_start / sample_rate
+            part_segments = result.get('segments') or [
+                {'start': 0.0, 'end': (part_end - part_start) / sample_rate, 'text': result.get('text', '')}
+            ]
+            for part_segment in part_segments:
+                text = fix_common_transcription_errors(part_segment.get('text', ''))
+                if not text:
+                    continue
+                segment = {'index': len(segments), 'start': offset + part_segment['start'],
+                           'end': offset + part_segment['end'], 'text': text}
+                segments.append(segment)
+                if on_segment:
+                    on_segment(segment)
+
+        st.session_state['last_transcription_segments'] = "\n".join(
+            f"[{segment['start']:.3f} --> {segment['end']:.3f}] {segment['text']}" for segment in segments
+        )
 
-        return transcript.text if hasattr(transcript, 'text') else str(transcript)
+        return " ".join(segment['text'] for segment in segments)
 
     except Exception as e:
         print(f"Ошибка OpenAI API: {e}")
         return None
 
 
-def transcribe_video_enhanced(video_path, model_name="medium"):
-    """Улучшенная транскрипция видео"""
+def decode_video_audio(video_path):
+    """Декодирует звуковую дорожку один раз; результат используют все методы транскрипции"""
+    from utils.audio import DecodedAudio
+
     try:
-        st.info("🎵 Извлекаем аудио из видео...")
+        # FFmpeg отдает PCM 16 кГц моно прямо в память, без промежуточного WAV
+        return DecodedAudio.from_file(video_path)
+    except Exception as e:
+        print(f"Не удалось декодировать аудио через FFmpeg: {e}")
 
-        # Сначала пробуем FFmpeg напрямую
-        audio_path = extract_audio_with_ffmpeg(video_path)
+    # Без FFmpeg извлекаем WAV старым способом и читаем его
+    audio_path = extract_audio_simple(video_path)
+    if not audio_path:
+        return None
+    try:
+        return DecodedAudio.from_file(audio_path)
+    finally:
+        # Удаляем временный файл
+        if os.path.exists(audio_path):
+            try:
+                os.remove(audio_path)
+            except:
+                pass
 
-        if not audio_path:
-            # Если не получилось, используем старый метод
-            audio_path = extract_audio_simple(video_path)
 
-        if not audio_path:
-            st.error("Не удалось извлечь аудио")
-            return None
+def resolve_whisper_model(model_name, duration_s):
+    """
+    Для whisper_model = 'auto' подбирает модель под длительность записи, число ядер,
+    свободную память и целевое время из настроек; причина выбора пишется в журнал
+    """
+    if model_name != AUTO_WHISPER_MODEL:
+        return model_name
+
+    config = get_ai_config()
+    daemon_url = config.get('transcription_daemon_url')
+    workers = config.get('transcription_workers', 1)
+    if daemon_url or duration_s < SHARDED_MIN_MINUTES * 60:
+        workers = 1
+
+    selection = select_model(
+        duration_s,
+        config.get('transcription_backend', DEFAULT_TRANSCRIBER),
+        config.get('transcription_target_minutes', 15) * 60,
+        workers=workers,
+        threads=config.get('transcription_threads', 0),
+        # Модель на сервере моделей не занимает память этого процесса
+        check_memory=not daemon_url,
+    )
+    log_selection(selection)
+    st.session_state['last_model_selection'] = selection
+    st.info(f"🧠 Модель выбрана автоматически - {selection['reason']}")
+    return selection['model']
 
-        # Проверяем размер файла
-        file_size_mb = os.path.getsize(audio_path) / (1024 * 1024)
-        st.info(f"Размер аудио: {file_size_mb:.1f} МБ")
+
+def transcribe_video_enhanced(video_path, model_name=DEFAULT_WHISPER_MODEL, on_segment=None):
+    """Улучшенная транскрипция видео. on_segment получает сегменты по мере готовности"""
+    from utils.audio import probe_duration
+
+    try:
+        st.info("🎵 Извлекаем аудио из видео...")
+        st.session_state['last_transcription_segments'] = None
+        st.session_state['last_transcription_language'] = None
 
         # Выбираем метод транскрипции
         transcript = None
+        audio = None
 
         # Проверяем настройки
         config = get_ai_config()
@@ -602,31 +910,54 @@ def transcribe_video_enhanced(video_path, model_name="medium"):
                                    value=True,
                                    help="Более надежно, но медленнее. Рекомендуется для длинных видео.")
 
+        sharded = config.get('transcription_workers', 1) > 1 and not config.get('transcription_daemon_url')
+        duration_s = probe_duration(video_path)
+
         # 1. Пробуем Whisper (лучшее качество)
-        if file_size_mb < 100:  # Whisper может обработать файлы до 100МБ
-            #if use_segments and file_size_mb > 5:  # Для файлов больше 5МБ используем сегменты
-             #  st.info("🎤 Используем Whisper с сегментацией...")
-              #  transcript = transcribe_with_whisper_segments(audio_path, model_name)
-            #else:
-                st.info("🎤 Используем Whisper для высокого качества...")
-                transcript = transcribe_with_whisper_segments(audio_path, model_name)
+        if duration_s and duration_s >= STREAMING_MIN_MINUTES * 60 and not sharded:
+            # Длинная запись: декодирование идет параллельно с распознаванием, память не растет
+            st.info(f"🎤 Используем Whisper, аудио читается потоком ({duration_s / 60:.1f} мин)...")
+            model_name = resolve_whisper_model(model_name, duration_s)
+            transcript = transcribe_with_whisper_segments(video_path, model_name, on_segment)
+        else:
+            audio = decode_video_audio(video_path)
+            if audio is None:
+                st.error("Не удалось извлечь аудио")
+                return None
+
+            # Размер несжатого аудио
+            file_size_mb = audio.nbytes / (1024 * 1024)
+            st.info(f"Размер аудио: {file_size_mb:.1f} МБ ({audio.duration_s / 60:.1f} мин)")
+            model_name = resolve_whisper_model(model_name, audio.duration_s)
+
+            # Длинные записи делим между процессами - у каждого шарда свой лимит памяти
+            if sharded and audio.duration_s >= SHARDED_MIN_MINUTES * 60:
+                st.info("🎤 Используем Whisper в нескольких процессах...")
+                transcript = transcribe_with_whisper_sharded(audio, model_name, on_segment)
+            elif file_size_mb < 100:  # Whisper может обработать файлы до 100МБ
+                #if use_segments and file_size_mb > 5:  # Для файлов больше 5МБ используем сегменты
+                 #  st.info("🎤 Используем Whisper с сегментацией...")
+                  #  transcript = transcribe_with_whisper_segments(audio_path, model_name)
+                #else:
+                    st.info("🎤 Используем Whisper для высокого качества...")
+                    transcript = transcribe_with_whisper_segments(audio, model_name, on_segment)
+
+        # Запасным методам нужна вся запись - декодируем ее, только если Whisper не справился
+        if not transcript and audio is None:
+            audio = decode_video_audio(video_path)
+            if audio is None:
+                st.error("Не удалось извлечь аудио")
+                return None
 
         # 2. Если Whisper не сработал, пробуем Speech Recognition
         if not transcript:
             st.info("🎤 Используем Speech Recognition...")
-            transcript = transcribe_with_speech_recognition(audio_path)
+            transcript = transcribe_with_speech_recognition(audio, on_segment)
 
-        # 3. Если есть OpenAI API и файл небольшой
-        if not transcript and is_ai_configured() and file_size_mb < 25:
+        # 3. Если есть OpenAI API (большие файлы делятся на части)
+        if not transcript and is_ai_configured():
             st.info("🎤 Используем OpenAI API...")
-            transcript = transcribe_with_openai_api(audio_path)
-
-        # Удаляем временный файл
-        if os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-            except:
-                pass
+            transcript = transcribe_with_openai_api(audio, on_segment)
 
         return transcript or "Не удалось создать транскрипцию"
 
@@ -635,26 +966,15 @@ def transcribe_video_enhanced(video_path, model_name="medium"):
         return None
 
 
-def transcribe_video_safe(video_path, model_name="base"):
+def transcribe_video_safe(video_path, model_name=DEFAULT_WHISPER_MODEL):
     """Безопасная транскрипция видео (для обратной совместимости)"""
     return transcribe_video_enhanced(video_path, model_name)
 
 
-def generate_with_openai(prompt, content_type="both"):
-    """Генерация контента через OpenAI"""
-    try:
-        if not is_ai_configured():
-            return None, None
-
-        config = get_ai_config()
-        api_key = config.get('openai_api_key')
-        model = config.get('openai_model', 'gpt-4o-mini')
-
-        import openai
-        openai.api_key = api_key
-
-        if content_type == "title":
-            system_prompt = """Создай привлекательное название для видео на основе описания.
+def get_system_prompt(content_type):
+    """Возвращает системный промпт для типа генерируемого контента"""
+    if content_type == "title":
+        return """Создай привлекательное название для видео на основе описания.
 
 ТРЕБОВАНИЯ:
 - Максимум 60 символов
@@ -664,8 +984,8 @@ def generate_with_openai(prompt, content_type="both"):
 
 Ответь ТОЛЬКО названием."""
 
-        elif content_type == "description":
-            system_prompt = """Создай краткое описание для видео на основе содержания.
+    elif content_type == "description":
+        return """Создай краткое описание для видео на основе содержания.
 
 ТРЕБОВАНИЯ:
 - 2-3 предложения
@@ -675,8 +995,8 @@ def generate_with_openai(prompt, content_type="both"):
 
 Ответь ТОЛЬКО описанием."""
 
-        else:  # both
-            system_prompt = """Создай название и описание для видео на основе содержания.
+    # both
+    return """Создай название и описание для видео на основе содержания.
 
 ТРЕБОВАНИЯ:
 - Название: максимум 60 символов, кликабельное
@@ -688,52 +1008,455 @@ def generate_with_openai(prompt, content_type="both"):
 НАЗВАНИЕ: [название]
 ОПИСАНИЕ: [описание]"""
 
-        messages = [
-            {"role": "system", "content": system_prompt},
+
+def parse_generated_content(content, content_type):
+    """Разбирает ответ модели на название и описание"""
+    if content_type == "title":
+        return content, None
+    elif content_type == "description":
+        return None, content
+
+    title = ""
+    description = ""
+    for line in content.split('\n'):
+        if line.startswith('НАЗВАНИЕ:'):
+            title = line.replace('НАЗВАНИЕ:', '').strip()
+        elif line.startswith('ОПИСАНИЕ:'):
+            description = line.replace('ОПИСАНИЕ:', '').strip()
+
+    return title or None, description or None
+
+
+def chat_completion(request_params, config, content_type, **log_fields):
+    """
+    Один вызов ChatCompletion с записью расхода токенов и задержки. Возвращает (текст, usage).
+    config передается явно: функция вызывается и из рабочих потоков, где нет session_state
+    """
+    client = get_openai_client(config)
+
+    start_time = time.perf_counter()
+    response = client.chat(**request_params)
+    latency = time.perf_counter() - start_time
+
+    if not response or not response.get('choices'):
+        return None, {}
+
+    usage = response.get('usage') or {}
+    record_usage({
+        'model': request_params['model'],
+        'content_type': content_type,
+        'cached': False,
+        **log_fields,
+        'latency_s': round(latency, 3),
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'completion_tokens': usage.get('completion_tokens'),
+        'total_tokens': usage.get('total_tokens')
+    })
+
+    return response['choices'][0]['message']['content'].strip(), usage
+
+
+def get_response_cache():
+    """Кэш ответов OpenAI с TTL из настроек"""
+    config = get_ai_config()
+    return ResponseCache(ttl_seconds=config.get('cache_ttl_hours', 24) * 3600)
+
+
+def build_generation_request(prompt, content_type, config):
+    return {
+        'model': config.get('openai_model', 'gpt-4o-mini'),
+        'messages': [
+            {"role": "system", "content": get_system_prompt(content_type)},
             {"role": "user", "content": f"Содержание видео: {prompt}"}
-        ]
+        ],
+        'max_tokens': config.get('max_tokens', 150),
+        'temperature': config.get('temperature', 0.7)
+    }
 
-        response = openai.ChatCompletion.create(
-            model=model,
-            messages=messages,
-            max_tokens=config.get('max_tokens', 150),
-            temperature=config.get('temperature', 0.7)
-        )
 
-        if not response or not response.choices:
+def generate_with_openai(prompt, content_type="both", force_new=False):
+    """Генерация контента через OpenAI (повторные одинаковые запросы берутся из кэша)"""
+    try:
+        if not is_ai_configured():
             return None, None
 
-        content = response.choices[0].message.content.strip()
+        config = get_ai_config()
+        request_params = build_generation_request(prompt, content_type, config)
 
-        if content_type == "title":
-            return content, None
-        elif content_type == "description":
-            return None, content
-        else:  # both
-            lines = content.split('\n')
-            title = ""
-            description = ""
+        cache = get_response_cache()
+        cache_key = make_cache_key(request_params)
+
+        # force_new - пользователь явно просит другой вариант
+        content = None if force_new else cache.get(cache_key)
+        if content is not None:
+            record_usage({'model': request_params['model'], 'content_type': content_type,
+                          'cached': True, 'latency_s': 0.0})
+            return parse_generated_content(content, content_type)
+
+        content, _ = chat_completion(request_params, config, content_type, forced=force_new)
+        if not content:
+            return None, None
 
-            for line in lines:
-                if line.startswith('НАЗВАНИЕ:'):
-                    title = line.replace('НАЗВАНИЕ:', '').strip()
-                elif line.startswith('ОПИСАНИЕ:'):
-                    description = line.replace('ОПИСАНИЕ:', '').strip()
+        cache.set(cache_key, content)
 
-            return title or None, description or None
+        return parse_generated_content(content, content_type)
 
     except Exception as e:
         print(f"Ошибка генерации OpenAI: {e}")
         return None, None
 
 
-def process_video_with_ai(video_path):
+def parse_partial_content(content, content_type):
+    """Разбирает незаконченный ответ: поля заполняются по мере прихода токенов"""
+    if content_type != "both":
+        return parse_generated_content(content.strip(), content_type)
+
+    title = description = None
+    title_pos = content.find('НАЗВАНИЕ:')
+    desc_pos = content.find('ОПИСАНИЕ:')
+    # Берем только текущую строку поля: начало следующей метки еще может быть недописанным
+    if title_pos != -1:
+        title = content[title_pos + len('НАЗВАНИЕ:'):].split('\n')[0].strip() or None
+    if desc_pos != -1:
+        description = content[desc_pos + len('ОПИСАНИЕ:'):].split('\n')[0].strip() or None
+    return title, description
+
+
+def stream_with_openai(prompt, content_type="both", force_new=False):
+    """
+    Потоковая генерация: отдает пары (название, описание) по мере прихода токенов.
+    Последняя пара разобрана так же, как в generate_with_openai
+    """
+    try:
+        if not is_ai_configured():
+            return
+
+        config = get_ai_config()
+        request_params = build_generation_request(prompt, content_type, config)
+
+        cache = get_response_cache()
+        cache_key = make_cache_key(request_params)
+
+        content = None if force_new else cache.get(cache_key)
+        if content is not None:
+            record_usage({'model': request_params['model'], 'content_type': content_type,
+                          'cached': True, 'latency_s': 0.0})
+            yield parse_generated_content(content, content_type)
+            return
+
+        client = get_openai_client(config, api_key=config.get('openai_api_key'))
+        start_time = time.perf_counter()
+        first_token_s = None
+        usage = {}
+        parts = []
+
+        for chunk in client.stream_chat(**request_params):
+            if chunk.get('usage'):
+                usage = chunk['usage']
+            for choice in chunk.get('choices') or []:
+                delta = (choice.get('delta') or {}).get('content')
+                if not delta:
+                    continue
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - start_time
+                parts.append(delta)
+                yield parse_partial_content(''.join(parts), content_type)
+
+        record_usage({
+            'model': request_params['model'],
+            'content_type': content_type,
+            'cached': False,
+            'forced': force_new,
+            'streamed': True,
+            'first_token_s': round(first_token_s, 3) if first_token_s is not None else None,
+            'latency_s': round(time.perf_counter() - start_time, 3),
+            'prompt_tokens': usage.get('prompt_tokens'),
+            'completion_tokens': usage.get('completion_tokens'),
+            'total_tokens': usage.get('total_tokens')
+        })
+
+        content = ''.join(parts).strip()
+        if not content:
+            return
+
+        cache.set(cache_key, content)
+        yield parse_generated_content(content, content_type)
+
+    except Exception as e:
+        print(f"Ошибка потоковой генерации OpenAI: {e}")
+
+
+# Модели, поддерживающие response_format={"type": "json_object"}
+JSON_MODE_MODELS = ('gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo', 'gpt-3.5-turbo')
+
+BATCH_SYSTEM_PROMPT = """Создай название и описание для каждого видео из списка на основе его содержания.
+
+ТРЕБОВАНИЯ:
+- Название: максимум 60 символов, кликабельное
+- Описание: 2-3 предложения, максимум 200 символов
+- На русском языке
+- Можно использовать эмодзи
+
+Ответь ТОЛЬКО JSON-объектом вида:
+{"items": [{"id": "<id видео>", "title": "<название>", "description": "<описание>"}]}"""
+
+# Примерный расход токенов ответа на одно видео в пакете
+BATCH_OUTPUT_TOKENS_PER_ITEM = 160
+
+
+def estimate_tokens(text):
+    """Оценка количества токенов (tiktoken, если установлен)"""
+    if not text:
+        return 0
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        # Кириллица в среднем ~2 символа на токен
+        return len(text) // 2 + 1
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Обрезает текст до примерного лимита токенов"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max_tokens * 2]
+
+
+def pack_batch_items(items, max_input_tokens, max_items):
+    """Раскладывает видео по запросам так, чтобы каждый укладывался в лимит токенов"""
+    pack_limit = max(max_input_tokens - estimate_tokens(BATCH_SYSTEM_PROMPT), 200)
+    packs = []
+    current = []
+    current_tokens = 0
+
+    for item in items:
+        transcript = truncate_to_tokens(item['transcript'], pack_limit)
+        tokens = estimate_tokens(transcript) + 20
+        if current and (current_tokens + tokens > pack_limit or len(current) >= max_items):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append({'id': item['id'], 'transcript': transcript})
+        current_tokens += tokens
+
+    if current:
+        packs.append(current)
+    return packs
+
+
+def parse_batch_response(content):
+    """Достает список результатов из JSON-ответа модели"""
+    start, end = content.find('{'), content.rfind('}')
+    data = json.loads(content[start:end + 1])
+    items = data.get('items', [])
+    return {str(entry.get('id')): {'title': entry.get('title'), 'description': entry.get('description')}
+            for entry in items if isinstance(entry, dict) and entry.get('id') is not None}
+
+
+def _request_batch(pack, config):
+    model = config.get('openai_model', 'gpt-4o-mini')
+    user_content = json.dumps([{'id': entry['id'], 'content': entry['transcript']} for entry in pack],
+                              ensure_ascii=False)
+    request_params = {
+        'model': model,
+        'messages': [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Видео: {user_content}"}
+        ],
+        'max_tokens': BATCH_OUTPUT_TOKENS_PER_ITEM * len(pack) + 50,
+        'temperature': config.get('temperature', 0.7)
+    }
+    if model in JSON_MODE_MODELS:
+        request_params['response_format'] = {"type": "json_object"}
+
+    content, _ = chat_completion(request_params, config, 'batch', items=len(pack))
+    return parse_batch_response(content or '{}')
+
+
+def generate_metadata_batch(items, progress_callback=None):
+    """
+    Генерирует названия и описания для многих видео за несколько параллельных запросов.
+    items: [{'id': ..., 'transcript': ...}], возвращает {id: {'title': ..., 'description': ...}}
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    if not is_ai_configured():
+        return {}
+
+    config = get_ai_config()
+    # Длинные транскрипции сначала пересказываем, чтобы не обрезать их при упаковке
+    items = [{'id': item['id'], 'transcript': summarize_transcript(item['transcript'])[0]}
+             for item in items if item.get('transcript')]
+    packs = pack_batch_items(items,
+                             config.get('batch_max_input_tokens', 6000),
+                             config.get('batch_max_items', 10))
+
+    results = {}
+    if not packs:
+        return results
+
+    with ThreadPoolExecutor(max_workers=config.get('batch_concurrency', 4)) as executor:
+        futures = {executor.submit(_request_batch, pack, config): pack for pack in packs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                results.update(future.result())
+            except Exception as e:
+                ids = ', '.join(entry['id'][:8] for entry in futures[future])
+                print(f"Ошибка пакетной генерации ({ids}): {e}")
+            if progress_callback:
+                progress_callback(done, len(packs))
+
+    return results
+
+
+SUMMARY_SYSTEM_PROMPT = """Ты получаешь фрагмент транскрипции длинного видео (возможно, с таймкодами).
+
+Кратко перескажи фрагмент:
+- 3-5 предложений на русском языке
+- Сохрани ключевые темы, имена, названия и термины
+- Если есть таймкоды, укажи временной диапазон фрагмента
+
+Ответь ТОЛЬКО пересказом."""
+
+REDUCE_SYSTEM_PROMPT = """Ты получаешь краткие пересказы последовательных частей одного видео.
+
+Объедини их в общий пересказ всего видео:
+- 5-8 предложений на русском языке
+- Сохрани главные темы, имена и термины
+- Не добавляй ничего, чего нет в пересказах
+
+Ответь ТОЛЬКО пересказом."""
+
+
+def split_transcript_chunks(text, max_tokens):
+    """Делит транскрипцию на части по границам строк (таймкодов) или слов"""
+    units = [line for line in text.split('\n') if line.strip()]
+    if len(units) <= 1:
+        words = text.split()
+        # ~1 токен на слово с запасом: режем по словам, если строк нет
+        step = max(max_tokens // 2, 1)
+        units = [' '.join(words[i:i + step]) for i in range(0, len(words), step)]
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        tokens = estimate_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append('\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+def _summarize_chunk(system_prompt, text, config, content_type):
+    request_params = {
+        'model': config.get('openai_model', 'gpt-4o-mini'),
+        'messages': [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ],
+        'max_tokens': config.get('summary_max_tokens', 250),
+        'temperature': 0.2
+    }
+    # Ошибка одного фрагмента не должна обрывать весь пересказ: свертка идет по остальным
+    try:
+        return chat_completion(request_params, config, content_type)
+    except OpenAIError as e:
+        print(f"Ошибка пересказа фрагмента ({content_type}): {e}")
+        return None, {}
+
+
+def summarize_transcript(transcript, timestamped=None):
+    """
+    Map-reduce пересказ длинной транскрипции перед генерацией названия/описания.
+    Возвращает (текст для промпта, статистика). Короткие транскрипции не трогает.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    config = get_ai_config()
+    threshold = config.get('summary_threshold_tokens', 3000)
+    source = timestamped or transcript
+    stats = {
+        'input_tokens': estimate_tokens(transcript),
+        'chunks': 0,
+        'levels': 0,
+        'api_prompt_tokens': 0,
+        'api_completion_tokens': 0,
+        'failed_chunks': 0,
+        'cached': False,
+    }
+    start_time = time.perf_counter()
+
+    if stats['input_tokens'] <= threshold:
+        stats['output_tokens'] = stats['input_tokens']
+        stats['latency_s'] = 0.0
+        return transcript, stats
+
+    cache = get_response_cache()
+    cache_key = make_cache_key({'summary_of': make_cache_key({'text': source}),
+                                'model': config.get('openai_model', 'gpt-4o-mini'),
+                                'threshold': threshold})
+    summary = cache.get(cache_key)
+    if summary is not None:
+        stats.update({'cached': True, 'output_tokens': estimate_tokens(summary),
+                      'latency_s': time.perf_counter() - start_time})
+        return summary, stats
+
+    chunk_tokens = config.get('summary_chunk_tokens', 2500)
+    system_prompt = SUMMARY_SYSTEM_PROMPT
+    content_type = 'summary_map'
+    text = source
+
+    # Сворачиваем уровнями, пока результат не станет короче порога
+    with ThreadPoolExecutor(max_workers=config.get('batch_concurrency', 4)) as executor:
+        while estimate_tokens(text) > threshold:
+            chunks = split_transcript_chunks(text, chunk_tokens)
+            if stats['levels'] == 0:
+                stats['chunks'] = len(chunks)
+            results = list(executor.map(
+                lambda chunk: _summarize_chunk(system_prompt, chunk, config, content_type), chunks
+            ))
+
+            summaries = []
+            for content, usage in results:
+                stats['api_prompt_tokens'] += usage.get('prompt_tokens') or 0
+                stats['api_completion_tokens'] += usage.get('completion_tokens') or 0
+                if content:
+                    summaries.append(content)
+                else:
+                    stats['failed_chunks'] += 1
+
+            stats['levels'] += 1
+            text = '\n\n'.join(summaries)
+            system_prompt = REDUCE_SYSTEM_PROMPT
+            content_type = 'summary_reduce'
+
+            if len(chunks) == 1:
+                break
+
+    if not text.strip():
+        # Ничего не удалось пересказать - отдаем начало транскрипции
+        text = truncate_to_tokens(transcript, threshold)
+    elif not stats['failed_chunks']:
+        # Неполный пересказ не кэшируем: следующий вызов попробует пропавшие фрагменты снова
+        cache.set(cache_key, text)
+
+    stats['output_tokens'] = estimate_tokens(text)
+    stats['latency_s'] = time.perf_counter() - start_time
+    return text, stats
+
+
+def process_video_with_ai(video_path, on_segment=None):
     """Обрабатывает видео и создает транскрипцию"""
     try:
         config = get_ai_config()
-        model_name = config.get('whisper_model', 'base')
+        model_name = config.get('whisper_model', DEFAULT_WHISPER_MODEL)
 
-        transcript = transcribe_video_enhanced(video_path, model_name)
+        transcript = transcribe_video_enhanced(video_path, model_name, on_segment)
         return transcript, None, None
 
     except Exception as e:
@@ -741,15 +1464,69 @@ def process_video_with_ai(video_path):
         return None, None, None
 
 
-def generate_content_from_transcript(transcript, content_type="both"):
-    """Генерирует контент на основе транскрипции"""
+def generate_content_from_transcript(transcript, content_type="both", force_new=False, timestamped=None):
+    """Генерирует контент на основе транскрипции (длинные сначала пересказываются)"""
     try:
-        return generate_with_openai(transcript, content_type)
+        start_time = time.perf_counter()
+        prompt, stats = summarize_transcript(transcript, timestamped)
+        result = generate_with_openai(prompt, content_type, force_new)
+
+        stats['end_to_end_s'] = time.perf_counter() - start_time
+        st.session_state['last_generation_stats'] = stats
+        print(f"Генерация: {stats['input_tokens']} -> {stats['output_tokens']} токенов, "
+              f"частей: {stats['chunks']}, {stats['end_to_end_s']:.1f} с")
+        return result
     except Exception as e:
         st.error(f"Ошибка генерации: {e}")
         return None, None
 
 
+_early_executor = None
+
+
+def start_early_generation(partial_transcript):
+    """
+    Запускает генерацию названия и описания по началу транскрипции, не дожидаясь ее конца.
+    Возвращает Future с парой (название, описание)
+    """
+    global _early_executor
+    from concurrent.futures import ThreadPoolExecutor
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+    if _early_executor is None:
+        _early_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="early-metadata")
+
+    # Поток получает контекст сессии, чтобы видеть ее настройки AI
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        prompt, _ = summarize_transcript(partial_transcript)
+        return generate_with_openai(prompt, "both")
+
+    return _early_executor.submit(run)
+
+
+def generate_content_from_transcript_stream(transcript, content_type="both", force_new=False, timestamped=None):
+    """Как generate_content_from_transcript, но отдает частичные (название, описание) по мере генерации"""
+    try:
+        start_time = time.perf_counter()
+        prompt, stats = summarize_transcript(transcript, timestamped)
+
+        stats['first_token_s'] = None
+        for title, description in stream_with_openai(prompt, content_type, force_new):
+            if stats['first_token_s'] is None:
+                stats['first_token_s'] = time.perf_counter() - start_time
+            yield title, description
+
+        stats['end_to_end_s'] = time.perf_counter() - start_time
+        st.session_state['last_generation_stats'] = stats
+        print(f"Генерация (поток): {stats['input_tokens']} -> {stats['output_tokens']} токенов, "
+              f"первый токен через {stats['first_token_s'] or 0:.1f} с, всего {stats['end_to_end_s']:.1f} с")
+    except Exception as e:
+        st.error(f"Ошибка генерации: {e}")
+
+
 def show_ai_config():
     """Показывает настройки AI"""
     config = get_ai_config()
@@ -763,6 +1540,7 @@ def show_ai_config():
     col1, col2 = st.columns(2)
     with col1:
         st.write("✅ Whisper" if methods['whisper'] else "❌ Whisper")
+        st.write("✅ faster-whisper" if methods.get('faster_whisper') else "❌ faster-whisper")
         st.write("✅ Speech Recognition" if methods['speech_recognition'] else "❌ Speech Recognition")
         st.write("✅ OpenAI API" if methods['openai_api'] else "❌ OpenAI API")
 
@@ -770,7 +1548,8 @@ def show_ai_config():
         st.write("✅ FFmpeg" if methods['ffmpeg'] else "❌ FFmpeg")
         st.write("✅ MoviePy" if methods['moviepy'] else "❌ MoviePy")
 
-    if not any([methods['whisper'], methods['speech_recognition'], methods['openai_api']]):
+    if not any([methods['whisper'], methods.get('faster_whisper'), methods['speech_recognition'],
+                methods['openai_api']]):
         st.warning("⚠️ Нет доступных методов транскрипции")
 
         with st.expander("📦 Установка зависимостей", expanded=True):
@@ -778,6 +1557,9 @@ def show_ai_config():
 # Основной пакет для транскрипции
 pip install openai-whisper
 
+# Быстрый int8-движок Whisper для CPU
+pip install faster-whisper
+
 # Альтернативный метод
 pip install SpeechRecognition pydub
 
@@ -788,6 +1570,25 @@ pip install moviepy
 pip install torch==2.1.0 torchvision==0.16.0 torchaudio==2.1.0 --index-url https://download.pytorch.org/whl/cpu
             """)
 
+    with st.expander("📖 Словарь исправлений транскрипции", expanded=False):
+        st.caption("JSON: \"как распознано\": \"как должно быть\". Применяется к каждому сегменту транскрипции.")
+        glossary_json = st.text_area(
+            "Словарь",
+            value=json.dumps(load_glossary(), indent=2, ensure_ascii=False),
+            height=250,
+            label_visibility="collapsed",
+            key="glossary_editor"
+        )
+        if st.button("💾 Сохранить словарь"):
+            try:
+                glossary = json.loads(glossary_json)
+                if not isinstance(glossary, dict):
+                    raise ValueError("ожидается объект JSON")
+                if save_glossary({str(k): str(v) for k, v in glossary.items()}):
+                    st.success(f"Словарь сохранен ({len(glossary)} записей)")
+            except (json.JSONDecodeError, ValueError) as e:
+                st.error(f"❌ Неверный формат словаря: {e}")
+
     st.divider()
 
     # Настройки OpenAI
@@ -815,18 +1616,111 @@ pip install torch==2.1.0 torchvision==0.16.0 torchaudio==2.1.0 --index-url https
         )
 
     with col2:
+        model_options = [AUTO_WHISPER_MODEL, *WHISPER_MODELS]
+        current_model = config.get('whisper_model', DEFAULT_WHISPER_MODEL)
         whisper_model = st.selectbox(
             "Модель Whisper",
-            ["tiny", "base", "small", "medium", "large"],
-            index=1
+            model_options,
+            index=model_options.index(current_model) if current_model in model_options else 1 + WHISPER_MODELS.index(DEFAULT_WHISPER_MODEL),
+            format_func=lambda name: "auto - по записи и железу" if name == AUTO_WHISPER_MODEL else name,
+            help="auto выбирает самую большую модель, которая успеет к целевому времени и поместится в память"
+        )
+
+        transcription_target_minutes = st.number_input(
+            "Целевое время транскрипции (мин)",
+            min_value=1, max_value=600,
+            value=config.get('transcription_target_minutes', 15),
+            disabled=whisper_model != AUTO_WHISPER_MODEL,
+            help="Для auto: за сколько минут должна укладываться транскрипция одной записи. "
+                 "Скорость моделей уточняется по прошлым запускам"
+        )
+
+        backends = available_transcribers()
+        backend_names = list(TRANSCRIBERS)
+        current_backend = config.get('transcription_backend', DEFAULT_TRANSCRIBER)
+        transcription_backend = st.selectbox(
+            "Движок Whisper",
+            backend_names,
+            index=backend_names.index(current_backend) if current_backend in backend_names else 0,
+            format_func=lambda name: get_transcriber_class(name).label + ("" if backends[name] else " - не установлен"),
+            help="faster-whisper выполняет те же модели в int8 на CPU в несколько раз быстрее"
         )
 
+        transcription_threads = st.number_input(
+            "Потоков CPU для транскрипции",
+            min_value=0, max_value=64,
+            value=config.get('transcription_threads', 0),
+            help="0 - по умолчанию движка (при нескольких процессах - ядра поровну между ними)"
+        )
+
+        transcription_workers = st.number_input(
+            "Процессов транскрипции",
+            min_value=1, max_value=32,
+            value=config.get('transcription_workers', 1),
+            help=f"Записи длиннее {SHARDED_MIN_MINUTES} мин делятся по паузам на части, каждая распознается "
+                 "в своем процессе со своей моделью. Памяти нужно в столько же раз больше"
+        )
+
+        transcription_daemon_url = st.text_input(
+            "Сервер моделей",
+            value=config.get('transcription_daemon_url', ''),
+            placeholder="http://127.0.0.1:8767",
+            help="Одна копия модели на всех: python -m transcribers.daemon --preload openai-whisper:medium. "
+                 "Пусто - модель загружается в каждом процессе приложения"
+        )
+        if transcription_daemon_url:
+            daemon_stats = get_daemon_stats(transcription_daemon_url)
+            if daemon_stats is None:
+                st.caption("⚠️ Сервер моделей не отвечает - будет использована локальная модель")
+            else:
+                latency = daemon_stats.get('inference_s_p50')
+                st.caption(f"✅ Модели: {', '.join(daemon_stats['loaded_models']) or 'нет'} · "
+                           f"в очереди {daemon_stats['queue_depth']} · запросов {daemon_stats['requests']}"
+                           + (f" · медиана {latency:.1f} с" if latency is not None else ""))
+
         temperature = st.slider(
             "Креативность",
             min_value=0.0, max_value=1.0,
             value=config.get('temperature', 0.7)
         )
 
+        cache_ttl_hours = st.number_input(
+            "Кэш ответов (часов)",
+            min_value=0, max_value=24 * 30,
+            value=config.get('cache_ttl_hours', 24),
+            help="Одинаковые запросы в пределах этого времени не отправляются в OpenAI повторно. 0 - без кэша"
+        )
+
+        early_generation_minutes = st.number_input(
+            "Ранняя генерация (мин)",
+            min_value=0, max_value=180,
+            value=config.get('early_generation_minutes', 0),
+            help="Предложить название и описание, когда расшифрованы первые N минут видео. 0 - после всей транскрипции"
+        )
+
+    with st.expander("🔧 Соединение с API", expanded=False):
+        api_base = st.text_input(
+            "API URL",
+            value=config.get('openai_api_base', ''),
+            placeholder="https://api.openai.com/v1",
+            help="Можно указать локальный сервер-заглушку для проверки"
+        )
+        col_conn1, col_conn2, col_conn3 = st.columns(3)
+        with col_conn1:
+            timeout_s = st.number_input("Таймаут (сек)", min_value=5, max_value=600,
+                                        value=config.get('openai_timeout_s', 60))
+        with col_conn2:
+            max_retries = st.number_input("Повторов при 429/5xx", min_value=0, max_value=10,
+                                          value=config.get('openai_max_retries', 4))
+        with col_conn3:
+            max_concurrency = st.number_input("Параллельных запросов", min_value=1, max_value=32,
+                                              value=config.get('openai_max_concurrency', 4))
+
+    usage = get_usage_summary()
+    if usage['calls']:
+        st.caption(f"📈 Запросов: {usage['calls']} (из кэша: {usage['cache_hits']}), "
+                   f"токенов: {usage['total_tokens']}, средняя задержка: {usage['avg_latency_s']:.1f} с")
+
     # Кнопки управления
     col1, col2, col3 = st.columns(3)
 
@@ -834,7 +1728,7 @@ pip install torch==2.1.0 torchvision==0.16.0 torchaudio==2.1.0 --index-url https
         if st.button("🔍 Тест подключения"):
             if api_key:
                 with st.spinner("Проверяем..."):
-                    if test_openai_connection(api_key, model):
+                    if test_openai_connection(api_key, model, api_base):
                         st.success("✅ Подключение успешно!")
 
                         # Сохраняем настройки
@@ -842,8 +1736,19 @@ pip install torch==2.1.0 torchvision==0.16.0 torchaudio==2.1.0 --index-url https
                             'openai_api_key': api_key,
                             'openai_model': model,
                             'whisper_model': whisper_model,
+                            'transcription_target_minutes': transcription_target_minutes,
+                            'transcription_backend': transcription_backend,
+                            'transcription_threads': transcription_threads,
+                            'transcription_workers': transcription_workers,
+                            'transcription_daemon_url': transcription_daemon_url,
                             'max_tokens': max_tokens,
                             'temperature': temperature,
+                            'cache_ttl_hours': cache_ttl_hours,
+                            'early_generation_minutes': early_generation_minutes,
+                            'openai_api_base': api_base,
+                            'openai_timeout_s': timeout_s,
+                            'openai_max_retries': max_retries,
+                            'openai_max_concurrency': max_concurrency,
                             'authenticated': True
                         })
 
@@ -863,8 +1768,19 @@ pip install torch==2.1.0 torchvision==0.16.0 torchaudio==2.1.0 --index-url https
                 'openai_api_key': api_key,
                 'openai_model': model,
                 'whisper_model': whisper_model,
+                'transcription_target_minutes': transcription_target_minutes,
+                'transcription_backend': transcription_backend,
+                'transcription_threads': transcription_threads,
+                'transcription_workers': transcription_workers,
+                'transcription_daemon_url': transcription_daemon_url,
                 'max_tokens': max_tokens,
-                'temperature': temperature
+                'temperature': temperature,
+                'cache_ttl_hours': cache_ttl_hours,
+                'early_generation_minutes': early_generation_minutes,
+                'openai_api_base': api_base,
+                'openai_timeout_s': timeout_s,
+                'openai_max_retries': max_retries,
+                'openai_max_concurrency': max_concurrency
             })
 
             st.session_state.ai_config = config
@@ -0,0 +1,153 @@
+﻿"""
+Бенчмарк подготовки аудио в цепочке транскрипции: Whisper -> Speech Recognition -> OpenAI API.
+
+Прежняя схема: каждый метод заново открывает WAV (pydub парсит его дважды),
+режет на временные файлы, а Whisper декодирует каждый из них через ffmpeg.
+Новая схема: один DecodedAudio, из которого все методы берут данные в памяти.
+
+Бенчмарк готовит входные данные для всех трех методов так, как это делает
+цепочка при неудаче первых двух, и считает декодирования и время. Сами модели не запускаются.
+
+Запуск из корня проекта:
+    python benchmarks/audio_decode_benchmark.py
+    python benchmarks/audio_decode_benchmark.py --minutes 30 --input video.mp4 --json decode.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.audio import DecodedAudio, pcm_to_wav_bytes, plan_silence_splits
+from utils.capabilities import find_ffmpeg
+
+WHISPER_SEGMENT_MS = 20000
+WHISPER_STEP_MS = 10000
+SR_CHUNK_MS = 15000
+
+
+def synthetic_wav(minutes, path, sample_rate=16000):
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(sample_rate * 60 * minutes) * 2000).astype(np.int16)
+    with open(path, 'wb') as f:
+        f.write(pcm_to_wav_bytes(samples, sample_rate))
+
+
+def legacy_chain(audio_path, workdir):
+    """Подготовка входов как в прежней цепочке; возвращает число декодирований"""
+    from pydub import AudioSegment
+
+    decodes = 0
+    ffmpeg_path = find_ffmpeg()
+
+    # Whisper по сегментам: pydub + временный WAV на сегмент, который Whisper декодирует ffmpeg
+    audio = AudioSegment.from_wav(audio_path)
+    decodes += 1
+    for i, start_ms in enumerate(range(0, len(audio), WHISPER_STEP_MS)):
+        temp_path = os.path.join(workdir, f"temp_segment_{i}.wav")
+        audio[start_ms:start_ms + WHISPER_SEGMENT_MS].export(temp_path, format="wav")
+        if ffmpeg_path:
+            subprocess.run([ffmpeg_path, '-nostdin', '-loglevel', 'error', '-i', temp_path,
+                            '-f', 's16le', '-ac', '1', '-ar', '16000', 'pipe:1'], capture_output=True, check=True)
+            decodes += 1
+        os.remove(temp_path)
+
+    # Speech Recognition: повторный разбор WAV, временный файл на каждые 15 секунд
+    audio = AudioSegment.from_wav(audio_path)
+    decodes += 1
+    for i, start_ms in enumerate(range(0, len(audio), SR_CHUNK_MS)):
+        temp_path = os.path.join(workdir, f"temp_chunk_{i}.wav")
+        audio[start_ms:start_ms + SR_CHUNK_MS].export(temp_path, format="wav")
+        with wave.open(temp_path, 'rb') as chunk:
+            chunk.readframes(chunk.getnframes())
+        os.remove(temp_path)
+
+    # OpenAI API: файл читается целиком еще раз
+    with open(audio_path, 'rb') as f:
+        f.read()
+    decodes += 1
+
+    return decodes
+
+
+def shared_chain(audio_path):
+    """Та же подготовка из одного DecodedAudio; возвращает число декодирований"""
+    DecodedAudio.decode_count = 0
+    audio = DecodedAudio.from_file(audio_path)
+
+    samples = audio.float32()
+    step = WHISPER_STEP_MS * audio.sample_rate // 1000
+    length = WHISPER_SEGMENT_MS * audio.sample_rate // 1000
+    for start in range(0, len(samples), step):
+        samples[start:start + length]
+
+    chunk_s = SR_CHUNK_MS / 1000
+    start_s = 0.0
+    while start_s < audio.duration_s:
+        audio.pcm_bytes(start_s, min(start_s + chunk_s, audio.duration_s))
+        start_s += chunk_s
+
+    for start, end in plan_silence_splits(audio.samples, audio.sample_rate, 600):
+        audio.compressed(start, end)
+
+    return DecodedAudio.decode_count
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк общего декодированного аудио")
+    parser.add_argument('--minutes', type=int, default=10, help="Длительность синтетического WAV (мин)")
+    parser.add_argument('--input', help="Свой аудио- или видеофайл вместо синтетического")
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        audio_path = os.path.join(workdir, 'audio.wav')
+        if args.input:
+            # Прежняя цепочка начинала с извлечения WAV - его время в сравнение не входит
+            with open(audio_path, 'wb') as f:
+                audio = DecodedAudio.from_file(args.input)
+                f.write(pcm_to_wav_bytes(audio.samples, audio.sample_rate))
+        else:
+            synthetic_wav(args.minutes, audio_path)
+
+        legacy_decodes, legacy_s = measure(legacy_chain, audio_path, workdir)
+        shared_decodes, shared_s = measure(shared_chain, audio_path)
+        assert shared_decodes == 1, f"аудио декодировано {shared_decodes} раз"
+
+        results = {
+            'audio_mb': os.path.getsize(audio_path) / 1024 / 1024,
+            'ffmpeg': bool(find_ffmpeg()),
+            'legacy': {'decodes': legacy_decodes, 'seconds': legacy_s},
+            'shared': {'decodes': shared_decodes, 'seconds': shared_s},
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Аудио: {results['audio_mb']:.1f} МБ, ffmpeg: {'да' if results['ffmpeg'] else 'нет'}")
+    print(f"{'схема':>10} {'декодирований':>14} {'сек':>8}")
+    for name in ('legacy', 'shared'):
+        row = results[name]
+        print(f"{name:>10} {row['decodes']:>14} {row['seconds']:>8.2f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
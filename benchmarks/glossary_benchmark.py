@@ -0,0 +1,108 @@
+﻿"""
+Бенчмарк постобработки транскрипции: старый цикл re.sub против скомпилированного словаря.
+
+Генерирует синтетические транскрипции разной длины (~150 слов в минуту)
+и показывает время обработки и время на минуту аудио - оно должно быть
+постоянным (линейное масштабирование).
+
+Запуск из корня проекта:
+    python benchmarks/glossary_benchmark.py
+    python benchmarks/glossary_benchmark.py --minutes 15 60 180 --json glossary.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.glossary import DEFAULT_GLOSSARY, GlossaryEngine
+
+WORDS_PER_MINUTE = 150
+SEGMENT_SECONDS = 10
+FILLER_WORDS = ['сегодня', 'мы', 'посмотрим', 'как', 'сделать', 'это', 'в', 'новом', 'видео', 'и',
+                'обсудим', 'детали', 'проекта', 'для', 'всех', 'кто', 'смотрит', 'канал']
+
+
+def legacy_fix(text, replacements):
+    """Прежняя реализация: отдельный re.sub на каждую запись словаря"""
+    for wrong, correct in replacements.items():
+        pattern = r'\b' + re.escape(wrong) + r'\b'
+        text = re.sub(pattern, correct, text, flags=re.IGNORECASE)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s+([.,!?])', r'\1', text)
+    return text.strip()
+
+
+def synthetic_segments(minutes, seed=42):
+    rng = random.Random(seed)
+    glossary_words = list(DEFAULT_GLOSSARY)
+    words_per_segment = WORDS_PER_MINUTE * SEGMENT_SECONDS // 60
+    segments = []
+    for _ in range(minutes * 60 // SEGMENT_SECONDS):
+        words = [rng.choice(glossary_words) if rng.random() < 0.1 else rng.choice(FILLER_WORDS)
+                 for _ in range(words_per_segment)]
+        segments.append(' '.join(words) + rng.choice(['.', ' ,', ' !', '?']))
+    return segments
+
+
+def measure(func, segments, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for segment in segments:
+            func(segment)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmark(minutes_list, repeat=3):
+    engine = GlossaryEngine(DEFAULT_GLOSSARY)
+    results = []
+
+    for minutes in minutes_list:
+        segments = synthetic_segments(minutes)
+
+        # Проверяем, что результат совпадает с прежней реализацией
+        for segment in segments[:50]:
+            assert engine.apply(segment) == legacy_fix(segment, DEFAULT_GLOSSARY), segment
+
+        legacy_s = measure(lambda text: legacy_fix(text, DEFAULT_GLOSSARY), segments, repeat)
+        engine_s = measure(engine.apply, segments, repeat)
+        results.append({
+            'minutes': minutes,
+            'segments': len(segments),
+            'legacy_s': legacy_s,
+            'engine_s': engine_s,
+            'engine_ms_per_minute': engine_s * 1000 / minutes,
+            'speedup': legacy_s / engine_s if engine_s else None,
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк словаря исправлений транскрипции")
+    parser.add_argument('--minutes', type=int, nargs='+', default=[5, 15, 30, 60, 120],
+                        help="Длительности синтетических транскрипций (мин)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.minutes, args.repeat)
+
+    print(f"{'мин':>6} {'сегм.':>7} {'re.sub, мс':>12} {'словарь, мс':>12} {'мс/мин':>8} {'ускорение':>10}")
+    for row in results:
+        print(f"{row['minutes']:>6} {row['segments']:>7} {row['legacy_s'] * 1000:>12.1f} "
+              f"{row['engine_s'] * 1000:>12.1f} {row['engine_ms_per_minute']:>8.2f} {row['speedup']:>9.1f}x")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+﻿"""
+Локальный сервер-заглушка OpenAI API для проверки клиента без реальных запросов.
+
+Поддерживает /v1/chat/completions (в том числе stream=True) и /v1/audio/transcriptions,
+умеет имитировать задержку и ошибки 429/503 (с заголовком Retry-After).
+
+Запуск:
+    python benchmarks/mock_openai_server.py --port 8765 --latency 0.3 --fail-rate 0.2
+    # в config/ai_config.json: "openai_api_base": "http://127.0.0.1:8765/v1"
+
+Самопроверка клиента (параллельные запросы, повторы, таймауты):
+    python benchmarks/mock_openai_server.py --selftest
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class MockState:
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=None, token_delay=0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'failures': 0, 'max_in_flight': 0}
+        self.in_flight = 0
+
+    def enter(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.in_flight += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.in_flight)
+            return self.random.random() < self.fail_rate
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def fake_chat_content(messages):
+    system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    user = next((m['content'] for m in messages if m['role'] == 'user'), '')
+
+    if '"items"' in system:
+        # Пакетный режим: ответ JSON по всем переданным id
+        ids = re.findall(r'"id":\s*"([^"]+)"', user)
+        return json.dumps({'items': [{'id': item_id, 'title': f'Видео {item_id[:8]}',
+                                      'description': f'Описание видео {item_id[:8]}'} for item_id in ids]},
+                          ensure_ascii=False)
+    if 'НАЗВАНИЕ:' in system:
+        return "НАЗВАНИЕ: Тестовое название 🎬\nОПИСАНИЕ: Тестовое описание видео."
+    if 'названием' in system:
+        return "Тестовое название 🎬"
+    if 'описанием' in system:
+        return "Тестовое описание видео."
+    return f"Пересказ фрагмента из {len(user.split())} слов."
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                self._send_json(200, state.stats)
+            else:
+                self._send_json(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            raw = self.rfile.read(length)
+            should_fail = state.enter()
+            try:
+                time.sleep(state.latency)
+                if should_fail:
+                    with state.lock:
+                        state.stats['failures'] += 1
+                    status = state.random.choice([429, 503])
+                    self._send_json(status, {'error': {'message': 'mock failure'}}, {'Retry-After': '0'})
+                    return
+
+                if self.path.endswith('/chat/completions'):
+                    self._chat(json.loads(raw))
+                elif self.path.endswith('/audio/transcriptions'):
+                    self._transcription(raw)
+                else:
+                    self._send_json(404, {'error': {'message': 'not found'}})
+            finally:
+                state.leave()
+
+        def _chat(self, request):
+            content = fake_chat_content(request.get('messages', []))
+            prompt_tokens = sum(len(m.get('content', '')) // 2 for m in request.get('messages', []))
+            completion_tokens = len(content) // 2
+            if request.get('stream'):
+                self._stream_chat(request, content, prompt_tokens, completion_tokens)
+                return
+            self._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+
+        def _send_event(self, payload):
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        def _stream_chat(self, request, content, prompt_tokens, completion_tokens):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+
+            base = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'model': request.get('model')}
+            # Отдаем ответ кусками по слову, как настоящий API отдает токены
+            for piece in re.findall(r'\S+\s*|\s+', content):
+                time.sleep(state.token_delay)
+                self._send_event({**base, 'choices': [{'index': 0, 'delta': {'content': piece},
+                                                       'finish_reason': None}]})
+            self._send_event({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+            if (request.get('stream_options') or {}).get('include_usage'):
+                self._send_event({**base, 'choices': [],
+                                  'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                                            'total_tokens': prompt_tokens + completion_tokens}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+        def _transcription(self, raw):
+            size_kb = len(raw) // 1024
+            text = f"Тестовая транскрипция файла {size_kb} КБ."
+            self._send_json(200, {'text': text, 'language': 'russian', 'duration': 10.0,
+                                  'segments': [{'id': 0, 'start': 0.0, 'end': 10.0, 'text': text}]})
+
+    return Handler
+
+
+def start_server(port=0, latency=0.0, fail_rate=0.0, seed=None, token_delay=0.0):
+    state = MockState(latency, fail_rate, seed, token_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, state
+
+
+def selftest():
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.openai_client import OpenAIClient, OpenAIError
+
+    server, state = start_server(latency=0.2, fail_rate=0.3, seed=1)
+    api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    client = OpenAIClient('sk-test', api_base=api_base, max_concurrency=4, max_retries=6,
+                          backoff_base=0.05, backoff_max=0.5)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(
+            lambda i: client.chat(model='gpt-4o-mini', messages=[{'role': 'user', 'content': f'Тест {i}'}]),
+            range(16)
+        ))
+    elapsed = time.perf_counter() - start
+    assert all(r['choices'][0]['message']['content'] for r in responses)
+    assert state.stats['max_in_flight'] <= 4, state.stats
+    print(f"chat: 16 запросов за {elapsed:.2f} с, статистика сервера: {state.stats}")
+
+    state.token_delay = 0.05
+    start = time.perf_counter()
+    first_chunk_s = None
+    pieces = []
+    for chunk in client.stream_chat(model='gpt-4o-mini', messages=[
+            {'role': 'system', 'content': 'НАЗВАНИЕ: ... ОПИСАНИЕ: ...'}, {'role': 'user', 'content': 'Тест'}]):
+        for choice in chunk.get('choices', []):
+            if choice['delta'].get('content'):
+                first_chunk_s = first_chunk_s or time.perf_counter() - start
+                pieces.append(choice['delta']['content'])
+    assert ''.join(pieces) == fake_chat_content([{'role': 'system', 'content': 'НАЗВАНИЕ:'}])
+    print(f"stream: первый токен через {first_chunk_s:.2f} с, весь ответ за {time.perf_counter() - start:.2f} с")
+    state.token_delay = 0.0
+
+    transcript = client.transcribe(b'\0' * 4096, filename='test.wav', model='whisper-1', language='ru')
+    print(f"transcribe: {transcript['text']}")
+
+    state.fail_rate = 0.0
+    state.latency = 1.0
+    slow_client = OpenAIClient('sk-test', api_base=api_base, timeout=0.3, max_retries=1, backoff_base=0.05)
+    try:
+        slow_client.chat(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'Тест'}])
+        raise AssertionError("ожидался таймаут")
+    except OpenAIError as e:
+        print(f"timeout: {e}")
+
+    server.shutdown()
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка OpenAI API")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Задержка ответа, сек")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Доля ответов 429/503")
+    parser.add_argument('--token-delay', type=float, default=0.0,
+                        help="Пауза между чанками потокового ответа, сек")
+    parser.add_argument('--selftest', action='store_true', help="Проверить utils.openai_client и выйти")
+    args = parser.parse_args()
+
+    if args.selftest:
+        selftest()
+        return
+
+    server, _ = start_server(args.port, args.latency, args.fail_rate, token_delay=args.token_delay)
+    print(f"Mock OpenAI API: http://127.0.0.1:{server.server_address[1]}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
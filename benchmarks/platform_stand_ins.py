@@ -0,0 +1,410 @@
+﻿"""
+Локальные заглушки платформ для бенчмарка публикации без реальных YouTube, Instagram и TikTok.
+
+Сервер повторяет форму запросов, которые отправляют настоящие загрузчики:
+    YouTube   - resumable upload API: POST /upload/youtube/v3/videos?uploadType=resumable
+                создает сессию (Location), PUT с Content-Range догружает файл, 308 - продолжить
+    Instagram - приватные эндпоинты instagrapi: /api/v1/accounts/login/,
+                /rupload_igvideo/<name>, /rupload_igphoto/<name>, /api/v1/media/configure_to_clips/
+    TikTok    - статичная страница TikTok Studio (fixtures/tiktok_studio_upload.html)
+                и адреса, на которые она отправляет файл и описание
+Задержка ответа, пропускная способность канала и доля ошибок 503 настраиваются.
+
+Классы YouTubeUploader, TikTokUploader и InstagramUploader ниже - заглушки загрузчиков
+с тем же интерфейсом, что у uploaders/*, но идущие на этот сервер. Бенчмарк подставляет
+их через utils.lazy_imports.LAZY_CLASSES, поэтому publish_from_queue работает без изменений.
+Время каждого этапа записывается в stage_log.
+
+Запуск отдельно:
+    python benchmarks/platform_stand_ins.py --port 8766 --latency 0.05 --bandwidth-mbps 50
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TIKTOK_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'tiktok_studio_upload.html')
+
+# Адрес сервера для заглушек загрузчиков; бенчмарк передает его через окружение
+STAND_IN_URL = os.environ.get('PLATFORM_STAND_IN_URL', 'http://127.0.0.1:8766')
+
+READ_CHUNK = 64 * 1024
+
+
+class StandInState:
+    def __init__(self, latency=0.0, bandwidth_mbps=0.0, fail_rate=0.0, seed=None):
+        self.latency = latency
+        self.bandwidth_mbps = bandwidth_mbps
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.stats = {'requests': 0, 'failures': 0, 'bytes_received': 0, 'published': 0}
+
+    def should_fail(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            failed = self.random.random() < self.fail_rate
+            if failed:
+                self.stats['failures'] += 1
+            return failed
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload=None, headers=None, body=None, content_type='application/json'):
+            if body is None:
+                body = json.dumps(payload if payload is not None else {}, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self, keep=False):
+            """Читает тело частями с ограничением скорости; файл целиком в памяти не держим"""
+            remaining = int(self.headers.get('Content-Length', 0))
+            kept = []
+            started = time.perf_counter()
+            received = 0
+            while remaining > 0:
+                chunk = self.rfile.read(min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                received += len(chunk)
+                if keep:
+                    kept.append(chunk)
+                if state.bandwidth_mbps:
+                    ahead = received * 8 / (state.bandwidth_mbps * 1e6) - (time.perf_counter() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            with state.lock:
+                state.stats['bytes_received'] += received
+            return b''.join(kept) if keep else received
+
+        def _authorized(self):
+            return self.headers.get('Authorization', '').startswith('Bearer ')
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip('/')
+            if path == '/stats':
+                with state.lock:
+                    self._send(200, dict(state.stats))
+            elif path == '/tiktokstudio/upload':
+                # Без cookie сессии TikTok уводит на страницу входа
+                if 'sessionid=' not in self.headers.get('Cookie', ''):
+                    self._send(302, headers={'Location': '/login'})
+                    return
+                with open(TIKTOK_PAGE, 'rb') as f:
+                    self._send(200, body=f.read(), content_type='text/html; charset=utf-8')
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PUT(self):
+            self._handle('PUT')
+
+        def _handle(self, method):
+            url = urlparse(self.path)
+            path = url.path.rstrip('/')
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if state.latency:
+                time.sleep(state.latency)
+            if state.should_fail():
+                self._read_body()
+                self._send(503, {'error': 'backend unavailable'}, headers={'Retry-After': '0'})
+                return
+
+            if path == '/upload/youtube/v3/videos':
+                self._youtube(method, query)
+            elif path == '/api/v1/accounts/login':
+                self._read_body()
+                self._send(200, {'logged_in_user': {'pk': 1, 'username': 'bench'}, 'status': 'ok'},
+                           headers={'ig-set-authorization': f"Bearer IGT:2:{uuid.uuid4().hex}"})
+            elif path.startswith('/rupload_igvideo/') or path.startswith('/rupload_igphoto/'):
+                if not self._authorized():
+                    self._read_body()
+                    self._send(403, {'message': 'login_required', 'status': 'fail'})
+                    return
+                self._read_body()
+                self._send(200, {'upload_id': path.rsplit('/', 1)[-1].split('_')[0], 'status': 'ok'})
+            elif path == '/api/v1/media/configure_to_clips':
+                self._read_body()
+                with state.lock:
+                    state.stats['published'] += 1
+                self._send(200, {'media': {'pk': str(random.getrandbits(60)), 'code': uuid.uuid4().hex[:11]},
+                                 'status': 'ok'})
+            elif path == '/login':
+                self._read_body()
+                self._send(200, {'status': 'ok'}, headers={'Set-Cookie': f"sessionid={uuid.uuid4().hex}; Path=/"})
+            elif path == '/tiktokstudio/api/upload':
+                self._read_body()
+                self._send(200, {'upload_id': uuid.uuid4().hex})
+            elif path == '/tiktokstudio/api/post':
+                self._read_body()
+                with state.lock:
+                    state.stats['published'] += 1
+                self._send(200, {'status': 'ok'})
+            else:
+                self._read_body()
+                self._send(404, {'error': 'not found'})
+
+        def _youtube(self, method, query):
+            if not self._authorized():
+                self._read_body()
+                self._send(401, {'error': {'code': 401, 'message': 'Login Required'}})
+                return
+
+            if method == 'POST':
+                metadata = json.loads(self._read_body(keep=True) or b'{}')
+                upload_id = uuid.uuid4().hex
+                with state.lock:
+                    state.sessions[upload_id] = {'received': 0, 'metadata': metadata,
+                                                 'total': int(self.headers.get('X-Upload-Content-Length', 0))}
+                host = self.headers.get('Host')
+                self._send(200, headers={
+                    'Location': f"http://{host}/upload/youtube/v3/videos?uploadType=resumable&upload_id={upload_id}"})
+                return
+
+            session = state.sessions.get(query.get('upload_id'))
+            if session is None:
+                self._read_body()
+                self._send(404, {'error': {'code': 404, 'message': 'Upload session not found'}})
+                return
+
+            # Content-Range: bytes 0-999/5000 - часть файла; bytes */5000 - запрос статуса
+            match = re.match(r'bytes (\d+)-(\d+)/(\d+)', self.headers.get('Content-Range', ''))
+            received = self._read_body()
+            if match and int(match.group(1)) == session['received']:
+                session['received'] += received
+            if session['received'] < session['total']:
+                headers = {'Range': f"bytes=0-{session['received'] - 1}"} if session['received'] else {}
+                self._send(308, headers=headers)
+                return
+            with state.lock:
+                state.stats['published'] += 1
+            self._send(200, {'id': uuid.uuid4().hex[:11], 'snippet': session['metadata'].get('snippet', {}),
+                             'status': {'uploadStatus': 'uploaded'}})
+
+    return Handler
+
+
+def start_server(port=0, latency=0.0, bandwidth_mbps=0.0, fail_rate=0.0, seed=None):
+    state = StandInState(latency, bandwidth_mbps, fail_rate, seed)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+# --- заглушки загрузчиков ---
+
+# (этап, секунды) по всем вызовам заглушек в процессе
+stage_log = []
+
+# Сколько раз повторять запрос после 503, как делают SDK платформ
+MAX_RETRIES = 3
+
+
+def record_stage(stage, seconds):
+    stage_log.append((stage, seconds))
+
+
+def _request(session, method, url, file_path=None, **kwargs):
+    """Запрос с повторами после 503; файл открывается заново на каждую попытку и уходит потоком"""
+    for attempt in range(MAX_RETRIES + 1):
+        if file_path:
+            with open(file_path, 'rb') as f:
+                response = session.request(method, url, data=f, timeout=60, **kwargs)
+        else:
+            response = session.request(method, url, timeout=60, **kwargs)
+        if response.status_code != 503 or attempt == MAX_RETRIES:
+            return response
+        time.sleep(0.1 * 2 ** attempt)
+
+
+class YouTubeUploader:
+    """Как uploaders/youtube.py: OAuth-токен и resumable upload одним запросом (chunksize=-1)"""
+
+    def __init__(self):
+        import requests
+
+        self.session = requests.Session()
+        self.service = None
+
+    def authenticate(self, client_id, client_secret):
+        started = time.perf_counter()
+        # Токен берется из сохраненного файла - к OAuth-серверу настоящий загрузчик не ходит
+        self.session.headers['Authorization'] = f"Bearer bench-{client_id}"
+        self.service = STAND_IN_URL
+        record_stage('youtube.auth', time.perf_counter() - started)
+        return True
+
+    def upload(self, video_path, title, description, tags, category, privacy, made_for_kids=False):
+        started = time.perf_counter()
+        size = os.path.getsize(video_path)
+        body = {
+            'snippet': {'title': title, 'description': description,
+                        'tags': [tag.strip() for tag in tags.split(',') if tag.strip()]},
+            'status': {'privacyStatus': privacy, 'selfDeclaredMadeForKids': made_for_kids},
+        }
+        response = _request(self.session, 'POST',
+                            f"{self.service}/upload/youtube/v3/videos?uploadType=resumable&part=snippet,status",
+                            json=body, headers={'X-Upload-Content-Length': str(size), 'X-Upload-Content-Type': 'video/*'})
+        response.raise_for_status()
+        location = response.headers['Location']
+
+        offset = 0
+        failures = 0
+        while True:
+            with open(video_path, 'rb') as f:
+                f.seek(offset)
+                # Файл отправляется потоком, не читается в память целиком
+                response = self.session.put(location, data=f, timeout=60,
+                                            headers={'Content-Range': f"bytes {offset}-{size - 1}/{size}",
+                                                     'Content-Length': str(size - offset)})
+            if response.status_code == 200:
+                record_stage('youtube.upload', time.perf_counter() - started)
+                return response.json()['id']
+            if response.status_code == 503:
+                failures += 1
+                if failures > MAX_RETRIES:
+                    raise Exception("YouTube upload error: HTTP 503")
+                # Как MediaFileUpload: спрашиваем, сколько сервер уже принял
+                response = _request(self.session, 'PUT', location, headers={'Content-Range': f"bytes */{size}"})
+            if response.status_code != 308:
+                raise Exception(f"YouTube upload error: HTTP {response.status_code}")
+            # Обрыв: догружаем с того места, которое подтвердил сервер
+            match = re.match(r'bytes=0-(\d+)', response.headers.get('Range', ''))
+            offset = int(match.group(1)) + 1 if match else 0
+
+
+class InstagramUploader:
+    """Как uploaders/instagram.py поверх instagrapi: вход, rupload видео и обложки, configure_to_clips"""
+
+    def __init__(self):
+        import requests
+
+        self.session = requests.Session()
+
+    def login(self, username, password):
+        started = time.perf_counter()
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}/api/v1/accounts/login/",
+                            data={'username': username, 'enc_password': password})
+        if response.status_code != 200:
+            return False
+        self.session.headers['Authorization'] = response.headers['ig-set-authorization']
+        record_stage('instagram.auth', time.perf_counter() - started)
+        return True
+
+    def upload(self, video_path, caption, hashtags=""):
+        started = time.perf_counter()
+        upload_id = str(int(time.time() * 1000))
+        name = f"{upload_id}_0_{random.randint(1000000000, 9999999999)}"
+        size = os.path.getsize(video_path)
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}/rupload_igvideo/{name}", file_path=video_path,
+                            headers={'X-Entity-Length': str(size), 'Offset': '0',
+                                     'X-Entity-Name': name, 'Content-Length': str(size)})
+        if response.status_code != 200:
+            return None
+        # instagrapi отправляет кадр-обложку отдельным запросом
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}/rupload_igphoto/{name}",
+                            data=b'\xff\xd8' + os.urandom(30 * 1024))
+        if response.status_code != 200:
+            return None
+        full_caption = f"{caption}\n\n{hashtags}" if hashtags else caption
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}/api/v1/media/configure_to_clips/",
+                            data={'upload_id': upload_id, 'caption': full_caption})
+        if response.status_code != 200:
+            return None
+        record_stage('instagram.upload', time.perf_counter() - started)
+        return response.json()['media']['pk']
+
+
+class TikTokUploader:
+    """
+    Как uploaders/tiktok.py, но без браузера: открывает страницу TikTok Studio, находит на ней
+    те же элементы, что ищут селекторы Selenium, и отправляет файл и описание туда же,
+    куда их отправляет страница. Ручное нажатие Post заменено запросом страницы
+    """
+
+    # Элементы, без которых настоящий загрузчик не справится со страницей
+    REQUIRED_ELEMENTS = {
+        'file_input': r'<input[^>]*type="file"',
+        'caption': r'contenteditable="true"',
+        'post_button': r'<button[^>]*>\s*Post\s*</button>',
+    }
+
+    def __init__(self):
+        import requests
+
+        self.session = requests.Session()
+
+    def _check_logged_in(self):
+        response = self.session.get(f"{STAND_IN_URL}/tiktokstudio/upload", allow_redirects=False, timeout=30)
+        return response.status_code == 200
+
+    def login(self, username="", password=""):
+        started = time.perf_counter()
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}/login", data={'username': username})
+        record_stage('tiktok.auth', time.perf_counter() - started)
+        return response.status_code == 200 and self._check_logged_in()
+
+    def prepare_for_upload(self, video_path, caption, hashtags=""):
+        started = time.perf_counter()
+        page = self.session.get(f"{STAND_IN_URL}/tiktokstudio/upload", timeout=30).text
+        missing = [name for name, pattern in self.REQUIRED_ELEMENTS.items() if not re.search(pattern, page)]
+        if missing:
+            print(f"❌ На странице загрузки нет элементов: {', '.join(missing)}")
+            return False
+
+        upload_url = re.search(r'data-upload-url="([^"]+)"', page).group(1)
+        post_url = re.search(r'data-post-url="([^"]+)"', page).group(1)
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}{upload_url}", file_path=video_path,
+                            headers={'Content-Type': 'video/mp4', 'Content-Length': str(os.path.getsize(video_path))})
+        if response.status_code != 200:
+            return False
+        response = _request(self.session, 'POST', f"{STAND_IN_URL}{post_url}",
+                            json={'upload_id': response.json()['upload_id'], 'caption': f"{caption} {hashtags}"})
+        record_stage('tiktok.upload', time.perf_counter() - started)
+        return response.status_code == 200
+
+    def upload(self, video_path, caption, hashtags=""):
+        return self.prepare_for_upload(video_path, caption, hashtags)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушки YouTube, Instagram и TikTok для бенчмарка публикации")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0, help="Задержка каждого ответа, с")
+    parser.add_argument('--bandwidth-mbps', type=float, default=0.0, help="Скорость приема, Мбит/с (0 - без ограничения)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server, state = start_server(args.port, args.latency, args.bandwidth_mbps, args.fail_rate, args.seed)
+    print(f"Заглушки платформ: http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
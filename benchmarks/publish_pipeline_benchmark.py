@@ -0,0 +1,225 @@
+﻿"""
+Сквозной бенчмарк публикации: add_to_queue -> publish_from_queue на заглушках платформ.
+
+Синтетические видео собираются ffmpeg из источников lavfi (testsrc2 + sine). Публикация идет
+через настоящий queue_manager.publish_from_queue, а загрузчики подменены заглушками из
+benchmarks/platform_stand_ins.py, которые говорят с локальным сервером по протоколам
+YouTube resumable upload, instagrapi и страницы TikTok Studio.
+
+Каждый размер очереди прогоняется в отдельном процессе и в отдельной папке, чтобы пиковый
+RSS и файл очереди не переходили между прогонами. Показываем элементы в час, перцентили
+задержки по этапам (постановка в очередь, подготовка видео, вход, загрузка, запись статуса,
+публикация элемента целиком) и пиковую память.
+
+Запуск из корня проекта:
+    python benchmarks/publish_pipeline_benchmark.py --queue-sizes 5 20 50
+    python benchmarks/publish_pipeline_benchmark.py --platforms YouTube --latency 0.1 --bandwidth-mbps 20 --json publish.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+PLATFORMS = ('YouTube', 'Instagram', 'TikTok')
+
+PLATFORMS_CONFIG = {
+    'youtube': {'client_id': 'bench-client', 'client_secret': 'bench-secret'},
+    'instagram': {'username': 'bench', 'password': 'bench'},
+    'tiktok': {'username': 'bench', 'password': 'bench'},
+}
+
+
+def peak_rss_mb():
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        if hasattr(info, 'peak_wset'):
+            return info.peak_wset / 1024 / 1024
+    except ImportError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def make_videos(directory, count, seconds, size):
+    """Видео из lavfi: тестовая таблица и тон, у каждого файла своя частота тона"""
+    from utils.capabilities import find_ffmpeg
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        print("FFmpeg не найден: вместо видео файлы случайных байт того же размера (~2 Мбит/с)")
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"synthetic_{i}.mp4")
+        if ffmpeg:
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error',
+                            '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate=30",
+                            '-f', 'lavfi', '-i', f"sine=frequency={220 + 110 * i}:sample_rate=44100",
+                            '-t', str(seconds), '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+                            '-c:a', 'aac', '-shortest', path], check=True)
+        else:
+            with open(path, 'wb') as f:
+                f.write(os.urandom(int(seconds * 2e6 / 8)))
+        paths.append(path)
+    return paths
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {'count': 0, 'p50': None, 'p95': None, 'max': None}
+    return {'count': len(values), 'p50': values[len(values) // 2],
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))], 'max': values[-1]}
+
+
+def run_worker(size, video_paths, platforms):
+    """Выполняется в дочернем процессе в пустой папке: своя очередь, свои временные файлы"""
+    import platform_stand_ins
+    import queue_manager
+    from utils import lazy_imports
+
+    # Все загрузчики (YouTubeUploader, TikTokUploader, InstagramUploader) берутся из заглушек
+    for class_name in lazy_imports.LAZY_CLASSES:
+        lazy_imports.LAZY_CLASSES[class_name] = 'platform_stand_ins'
+    record = platform_stand_ins.record_stage
+
+    class TimedVideoProcessor(queue_manager.VideoProcessor):
+        def prepare_for_tiktok(self, video_path):
+            started = time.perf_counter()
+            result = super().prepare_for_tiktok(video_path)
+            record('tiktok.prepare', time.perf_counter() - started)
+            return result
+
+        def prepare_for_instagram(self, video_path):
+            started = time.perf_counter()
+            result = super().prepare_for_instagram(video_path)
+            record('instagram.prepare', time.perf_counter() - started)
+            return result
+
+    update_status = queue_manager.update_queue_item_status
+
+    def timed_update_status(queue_item_id, status):
+        started = time.perf_counter()
+        update_status(queue_item_id, status)
+        record('queue.update_status', time.perf_counter() - started)
+
+    queue_manager.VideoProcessor = TimedVideoProcessor
+    queue_manager.update_queue_item_status = timed_update_status
+    start_rss = peak_rss_mb()
+
+    started = time.perf_counter()
+    for i in range(size):
+        item_started = time.perf_counter()
+        with open(video_paths[i % len(video_paths)], 'rb') as f:
+            queue_manager.add_to_queue(f, f"Видео {i}", f"Описание видео {i}", "бенчмарк, очередь", "Technology",
+                                       "private", None, list(platforms), "Нет, это видео не для детей")
+        record('queue.add', time.perf_counter() - item_started)
+    enqueue_s = time.perf_counter() - started
+
+    upload_status = {}
+    started = time.perf_counter()
+    for item in queue_manager.load_queue():
+        item_started = time.perf_counter()
+        queue_manager.publish_from_queue(item, PLATFORMS_CONFIG, upload_status)
+        record('publish.item', time.perf_counter() - item_started)
+    publish_s = time.perf_counter() - started
+
+    stages = defaultdict(list)
+    for stage, seconds in platform_stand_ins.stage_log:
+        stages[stage].append(seconds)
+    print(json.dumps({
+        'size': size,
+        'enqueue_s': enqueue_s,
+        'publish_s': publish_s,
+        'statuses': Counter(item['status'] for item in queue_manager.load_queue()),
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_growth_mb': peak_rss_mb() - start_rss,
+        'stages': stages,
+    }, ensure_ascii=False))
+
+
+def run_size(size, video_paths, platforms, url, workdir):
+    run_dir = os.path.join(workdir, f"queue_{size}")
+    os.makedirs(run_dir, exist_ok=True)
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--queue-sizes', str(size),
+           '--platforms', *platforms, '--videos-list', json.dumps(video_paths)]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=run_dir,
+                            env={**os.environ, 'PLATFORM_STAND_IN_URL': url})
+    if result.returncode != 0:
+        return {'size': size, 'error': (result.stderr.strip().splitlines() or ['неизвестная ошибка'])[-1]}
+    row = json.loads(result.stdout.strip().splitlines()[-1])
+    row['items_per_hour'] = size / (row['enqueue_s'] + row['publish_s']) * 3600
+    row['stages'] = {stage: percentiles(values) for stage, values in sorted(row['stages'].items())}
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк публикации на заглушках платформ")
+    parser.add_argument('--queue-sizes', nargs='+', type=int, default=[5, 20])
+    parser.add_argument('--platforms', nargs='+', default=list(PLATFORMS), choices=PLATFORMS)
+    parser.add_argument('--videos', type=int, default=3, help="Сколько разных видео сгенерировать")
+    parser.add_argument('--video-seconds', type=float, default=10)
+    parser.add_argument('--video-size', default='1280x720')
+    parser.add_argument('--latency', type=float, default=0.02, help="Задержка ответа заглушек, с")
+    parser.add_argument('--bandwidth-mbps', type=float, default=0.0, help="Канал до заглушек, Мбит/с (0 - без ограничения)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Доля ответов 503")
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--videos-list', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.queue_sizes[0], json.loads(args.videos_list), args.platforms)
+        return
+
+    from platform_stand_ins import start_server
+
+    workdir = tempfile.mkdtemp(prefix='publish-bench-')
+    video_paths = make_videos(workdir, args.videos, args.video_seconds, args.video_size)
+    server, state = start_server(latency=args.latency, bandwidth_mbps=args.bandwidth_mbps,
+                                 fail_rate=args.fail_rate, seed=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Заглушки: {url}, видео: {len(video_paths)} x {os.path.getsize(video_paths[0]) / 1024 / 1024:.1f} МБ")
+
+    results = []
+    for size in args.queue_sizes:
+        print(f"Очередь из {size}...", flush=True)
+        results.append(run_size(size, video_paths, args.platforms, url, workdir))
+    server.shutdown()
+
+    print(f"\n{'очередь':>8} {'элементов/ч':>12} {'пик RSS, МБ':>12} {'рост RSS, МБ':>13}  статусы")
+    for row in results:
+        if 'error' in row:
+            print(f"{row['size']:>8} ошибка: {row['error']}")
+            continue
+        statuses = ', '.join(f"{status}: {count}" for status, count in row['statuses'].items())
+        print(f"{row['size']:>8} {row['items_per_hour']:>12.0f} {row['peak_rss_mb']:>12.0f} "
+              f"{row['rss_growth_mb']:>13.1f}  {statuses}")
+
+    for row in results:
+        if 'error' in row:
+            continue
+        print(f"\nЭтапы, очередь из {row['size']} (мс):")
+        print(f"{'этап':<22} {'раз':>5} {'p50':>9} {'p95':>9} {'max':>9}")
+        for stage, stats in row['stages'].items():
+            print(f"{stage:<22} {stats['count']:>5} {stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} "
+                  f"{stats['max'] * 1000:>9.1f}")
+    print(f"\nЗаглушки: {state.stats}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'args': {key: value for key, value in vars(args).items() if key not in ('worker', 'videos_list')},
+                       'stand_in_stats': state.stats, 'results': results}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+﻿"""
+Бенчмарк многопроцессной транскрипции: время и ускорение для 1..N процессов.
+
+Запись делится по тишине на шарды, каждый процесс загружает свою модель
+(transcribers/sharded.py). Показываем полное время, время загрузки модели,
+самый долгий шард, RTF и эффективность (ускорение / число процессов).
+
+Аудио: --audio (лучше запись от 30 минут); без него - синтетическая речь с паузами
+на --minutes минут (годится только для проверки масштабирования, не качества).
+
+Запуск из корня проекта:
+    python benchmarks/sharded_transcription_benchmark.py --audio stream.mp4 --workers 1 2 4 8
+    python benchmarks/sharded_transcription_benchmark.py --backend faster-whisper --model small --json shards.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from transcribers.registry import DEFAULT_TRANSCRIBER, TRANSCRIBERS
+from transcribers.sharded import ShardedTranscriber, default_threads_per_worker
+from utils.audio import DecodedAudio
+
+
+def synthetic_audio(minutes, sample_rate=16000, seed=0):
+    """Фразы по 4-8 с, разделенные паузами по 0.5-1.5 с"""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * sample_rate)
+    samples = np.zeros(total, dtype=np.int16)
+    position = 0
+    while position < total:
+        length = int(rng.uniform(4, 8) * sample_rate)
+        t = np.arange(min(length, total - position)) / sample_rate
+        samples[position:position + len(t)] = (np.sin(2 * np.pi * rng.uniform(120, 300) * t) * 4000).astype(np.int16)
+        position += length + int(rng.uniform(0.5, 1.5) * sample_rate)
+    return DecodedAudio(samples, sample_rate, 'synthetic')
+
+
+def run_benchmark(audio, backend, model_name, workers_list, threads, language):
+    results = []
+    for workers in workers_list:
+        start = time.perf_counter()
+        with ShardedTranscriber(backend, model_name, workers, threads) as sharded:
+            result = sharded.transcribe(audio, language=language)
+        elapsed = time.perf_counter() - start
+        results.append({
+            'workers': workers,
+            'threads_per_worker': threads or default_threads_per_worker(workers),
+            'shards': len(result['shards']),
+            'total_s': elapsed,
+            'load_s': max(shard['load_s'] for shard in result['shards']),
+            'slowest_shard_s': max(shard['transcribe_s'] for shard in result['shards']),
+            'rtf': elapsed / audio.duration_s,
+            'chars': len(result['text']),
+        })
+
+    baseline = results[0]['total_s'] * results[0]['workers']
+    for row in results:
+        row['speedup'] = baseline / row['total_s']
+        row['efficiency'] = row['speedup'] / row['workers']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк многопроцессной транскрипции")
+    parser.add_argument('--audio', help="Аудио или видео; без него - синтетическая запись")
+    parser.add_argument('--minutes', type=float, default=30, help="Длительность синтетической записи")
+    parser.add_argument('--backend', default=DEFAULT_TRANSCRIBER, choices=list(TRANSCRIBERS))
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="Числа процессов")
+    parser.add_argument('--threads', type=int, default=0, help="Потоков на процесс, 0 - ядра поровну")
+    parser.add_argument('--language', default='ru')
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    audio = DecodedAudio.from_file(args.audio) if args.audio else synthetic_audio(args.minutes)
+    print(f"Запись: {audio.duration_s / 60:.1f} мин, {args.backend} / {args.model}")
+
+    results = run_benchmark(audio, args.backend, args.model, args.workers, args.threads, args.language)
+
+    print(f"{'проц.':>6} {'потоков':>8} {'шардов':>7} {'всего, с':>9} {'загрузка, с':>12} "
+          f"{'max шард, с':>12} {'RTF':>6} {'ускорение':>10} {'эфф.':>6}")
+    for row in results:
+        print(f"{row['workers']:>6} {row['threads_per_worker']:>8} {row['shards']:>7} {row['total_s']:>9.1f} "
+              f"{row['load_s']:>12.1f} {row['slowest_shard_s']:>12.1f} {row['rtf']:>6.3f} "
+              f"{row['speedup']:>9.2f}x {row['efficiency']:>6.0%}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
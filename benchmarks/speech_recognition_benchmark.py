@@ -0,0 +1,163 @@
+﻿"""
+Бенчмарк запасного пути Speech Recognition: последовательное и параллельное распознавание частей.
+
+Поднимает локальный распознаватель-заглушку (вместо Google) с заданной задержкой,
+генерирует синтетическое аудио и прогоняет transcribe_with_speech_recognition
+с разным числом потоков. Тишина заглушкой не распознается - как пустые части у Google.
+
+Запуск из корня проекта:
+    python benchmarks/speech_recognition_benchmark.py
+    python benchmarks/speech_recognition_benchmark.py --minutes 10 --latency 0.8 --workers 1 4 8
+
+Заглушку можно поднять отдельно и указать в config/ai_config.json:
+    python benchmarks/speech_recognition_benchmark.py --serve --port 8766
+    "speech_recognition_endpoint": "http://127.0.0.1:8766/recognize"
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RecognizerState:
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'max_in_flight': 0, 'languages': {}}
+        self.in_flight = 0
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            audio = self.rfile.read(length)
+            language = parse_qs(urlparse(self.path).query).get('lang', ['ru-RU'])[0]
+
+            with state.lock:
+                state.stats['requests'] += 1
+                state.stats['languages'][language] = state.stats['languages'].get(language, 0) + 1
+                state.in_flight += 1
+                state.stats['max_in_flight'] = max(state.stats['max_in_flight'], state.in_flight)
+            try:
+                time.sleep(state.latency)
+                # Заголовок WAV - 44 байта, дальше PCM; тишина распознается как пустая часть
+                pcm = audio[44:]
+                transcript = f"фрагмент {len(pcm) // 1024} КБ" if any(pcm) else ''
+                body = json.dumps({'transcript': transcript}, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+def start_recognizer(port=0, latency=0.5):
+    state = RecognizerState(latency)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def synthetic_audio(minutes, path):
+    """Тон с паузами: каждая пятая 15-секундная часть - тишина"""
+    from pydub import AudioSegment
+    from pydub.generators import Sine
+
+    tone = Sine(220).to_audio_segment(duration=15000).set_frame_rate(16000).set_channels(1) - 20
+    silence = AudioSegment.silent(duration=15000, frame_rate=16000)
+    audio = AudioSegment.empty()
+    for i in range(minutes * 4):
+        audio += silence if i % 5 == 4 else tone
+    audio.export(path, format='wav')
+
+
+def run_benchmark(minutes, latency, workers_list):
+    import ai_assistant
+
+    server, state = start_recognizer(latency=latency)
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/recognize"
+    recognize = ai_assistant.make_speech_recognizer(endpoint)
+
+    audio_path = os.path.join(tempfile.mkdtemp(), 'speech.wav')
+    synthetic_audio(minutes, audio_path)
+
+    results = []
+    reference = None
+    for workers in workers_list:
+        ai_assistant.get_ai_config()['speech_recognition_workers'] = workers
+        state.stats.update({'requests': 0, 'max_in_flight': 0, 'languages': {}})
+
+        segments = []
+        start = time.perf_counter()
+        text = ai_assistant.transcribe_with_speech_recognition(audio_path, segments.append, recognize)
+        elapsed = time.perf_counter() - start
+
+        # Параллельный режим должен давать тот же текст и тот же порядок
+        reference = reference if reference is not None else text
+        assert text == reference, "результат зависит от числа потоков"
+        assert [s['index'] for s in segments] == sorted(s['index'] for s in segments)
+
+        results.append({
+            'workers': workers,
+            'seconds': elapsed,
+            'requests': state.stats['requests'],
+            'max_in_flight': state.stats['max_in_flight'],
+            'languages': dict(state.stats['languages']),
+            'segments': len(segments),
+        })
+
+    server.shutdown()
+    os.remove(audio_path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк параллельного Speech Recognition")
+    parser.add_argument('--minutes', type=int, default=5, help="Длительность синтетического аудио (мин)")
+    parser.add_argument('--latency', type=float, default=0.5, help="Задержка заглушки на запрос, сек")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    parser.add_argument('--serve', action='store_true', help="Только поднять заглушку")
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    if args.serve:
+        server, _ = start_recognizer(args.port, args.latency)
+        print(f"Распознаватель-заглушка: http://127.0.0.1:{server.server_address[1]}/recognize")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    results = run_benchmark(args.minutes, args.latency, args.workers)
+
+    print(f"{'потоков':>8} {'сек':>8} {'запросов':>9} {'одновр.':>8} {'частей':>7}  языки")
+    for row in results:
+        print(f"{row['workers']:>8} {row['seconds']:>8.2f} {row['requests']:>9} {row['max_in_flight']:>8} "
+              f"{row['segments']:>7}  {row['languages']}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
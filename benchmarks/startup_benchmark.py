@@ -0,0 +1,149 @@
+﻿"""
+Бенчмарк старта приложения: время импорта каждого модуля в чистом интерпретаторе.
+
+Запуск из корня проекта:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --repeat 5 --json startup.json --strict
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def find_app_modules(entry='main.py'):
+    """
+    Модули, которые main.py импортирует до первой отрисовки страницы: streamlit и модули
+    проекта из импортов верхнего уровня (включая блок try). Берем их из кода main.py,
+    чтобы список не отставал от приложения; импорты внутри функций отложенные и не считаются
+    """
+    with open(os.path.join(ROOT_DIR, entry), 'r', encoding='utf-8-sig') as f:
+        tree = ast.parse(f.read())
+
+    nodes = []
+    for node in tree.body:
+        nodes.extend(node.body if isinstance(node, ast.Try) else [node])
+
+    modules = []
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            top = name.split('.')[0]
+            local = os.path.exists(os.path.join(ROOT_DIR, f"{top}.py")) or os.path.isdir(os.path.join(ROOT_DIR, top))
+            if (top == 'streamlit' or local) and name not in modules:
+                modules.append(name)
+    return modules
+
+
+APP_MODULES = find_app_modules()
+
+
+# Тяжелые зависимости, которые должны грузиться только по требованию
+DEFERRED_MODULES = [
+    'uploaders.youtube',
+    'uploaders.tiktok',
+    'uploaders.instagram',
+    'whisper',
+    'speech_recognition',
+    'openai',
+]
+
+FIRST_PAINT_TARGET_S = 1.0
+
+MEASURE_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+for name in {preload!r}:
+    __import__(name)
+start = time.perf_counter()
+try:
+    for name in {modules!r}:
+        __import__(name)
+    print(time.perf_counter() - start)
+except Exception as e:
+    print('error:' + type(e).__name__)
+"""
+
+
+def measure_import(modules, preload=(), repeat=3):
+    """Возвращает минимальное время импорта модулей (сек) или None, если импорт не удался"""
+    timings = []
+    for _ in range(repeat):
+        code = MEASURE_SNIPPET.format(root=ROOT_DIR, preload=list(preload), modules=list(modules))
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT_DIR)
+        output = result.stdout.strip().splitlines()
+        if not output or output[-1].startswith('error:'):
+            return None
+        timings.append(float(output[-1]))
+    return min(timings)
+
+
+def run_benchmark(repeat=3):
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'app_modules': {},
+        'deferred_modules': {},
+    }
+
+    for module in APP_MODULES:
+        # streamlit меряем отдельно, остальное - поверх уже загруженного streamlit
+        preload = [] if module == 'streamlit' else ['streamlit']
+        results['app_modules'][module] = measure_import([module], preload, repeat)
+
+    for module in DEFERRED_MODULES:
+        results['deferred_modules'][module] = measure_import([module], ['streamlit'], repeat)
+
+    # Весь граф модулей, нужный для первой отрисовки
+    results['first_paint_imports_s'] = measure_import(APP_MODULES, repeat=repeat)
+    results['first_paint_target_s'] = FIRST_PAINT_TARGET_S
+    return results
+
+
+def print_report(results):
+    def fmt(value):
+        return "недоступен" if value is None else f"{value * 1000:8.1f} ms"
+
+    print("Модули первой отрисовки:")
+    for module, value in results['app_modules'].items():
+        print(f"  {module:<28} {fmt(value)}")
+
+    print("Отложенные модули (грузятся по требованию):")
+    for module, value in results['deferred_modules'].items():
+        print(f"  {module:<28} {fmt(value)}")
+
+    first_paint = results['first_paint_imports_s']
+    print(f"\nИмпорт до первой отрисовки: {fmt(first_paint)} (цель < {FIRST_PAINT_TARGET_S * 1000:.0f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк времени старта приложения")
+    parser.add_argument('--repeat', type=int, default=3, help="Повторов на модуль (берется минимум)")
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    parser.add_argument('--strict', action='store_true', help="Код возврата 1, если цель не достигнута")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeat)
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    first_paint = results['first_paint_imports_s']
+    if args.strict and (first_paint is None or first_paint > FIRST_PAINT_TARGET_S):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
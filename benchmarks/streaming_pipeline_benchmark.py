@@ -0,0 +1,112 @@
+﻿"""
+Бенчмарк потокового декодирования для Whisper: вся запись в памяти против PCMStream.
+
+Прежняя схема: запись декодируется целиком, переводится в float32 и только потом
+начинается распознавание. Потоковая: ffmpeg читает следующие секунды в ограниченную
+очередь, пока "модель" обрабатывает текущее окно. Вместо модели - пауза на окно
+(--inference-ms), поэтому видно и перекрытие декодирования с распознаванием, и память.
+
+Пиковая память считается через tracemalloc (массивы numpy в нем учитываются).
+
+Запуск из корня проекта:
+    python benchmarks/streaming_pipeline_benchmark.py --minutes 60 180
+    python benchmarks/streaming_pipeline_benchmark.py --input stream.mp4 --inference-ms 200 --json stream.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.audio import DecodedAudio, PCMStream, pcm_to_wav_bytes
+
+WINDOW_S = 20
+STEP_S = 10
+
+
+def synthetic_wav(minutes, directory, sample_rate=16000):
+    path = os.path.join(directory, f"synthetic_{minutes}m.wav")
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(int(sample_rate * 60 * minutes)) * 2000).astype(np.int16)
+    with open(path, 'wb') as f:
+        f.write(pcm_to_wav_bytes(samples, sample_rate))
+    return path
+
+
+def fake_inference(window, inference_s):
+    samples = window.astype(np.float32) / 32768.0
+    time.sleep(inference_s)
+    return float(np.abs(samples).mean())
+
+
+def run_full(path, inference_s):
+    """Прежний порядок: декодировать все, затем распознавать окна"""
+    audio = DecodedAudio.from_file(path)
+    samples = audio.float32()
+    window = WINDOW_S * audio.sample_rate
+    step = STEP_S * audio.sample_rate
+    windows = 0
+    for start in range(0, len(samples), step):
+        time.sleep(inference_s)
+        float(np.abs(samples[start:start + window]).mean())
+        windows += 1
+    return windows
+
+
+def run_streaming(path, inference_s):
+    stream = PCMStream(path)
+    windows = 0
+    for _, window in stream.windows(WINDOW_S, STEP_S):
+        fake_inference(window, inference_s)
+        windows += 1
+    return windows
+
+
+def measure(func, path, inference_s):
+    tracemalloc.start()
+    start = time.perf_counter()
+    windows = func(path, inference_s)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time_s': elapsed, 'peak_mb': peak / 1024 / 1024, 'windows': windows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк потокового декодирования аудио")
+    parser.add_argument('--input', help="Видео или аудио; без него - синтетические WAV")
+    parser.add_argument('--minutes', type=float, nargs='+', default=[30, 90, 180],
+                        help="Длительности синтетических записей (мин)")
+    parser.add_argument('--inference-ms', type=float, default=20, help="Имитация распознавания окна, мс")
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    inference_s = args.inference_ms / 1000
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputs = [args.input] if args.input else [synthetic_wav(minutes, tmp_dir) for minutes in args.minutes]
+        for path in inputs:
+            full = measure(run_full, path, inference_s)
+            streaming = measure(run_streaming, path, inference_s)
+            assert full['windows'] == streaming['windows'], (full, streaming)
+            results.append({'input': os.path.basename(path), 'windows': full['windows'],
+                            'full': full, 'streaming': streaming})
+
+    print(f"{'запись':<22} {'окон':>6} {'целиком, с':>11} {'поток, с':>9} {'целиком, МБ':>12} {'поток, МБ':>10}")
+    for row in results:
+        print(f"{row['input']:<22} {row['windows']:>6} {row['full']['time_s']:>11.1f} "
+              f"{row['streaming']['time_s']:>9.1f} {row['full']['peak_mb']:>12.1f} {row['streaming']['peak_mb']:>10.1f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+﻿"""
+Бенчмарк движков транскрипции: real-time factor и пиковая память по движку и размеру модели.
+
+Каждая комбинация движок x модель запускается в отдельном процессе, чтобы пиковый RSS
+не смешивался между моделями. RTF = время транскрипции / длительность аудио
+(меньше 1 - быстрее реального времени). Загрузка модели меряется отдельно.
+
+Аудио: --audio (файлы или папки), по умолчанию benchmarks/fixtures;
+если там пусто - синтетический минутный файл (RTF на нем лишь ориентировочный).
+
+Запуск из корня проекта:
+    python benchmarks/transcriber_benchmark.py --models tiny base small
+    python benchmarks/transcriber_benchmark.py --backends faster-whisper --threads 4 --json rtf.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.ogg', '.flac', '.mp4', '.mkv', '.mov')
+
+
+def peak_rss_mb():
+    """Пиковый RSS текущего процесса"""
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        # На Windows есть настоящий пик, на остальных системах берем resource ниже
+        if hasattr(info, 'peak_wset'):
+            return info.peak_wset / 1024 / 1024
+    except ImportError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает КБ, macOS - байты
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def collect_audio(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.exists(path):
+            files.append(path)
+    return files
+
+
+def synthetic_audio():
+    import numpy as np
+    from utils.audio import pcm_to_wav_bytes
+
+    rng = np.random.default_rng(0)
+    samples = (np.sin(np.linspace(0, 2 * np.pi * 220 * 60, 16000 * 60)) * 3000
+               + rng.standard_normal(16000 * 60) * 300).astype(np.int16)
+    path = os.path.join(tempfile.mkdtemp(), 'synthetic.wav')
+    with open(path, 'wb') as f:
+        f.write(pcm_to_wav_bytes(samples, 16000))
+    return path
+
+
+def run_worker(backend, model_name, threads, audio_paths, language):
+    """Выполняется в дочернем процессе: одна модель, все файлы"""
+    from transcribers.registry import get_transcriber_class
+    from utils.audio import DecodedAudio
+
+    audios = [DecodedAudio.from_file(path) for path in audio_paths]
+
+    start = time.perf_counter()
+    transcriber = get_transcriber_class(backend)(model_name, threads).load()
+    load_s = time.perf_counter() - start
+
+    files = []
+    for path, audio in zip(audio_paths, audios):
+        start = time.perf_counter()
+        result = transcriber.transcribe(audio.float32(), language=language)
+        elapsed = time.perf_counter() - start
+        files.append({'audio': os.path.basename(path), 'duration_s': audio.duration_s,
+                      'transcribe_s': elapsed, 'rtf': elapsed / audio.duration_s,
+                      'chars': len(result['text'])})
+
+    total_audio = sum(row['duration_s'] for row in files)
+    total_time = sum(row['transcribe_s'] for row in files)
+    print(json.dumps({
+        'backend': backend,
+        'model': model_name,
+        'threads': threads,
+        'load_s': load_s,
+        'rtf': total_time / total_audio if total_audio else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'files': files,
+    }, ensure_ascii=False))
+
+
+def run_combination(backend, model_name, threads, audio_paths, language):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--backends', backend,
+           '--models', model_name, '--threads', str(threads), '--language', language, '--audio', *audio_paths]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return {'backend': backend, 'model': model_name, 'threads': threads,
+                'error': (result.stderr.strip().splitlines() or ['неизвестная ошибка'])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    from transcribers.registry import TRANSCRIBERS
+
+    parser = argparse.ArgumentParser(description="Бенчмарк движков транскрипции")
+    parser.add_argument('--backends', nargs='+', default=list(TRANSCRIBERS))
+    parser.add_argument('--models', nargs='+', default=['tiny', 'base', 'small'])
+    parser.add_argument('--threads', type=int, default=0, help="Потоков CPU, 0 - по умолчанию движка")
+    parser.add_argument('--language', default='ru')
+    parser.add_argument('--audio', nargs='+', default=[FIXTURES_DIR], help="Файлы или папки с аудио")
+    parser.add_argument('--json', dest='json_path', help="Сохранить результаты в JSON")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.backends[0], args.models[0], args.threads, args.audio, args.language)
+        return
+
+    audio_paths = collect_audio(args.audio)
+    if not audio_paths:
+        print("Аудио не найдено, используем синтетический файл (RTF ориентировочный)")
+        audio_paths = [synthetic_audio()]
+
+    results = []
+    for backend in args.backends:
+        for model_name in args.models:
+            print(f"{backend} / {model_name}...", flush=True)
+            results.append(run_combination(backend, model_name, args.threads, audio_paths, args.language))
+
+    print(f"\n{'движок':<16} {'модель':<8} {'загрузка, с':>12} {'RTF':>7} {'пик RSS, МБ':>12}")
+    for row in results:
+        if 'error' in row:
+            print(f"{row['backend']:<16} {row['model']:<8} ошибка: {row['error']}")
+            continue
+        print(f"{row['backend']:<16} {row['model']:<8} {row['load_s']:>12.1f} {row['rtf']:>7.3f} "
+              f"{row['peak_rss_mb']:>12.0f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
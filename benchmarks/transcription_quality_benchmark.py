@@ -0,0 +1,434 @@
+﻿"""
+Набор бенчмарков транскрипции: скорость и точность каждого пути распознавания на одних и тех же записях.
+
+Записи и эталонные тексты описаны в benchmarks/fixtures/manifest.json:
+    {"id", "audio", "reference", "language"}          - записанный клип и его текст
+    {"id", "language", "synthetic": {...}}           - клип, собранный из записанного:
+        source + repeat/pause_s - длинная запись (повтор с паузами),
+        source + snr_db         - тот же клип с белым шумом,
+        noise_s                 - только шум, эталон пустой (проверка галлюцинаций)
+Эталонные тексты лежат рядом (*.txt); записи *.wav делаются чтением этих текстов вслух.
+
+Для каждого пути (whisper-segments, whisper-streaming, whisper-full, whisper-sharded,
+speech-recognition, openai-api) все клипы прогоняются в отдельном процессе, чтобы пиковый
+RSS не смешивался между путями. Метрики: RTF, пиковый RSS, WER, CER и доля терминов
+словаря (utils/glossary.py), которые из эталона дошли до транскрипции.
+
+Результаты каждого прогона сохраняются в benchmarks/results для сравнения во времени.
+С --baseline прогон сравнивается с сохраненной базой и завершается с кодом 1 при регрессии.
+
+Запуск из корня проекта:
+    python benchmarks/transcription_quality_benchmark.py --save-baseline
+    python benchmarks/transcription_quality_benchmark.py --baseline benchmarks/results/baseline.json
+    python benchmarks/transcription_quality_benchmark.py --paths whisper-segments --set WHISPER_OVERLAP_MS=5000 \
+        --set 'WHISPER_DECODE_OPTIONS={"temperature": 0.2}' --config whisper_model=small
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+BASELINE_FILE = os.path.join(RESULTS_DIR, 'baseline.json')
+
+# Пути транскрипции из ai_assistant.py; облачные требуют сети и ключей, поэтому не по умолчанию
+PATHS = ('whisper-segments', 'whisper-streaming', 'whisper-full', 'whisper-sharded',
+         'speech-recognition', 'openai-api')
+DEFAULT_PATHS = PATHS[:4]
+
+# Допуски при сравнении с базой: WER/CER и доля терминов - абсолютные, RTF и память - относительные
+DEFAULT_TOLERANCE = {'wer': 0.02, 'cer': 0.02, 'glossary_hit_rate': 0.05, 'rtf': 0.25, 'peak_rss_mb': 0.25}
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса и его дочерних процессов (многопроцессный путь)"""
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        if hasattr(info, 'peak_wset'):
+            return info.peak_wset / 1024 / 1024
+    except ImportError:
+        pass
+    import resource
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+# --- метрики ---
+
+def normalize_text(text):
+    """Регистр, ё и пунктуация не считаются ошибкой распознавания"""
+    text = text.lower().replace('ё', 'е')
+    return ' '.join(re.sub(r"[^\w\s]|_", ' ', text).split())
+
+
+def edit_distance(reference, hypothesis):
+    """Расстояние Левенштейна между последовательностями; строка таблицы считается целиком в numpy"""
+    if not reference:
+        return len(hypothesis)
+    if not hypothesis:
+        return len(reference)
+    vocabulary = {}
+    ref = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in reference])
+    hyp = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in hypothesis])
+
+    offsets = np.arange(len(hyp) + 1)
+    previous = offsets.copy()
+    for i, token in enumerate(ref, start=1):
+        current = np.empty_like(previous)
+        current[0] = i
+        # Удаление и замена зависят только от предыдущей строки
+        current[1:] = np.minimum(previous[1:] + 1, previous[:-1] + (hyp != token))
+        # Вставки внутри строки: current[j] = min по k <= j (current[k] + j - k)
+        previous = np.minimum.accumulate(current - offsets) + offsets
+    return int(previous[-1])
+
+
+def glossary_terms():
+    from utils.glossary import load_glossary
+
+    return sorted({normalize_text(term) for term in load_glossary().values() if normalize_text(term)})
+
+
+def count_term(text, term):
+    return len(re.findall(rf"(?<!\w){re.escape(term)}(?!\w)", text))
+
+
+def score(reference, hypothesis, terms):
+    ref, hyp = normalize_text(reference), normalize_text(hypothesis or '')
+    ref_words, hyp_words = ref.split(), hyp.split()
+    expected = found = 0
+    for term in terms:
+        in_reference = count_term(ref, term)
+        if in_reference:
+            expected += in_reference
+            found += min(in_reference, count_term(hyp, term))
+    return {
+        'ref_words': len(ref_words),
+        'word_errors': edit_distance(ref_words, hyp_words),
+        'ref_chars': len(ref),
+        'char_errors': edit_distance(ref, hyp),
+        'glossary_expected': expected,
+        'glossary_found': found,
+    }
+
+
+def summarize(rows):
+    """Метрики по набору клипов: ошибки суммируются, а не усредняются по клипам"""
+    def ratio(numerator, denominator):
+        total = sum(row[denominator] for row in rows)
+        return sum(row[numerator] for row in rows) / total if total else None
+
+    return {
+        'wer': ratio('word_errors', 'ref_words'),
+        'cer': ratio('char_errors', 'ref_chars'),
+        'glossary_hit_rate': ratio('glossary_found', 'glossary_expected'),
+        'rtf': ratio('transcribe_s', 'duration_s'),
+    }
+
+
+# --- клипы ---
+
+def load_manifest(fixtures_dir):
+    with open(os.path.join(fixtures_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)['clips']
+
+
+def read_reference(fixtures_dir, clip):
+    with open(os.path.join(fixtures_dir, clip['reference']), 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def build_synthetic(spec, sources, workdir, clip_id, sample_rate=16000, seed=0):
+    """Собирает клип из записанного; возвращает (путь к WAV, эталон) или None, если исходника нет"""
+    from utils.audio import DecodedAudio, pcm_to_wav_bytes
+
+    rng = np.random.default_rng(seed)
+    if 'noise_s' in spec:
+        samples = rng.standard_normal(int(spec['noise_s'] * sample_rate)) * 300
+        reference = ''
+    else:
+        source = sources.get(spec['source'])
+        if source is None:
+            return None
+        audio = DecodedAudio.from_file(source['audio']).resampled(sample_rate)
+        pause = np.zeros(int(spec.get('pause_s', 0) * sample_rate), dtype=np.int16)
+        repeat = spec.get('repeat', 1)
+        samples = np.concatenate([part for _ in range(repeat) for part in (audio.samples, pause)]).astype(np.float64)
+        reference = ' '.join([source['reference']] * repeat)
+        if 'snr_db' in spec:
+            signal_rms = np.sqrt(np.mean(audio.samples.astype(np.float64) ** 2)) or 1.0
+            samples += rng.standard_normal(len(samples)) * signal_rms / 10 ** (spec['snr_db'] / 20)
+
+    path = os.path.join(workdir, f"{clip_id}.wav")
+    with open(path, 'wb') as f:
+        f.write(pcm_to_wav_bytes(np.clip(samples, -32768, 32767).astype(np.int16), sample_rate))
+    return path, reference
+
+
+def prepare_clips(fixtures_dir, workdir, only=None):
+    clips, sources, missing = [], {}, []
+    manifest = load_manifest(fixtures_dir)
+    for clip in manifest:
+        if 'audio' not in clip:
+            continue
+        audio_path = os.path.join(fixtures_dir, clip['audio'])
+        if not os.path.exists(audio_path):
+            missing.append(clip['audio'])
+            continue
+        sources[clip['id']] = {'audio': audio_path, 'reference': read_reference(fixtures_dir, clip)}
+
+    for clip in manifest:
+        if 'synthetic' in clip:
+            built = build_synthetic(clip['synthetic'], sources, workdir, clip['id'])
+            if built is None:
+                continue
+            audio_path, reference = built
+        elif clip['id'] in sources:
+            audio_path, reference = sources[clip['id']]['audio'], sources[clip['id']]['reference']
+        else:
+            continue
+        if not only or clip['id'] in only:
+            clips.append({'id': clip['id'], 'audio': audio_path, 'reference': reference,
+                          'language': clip.get('language')})
+    return clips, missing
+
+
+# --- прогон пути в дочернем процессе ---
+
+def run_path(path_name, audio_path):
+    """Вызывает путь транскрипции так же, как приложение. Возвращает текст или None"""
+    import ai_assistant
+    from utils.audio import DecodedAudio
+
+    config = ai_assistant.get_ai_config()
+    model_name = config.get('whisper_model', ai_assistant.DEFAULT_WHISPER_MODEL)
+    if path_name == 'whisper-streaming':
+        # Путь к файлу вместо DecodedAudio - iter_whisper_segments читает запись потоком
+        return ai_assistant.transcribe_with_whisper_segments(audio_path, model_name)
+    if path_name == 'whisper-full':
+        return ai_assistant.transcribe_with_whisper(audio_path, model_name)
+
+    audio = DecodedAudio.from_file(audio_path)
+    if path_name == 'whisper-segments':
+        return ai_assistant.transcribe_with_whisper_segments(audio, model_name)
+    if path_name == 'whisper-sharded':
+        return ai_assistant.transcribe_with_whisper_sharded(audio, model_name)
+    if path_name == 'speech-recognition':
+        return ai_assistant.transcribe_with_speech_recognition(audio)
+    if path_name == 'openai-api':
+        return ai_assistant.transcribe_with_openai_api(audio)
+    raise ValueError(f"Неизвестный путь: {path_name}")
+
+
+def run_worker(path_name, clips_file, settings, config):
+    """Выполняется в дочернем процессе: один путь, все клипы. Вызовы st.* здесь вхолостую"""
+    import streamlit as st
+    import ai_assistant
+    from utils.audio import probe_duration
+
+    for name, value in settings.items():
+        setattr(ai_assistant, name, value)
+    st.session_state.ai_config = {**ai_assistant.load_ai_config(), **config}
+    if config.get('whisper_model') == ai_assistant.AUTO_WHISPER_MODEL:
+        raise SystemExit("Автовыбор модели делает прогоны несравнимыми - укажите модель явно")
+
+    with open(clips_file, 'r', encoding='utf-8') as f:
+        clips = json.load(f)
+
+    rows = []
+    for clip in clips:
+        st.session_state.pop('last_transcription_language', None)
+        start = time.perf_counter()
+        text = run_path(path_name, clip['audio'])
+        elapsed = time.perf_counter() - start
+        detected = st.session_state.get('last_transcription_language') or {}
+        rows.append({'clip': clip['id'], 'duration_s': probe_duration(clip['audio']), 'transcribe_s': elapsed,
+                     'failed': text is None, 'language': detected.get('language'), 'hypothesis': text or ''})
+
+    print(json.dumps({'rows': rows, 'peak_rss_mb': peak_rss_mb()}, ensure_ascii=False))
+
+
+def run_path_subprocess(path_name, clips_file, settings, config):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--paths', path_name, '--clips-file', clips_file,
+           '--settings-json', json.dumps(settings), '--config-json', json.dumps(config)]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return {'error': (result.stderr.strip().splitlines() or ['неизвестная ошибка'])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# --- сравнение с базой ---
+
+def find_regressions(current, baseline, tolerance):
+    """
+    Список регрессий: путь, клип (или 'все'), метрика, было, стало. Путь, который в базе
+    работал, а теперь падает целиком или на отдельных клипах, - тоже регрессия
+    """
+    regressions = []
+    for path_name, result in current['paths'].items():
+        base = baseline.get('paths', {}).get(path_name)
+        if not base or 'error' in base:
+            continue
+        if 'error' in result:
+            regressions.append((path_name, 'все', 'error', 'нет', result['error']))
+            continue
+
+        base_clips = {row['clip']: row for row in base['clips']}
+        for row in result['clips']:
+            if row['failed'] and row['clip'] in base_clips and not base_clips[row['clip']]['failed']:
+                regressions.append((path_name, row['clip'], 'failed', 0, 1))
+        scopes = [(row['clip'], row['metrics'], base_clips[row['clip']]['metrics'])
+                  for row in result['clips'] if row['clip'] in base_clips and not row['failed']]
+        # Итоги сравнимы, только если прогнан тот же набор клипов
+        if current['clips'] == baseline.get('clips'):
+            if result['failed'] > base['failed']:
+                regressions.append((path_name, 'все', 'failed', base['failed'], result['failed']))
+            scopes.append(('все', {**result['summary'], 'peak_rss_mb': result['peak_rss_mb']},
+                           {**base['summary'], 'peak_rss_mb': base['peak_rss_mb']}))
+
+        for scope, now, before in scopes:
+            for metric, allowed in tolerance.items():
+                if now.get(metric) is None or before.get(metric) is None:
+                    continue
+                if metric == 'glossary_hit_rate':
+                    worse = now[metric] < before[metric] - allowed
+                elif metric in ('rtf', 'peak_rss_mb'):
+                    worse = now[metric] > before[metric] * (1 + allowed)
+                else:
+                    worse = now[metric] > before[metric] + allowed
+                if worse:
+                    regressions.append((path_name, scope, metric, before[metric], now[metric]))
+    return regressions
+
+
+def parse_assignments(values, what):
+    """NAME=VALUE; значение разбирается как JSON, а если не разбирается - остается строкой"""
+    parsed = {}
+    for item in values:
+        name, sep, value = item.partition('=')
+        if not sep:
+            raise SystemExit(f"{what}: ожидается ИМЯ=ЗНАЧЕНИЕ, получено {item}")
+        try:
+            parsed[name] = json.loads(value)
+        except json.JSONDecodeError:
+            parsed[name] = value
+    return parsed
+
+
+def format_metric(value, digits=3):
+    if isinstance(value, str):
+        return value
+    return f"{value:.{digits}f}" if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость и точность путей транскрипции на эталонных записях")
+    parser.add_argument('--paths', nargs='+', default=list(DEFAULT_PATHS), choices=PATHS)
+    parser.add_argument('--clips', nargs='+', help="Только эти клипы из манифеста")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help="Папка с manifest.json")
+    parser.add_argument('--set', dest='settings', action='append', default=[],
+                        help="Переопределить константу ai_assistant: WHISPER_SEGMENT_MS=15000")
+    parser.add_argument('--config', action='append', default=[],
+                        help="Переопределить настройку AI: whisper_model=small")
+    parser.add_argument('--baseline', help="Сравнить с базой и вернуть код 1 при регрессии")
+    parser.add_argument('--save-baseline', action='store_true', help=f"Сохранить прогон как базу ({BASELINE_FILE})")
+    parser.add_argument('--json', dest='json_path', help="Куда сохранить результаты (по умолчанию benchmarks/results)")
+    for metric, allowed in DEFAULT_TOLERANCE.items():
+        parser.add_argument(f"--max-{metric.replace('_', '-')}-change", type=float, default=allowed, dest=metric,
+                            help=f"Допуск для {metric} (по умолчанию {allowed})")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--clips-file', help=argparse.SUPPRESS)
+    parser.add_argument('--settings-json', default='{}', help=argparse.SUPPRESS)
+    parser.add_argument('--config-json', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.paths[0], args.clips_file, json.loads(args.settings_json), json.loads(args.config_json))
+        return
+
+    settings = parse_assignments(args.settings, '--set')
+    config = parse_assignments(args.config, '--config')
+    workdir = tempfile.mkdtemp(prefix='transcription-bench-')
+    clips, missing = prepare_clips(args.fixtures, workdir, args.clips)
+    for name in missing:
+        print(f"Нет записи {name}: прочитайте вслух одноименный .txt и сохраните рядом в WAV")
+    if not clips:
+        print("Нет ни одного клипа для прогона")
+        sys.exit(2)
+
+    clips_file = os.path.join(workdir, 'clips.json')
+    with open(clips_file, 'w', encoding='utf-8') as f:
+        json.dump(clips, f, ensure_ascii=False)
+
+    terms = glossary_terms()
+    references = {clip['id']: clip['reference'] for clip in clips}
+    report = {'timestamp': datetime.now().isoformat(), 'settings': settings, 'config': config,
+              'clips': [clip['id'] for clip in clips], 'paths': {}}
+
+    for path_name in args.paths:
+        print(f"{path_name}...", flush=True)
+        result = run_path_subprocess(path_name, clips_file, settings, config)
+        if 'error' in result:
+            report['paths'][path_name] = result
+            continue
+        rows = []
+        for row in result['rows']:
+            row.update(score(references[row['clip']], row['hypothesis'], terms))
+            row['metrics'] = summarize([row])
+            rows.append(row)
+        report['paths'][path_name] = {'summary': summarize([row for row in rows if not row['failed']]),
+                                      'failed': sum(1 for row in rows if row['failed']),
+                                      'peak_rss_mb': result['peak_rss_mb'], 'clips': rows}
+
+    print(f"\n{'путь':<20} {'RTF':>7} {'WER':>7} {'CER':>7} {'словарь':>8} {'пик RSS, МБ':>12} {'сбоев':>6}")
+    for path_name, result in report['paths'].items():
+        if 'error' in result:
+            print(f"{path_name:<20} ошибка: {result['error']}")
+            continue
+        summary = result['summary']
+        print(f"{path_name:<20} {format_metric(summary['rtf']):>7} {format_metric(summary['wer']):>7} "
+              f"{format_metric(summary['cer']):>7} {format_metric(summary['glossary_hit_rate'], 2):>8} "
+              f"{result['peak_rss_mb']:>12.0f} {result['failed']:>6}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    json_path = args.json_path or os.path.join(RESULTS_DIR, f"transcription-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nРезультаты: {json_path}")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"База сохранена: {BASELINE_FILE}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline.get('settings'), baseline.get('config')) != (settings, config):
+            print("Внимание: база снята с другими --set/--config")
+        tolerance = {metric: getattr(args, metric) for metric in DEFAULT_TOLERANCE}
+        regressions = find_regressions(report, baseline, tolerance)
+        if regressions:
+            print(f"\nРегрессии относительно {args.baseline}:")
+            for path_name, scope, metric, before, now in regressions:
+                digits = 0 if metric == 'failed' else 3
+                print(f"  {path_name} / {scope}: {metric} {format_metric(before, digits)} -> {format_metric(now, digits)}")
+            sys.exit(1)
+        print("Регрессий относительно базы нет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+﻿"""
+Командная строка для задач без интерфейса: публикация элемента очереди и транскрипция,
+обе - с профилированием по флагу --profile. Профиль сохраняется рядом с записью задачи
+и виден в деталях элемента очереди; здесь же его можно посмотреть командой profile.
+
+Запуск из корня проекта:
+    python cli.py publish <id элемента очереди> --profile
+    python cli.py transcribe video.mp4 --profile
+    python cli.py profile queue/<id>_profile.json --top 30 --folded publish.folded
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def print_profile(path, limit):
+    from utils.profiler import load_profile, top_functions
+
+    profile = load_profile(path)
+    if profile is None:
+        print(f"Профиль не найден: {path}")
+        return
+    print(f"\nПрофиль {path}: {profile['duration_s']:.1f} с, {profile['samples']} снимков, "
+          f"накладные расходы {profile['overhead_pct']}%")
+    print(f"{'своё, %':>8} {'всего, %':>9} {'своё, с':>8} {'всего, с':>9}  функция")
+    for row in top_functions(profile, limit):
+        print(f"{row['self_pct']:>8.1f} {row['total_pct']:>9.1f} {row['self_s']:>8.2f} {row['total_s']:>9.2f}  "
+              f"{row['function']}")
+
+
+def cmd_publish(args):
+    from main import load_platforms_config
+    from queue_manager import get_queue_item, publish_queue_item
+
+    item = get_queue_item(args.item_id)
+    if item is None:
+        print(f"Элемент очереди не найден: {args.item_id}")
+        return 1
+    if not os.path.exists(item['video_path']):
+        print(f"Видео файл не найден: {item['video_path']}")
+        return 1
+
+    upload_status = {}
+    publish_queue_item(item, args.profile, load_platforms_config(), upload_status)
+    for platform, status in upload_status[f"queue_{item['id']}"]['platforms'].items():
+        print(f"{platform}: {status}")
+
+    item = get_queue_item(args.item_id)
+    print(f"Статус: {item['status']}")
+    if args.profile:
+        print_profile(item['profile_path'], args.top)
+    return 0 if item['status'] == 'completed' else 1
+
+
+def cmd_transcribe(args):
+    from ai_assistant import is_ai_configured
+    from transcription_jobs import _run_job, create_transcription_job, load_job
+
+    if not is_ai_configured():
+        print("AI не настроен: задайте ключ OpenAI в настройках приложения")
+        return 1
+    with open(args.video, 'rb') as f:
+        job_id = create_transcription_job(f.read(), os.path.basename(args.video), args.profile)
+
+    # Без пула: задача выполняется в этом процессе, файл задачи тот же, что у фоновой
+    _run_job(job_id)
+    job = load_job(job_id)
+    if job['status'] == 'done':
+        print(job['transcript'])
+    else:
+        print(f"Ошибка транскрипции: {job.get('error')}")
+    print(f"\nЗадача: {job_id}")
+    if args.profile:
+        print_profile(job['profile_path'], args.top)
+    return 0 if job['status'] == 'done' else 1
+
+
+def cmd_profile(args):
+    from utils.profiler import folded_stacks, load_profile
+
+    print_profile(args.path, args.top)
+    if args.folded:
+        profile = load_profile(args.path)
+        if profile is not None:
+            with open(args.folded, 'w', encoding='utf-8') as f:
+                f.write(folded_stacks(profile))
+            print(f"\nСтеки для flame graph: {args.folded} (speedscope.app или flamegraph.pl)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Публикация и транскрипция из командной строки")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    publish = subparsers.add_parser('publish', help="Опубликовать элемент очереди")
+    publish.add_argument('item_id')
+    publish.set_defaults(func=cmd_publish)
+
+    transcribe = subparsers.add_parser('transcribe', help="Транскрибировать видео")
+    transcribe.add_argument('video')
+    transcribe.set_defaults(func=cmd_transcribe)
+
+    for command in (publish, transcribe):
+        command.add_argument('--profile', action='store_true', help="Выполнить под семплирующим профилировщиком")
+        command.add_argument('--top', type=int, default=20, help="Сколько функций показать из профиля")
+
+    profile = subparsers.add_parser('profile', help="Показать сохраненный профиль")
+    profile.add_argument('path')
+    profile.add_argument('--top', type=int, default=30)
+    profile.add_argument('--folded', help="Сохранить свернутые стеки для flame graph")
+    profile.set_defaults(func=cmd_profile)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
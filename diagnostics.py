@@ -0,0 +1,112 @@
+﻿import os
+
+import streamlit as st
+
+from utils.profiler import folded_stacks, load_profile, top_functions
+from utils.tracing import TRACE_FILE, is_failed, read_spans, recent_traces, since_hours, summarize_spans
+
+# Период -> часы (None - весь журнал)
+PERIODS = {
+    "Последний час": 1,
+    "Сутки": 24,
+    "Неделя": 24 * 7,
+    "Весь журнал": None,
+}
+
+
+def format_duration(seconds):
+    if seconds >= 60:
+        return f"{seconds / 60:.1f} мин"
+    if seconds >= 1:
+        return f"{seconds:.1f} с"
+    return f"{seconds * 1000:.0f} мс"
+
+
+def show_stage_summary(spans):
+    rows = summarize_spans(spans)
+    st.subheader("⏱️ Этапы")
+    st.caption("Время по этапам публикации и обработки; сортировка по суммарному времени")
+    st.dataframe(
+        [{
+            'Этап': row['stage'],
+            'Вызовов': row['count'],
+            'Ошибок': row['errors'],
+            'p50': format_duration(row['p50_s']),
+            'p95': format_duration(row['p95_s']),
+            'Максимум': format_duration(row['max_s']),
+            'Всего': format_duration(row['total_s']),
+        } for row in rows],
+        width='stretch',
+        hide_index=True,
+    )
+
+
+def show_recent_publishes(spans):
+    traces = recent_traces(spans)
+    st.subheader("🧾 Последние публикации")
+    if not traces:
+        st.info("Публикаций за период нет")
+        return
+
+    for trace in traces:
+        icon = "❌" if is_failed(trace) or any(is_failed(child) for child in trace['children']) else "✅"
+        name = trace.get('item_id') or trace.get('video_id') or trace['trace_id']
+        with st.expander(f"{icon} {trace['stage']} · {name} · {format_duration(trace['duration_s'])} · "
+                         f"{trace['timestamp'][:19].replace('T', ' ')}"):
+            if trace.get('error'):
+                st.error(trace['error'])
+            st.dataframe(
+                [{
+                    'Начало': child['timestamp'][11:19],
+                    'Этап': child['stage'],
+                    'Платформа': child.get('platform', ''),
+                    'Длительность': format_duration(child['duration_s']),
+                    'Итог': child.get('outcome') or child['status'],
+                    'Ошибка': child.get('error') or child.get('detail') or '',
+                } for child in sorted(trace['children'], key=lambda child: child['timestamp'])],
+                width='stretch',
+                hide_index=True,
+            )
+
+
+def show_profile(path, key, limit=20):
+    """Профиль задачи: самые дорогие функции и выгрузка стеков для flame graph"""
+    profile = load_profile(path)
+    if profile is None:
+        st.info("Профиль еще не записан")
+        return
+
+    # Фактический шаг снимков больше заданного, когда профилируемый код держит GIL
+    step_s = profile['duration_s'] / (profile['samples'] or 1)
+    st.caption(f"{format_duration(profile['duration_s'])}, {profile['samples']} снимков "
+               f"(в среднем раз в {format_duration(step_s)}), накладные расходы {profile['overhead_pct']}%")
+    st.dataframe(
+        [{
+            'Функция': row['function'],
+            'Своё, %': row['self_pct'],
+            'Всего, %': row['total_pct'],
+            'Своё': format_duration(row['self_s']),
+            'Всего': format_duration(row['total_s']),
+        } for row in top_functions(profile, limit)],
+        width='stretch',
+        hide_index=True,
+    )
+    st.download_button("🔥 Стеки для flame graph", folded_stacks(profile),
+                       file_name=f"{os.path.splitext(os.path.basename(path))[0]}.folded", key=f"{key}_download",
+                       help="Свернутые стеки: откройте в speedscope.app или flamegraph.pl")
+
+
+def show_diagnostics_tab():
+    st.header("🩺 Диагностика")
+    st.markdown("Куда уходит время при публикации: замеры этапов из журнала трассировки")
+
+    period = st.selectbox("Период", list(PERIODS), index=1, key="diagnostics_period")
+    hours = PERIODS[period]
+    spans = read_spans(since_hours(hours) if hours else None)
+
+    if not spans:
+        st.info(f"Замеров пока нет. Они появятся после первой публикации ({TRACE_FILE})")
+        return
+
+    show_stage_summary(spans)
+    show_recent_publishes(spans)
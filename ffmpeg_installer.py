@@ -1,18 +1,16 @@
 ﻿import streamlit as st
-import subprocess
 import requests
 import zipfile
 import os
 import shutil
 
+from utils.capabilities import get_capabilities, refresh_capabilities
 
-def check_ffmpeg_installation():
-    """Проверяет, установлен ли FFmpeg"""
-    try:
-        result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-        return True, result.stdout.split('\n')[0]
-    except FileNotFoundError:
-        return False, "FFmpeg не найден"
+
+def check_ffmpeg_installation(refresh=False):
+    """Проверяет, установлен ли FFmpeg (по кэшу фоновой проверки окружения)"""
+    capabilities = refresh_capabilities() if refresh else get_capabilities(wait=True)
+    return capabilities['methods']['ffmpeg'], capabilities['ffmpeg_version']
 
 
 def download_ffmpeg_windows():
@@ -54,6 +52,7 @@ def download_ffmpeg_windows():
                 os.remove(zip_path)
                 shutil.rmtree(ffmpeg_folder)
 
+                check_ffmpeg_installation(refresh=True)
                 return True
 
         st.error("❌ Ошибка установки FFmpeg")
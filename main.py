@@ -8,16 +8,19 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from uploaders.youtube import YouTubeUploader
-    from uploaders.tiktok import TikTokUploader
-    from uploaders.instagram import InstagramUploader
+    from utils.lazy_imports import lazy_class, is_module_loaded
+    from utils.capabilities import start_capability_probe
     from utils.VideoProcessor import VideoProcessor
     from utils.config import Config
     from queue_manager import add_to_queue, show_queue_tab, load_queue, remove_from_queue, publish_from_queue
     from stories_manager import show_stories_tab, add_to_stories, load_stories, remove_from_stories, publish_story
     from default_settings import show_default_settings_tab, get_default_video_settings, get_default_stream_settings
-    from ai_assistant import show_ai_config, get_ai_config, is_ai_configured, process_video_with_ai, \
-        generate_content_from_transcript
+    from ai_assistant import show_ai_config, get_ai_config, is_ai_configured, \
+        generate_content_from_transcript_stream, start_early_generation
+    from transcription_jobs import submit_transcription_job, get_transcription_job, load_partial_transcript, \
+        ACTIVE_STATUSES
+    from utils.tracing import annotate, span, traced
+    from diagnostics import show_diagnostics_tab, show_profile
 except ImportError as e:
     st.error(f"Ошибка импорта модулей: {e}")
     st.error("Убедитесь что все файлы находятся в правильных папках")
@@ -56,9 +59,15 @@ def save_platforms_config(config):
         st.error(f"Ошибка сохранения конфигурации: {e}")
 
 
+def close_tiktok_browser():
+    # Если модуль TikTok не загружался, браузер гарантированно не запущен
+    if is_module_loaded('uploaders.tiktok'):
+        lazy_class('TikTokUploader').close_browser()
+
+
 def test_youtube_connection(client_id, client_secret):
     try:
-        uploader = YouTubeUploader()
+        uploader = lazy_class('YouTubeUploader')()
         result = uploader.authenticate(client_id, client_secret)
         if result:
             st.success("YouTube API успешно подключен!")
@@ -77,7 +86,7 @@ def test_tiktok_connection(username, password):
         st.info("💡 **Если увидите QR код - отсканируйте его телефоном!**")
         st.info("📱 Или используйте любой другой способ входа в браузере")
 
-        uploader = TikTokUploader()
+        uploader = lazy_class('TikTokUploader')()
         result = uploader.login(username, password)
 
         if result:
@@ -110,7 +119,7 @@ def test_tiktok_connection(username, password):
 
 def test_instagram_connection(username, password):
     try:
-        uploader = InstagramUploader()
+        uploader = lazy_class('InstagramUploader')()
         result = uploader.login(username, password)
         if result:
             st.success("Instagram аккаунт успешно подключен!")
@@ -273,6 +282,144 @@ def show_instagram_config():
             st.rerun()
 
 
+def show_generation_stats():
+    stats = st.session_state.get('last_generation_stats')
+    if not stats:
+        return
+    if stats['chunks']:
+        st.caption(f"📉 Транскрипция {stats['input_tokens']} → {stats['output_tokens']} токенов "
+                   f"({stats['chunks']} частей), {stats['end_to_end_s']:.1f} с")
+    else:
+        st.caption(f"⏱️ {stats['input_tokens']} токенов, {stats['end_to_end_s']:.1f} с")
+    if stats.get('failed_chunks'):
+        st.caption(f"⚠️ Не удалось пересказать частей: {stats['failed_chunks']}, пересказ неполный")
+    if stats.get('first_token_s') is not None:
+        st.caption(f"⚡ Первый токен через {stats['first_token_s']:.1f} с")
+
+
+def request_generation(content_type, force_new=False):
+    """Запоминает запрос на генерацию; токены выводятся в поле под соответствующим вводом"""
+    if not st.session_state.get('video_transcript'):
+        st.error("❌ Сначала создайте транскрипцию видео!")
+        return
+    st.session_state.pending_generation = {'content_type': content_type, 'force_new': force_new}
+
+
+def run_pending_generation(placeholder, content_types):
+    """Стримит ответ модели в placeholder, если запрошена генерация одного из content_types"""
+    pending = st.session_state.get('pending_generation')
+    if not pending or pending['content_type'] not in content_types:
+        return
+
+    st.session_state.pending_generation = None
+    content_type = pending['content_type']
+    title = description = None
+
+    for title, description in generate_content_from_transcript_stream(
+            st.session_state.video_transcript, content_type, force_new=pending['force_new'],
+            timestamped=st.session_state.get('video_transcript_segments')):
+        shown = [text for text in (title, description) if text]
+        if shown:
+            placeholder.info("\n\n".join(shown) + " ▌")
+
+    placeholder.empty()
+    if title:
+        st.session_state.generated_title = title
+    if description:
+        st.session_state.generated_description = description
+    if title or description:
+        st.rerun()
+
+
+# Как часто страница опрашивает фоновую транскрипцию
+JOB_POLL_INTERVAL_S = 2
+
+
+def show_early_generation(job_id, wait=False):
+    """Результат ранней генерации по первым N минутам; с wait=True дожидается его"""
+    early = st.session_state.early_generation
+    if early is None or early['job_id'] != job_id:
+        return None, None
+    if not wait and not early['future'].done():
+        st.caption(f"🤖 Генерируем название и описание по первым {early['minutes']} мин...")
+        return None, None
+    try:
+        title_ai, desc_ai = early['future'].result()
+    except Exception as e:
+        st.warning(f"Ранняя генерация не удалась: {e}")
+        return None, None
+    if title_ai:
+        st.success(f"🤖 По первым {early['minutes']} мин: {title_ai}")
+    return title_ai, desc_ai
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_S)
+def poll_transcription_job(job_id):
+    """
+    Прогресс фоновой транскрипции. Фрагмент перерисовывается по таймеру отдельно
+    от страницы; когда задача завершается, перезапускает всю страницу за результатом
+    """
+    job = get_transcription_job(job_id)
+    if job is None or job['status'] not in ACTIVE_STATUSES:
+        st.rerun()
+
+    if job['status'] == 'queued':
+        st.info("⏳ Транскрипция ждет очереди...")
+        return
+
+    processed_s = job.get('processed_s', 0)
+    st.progress(job.get('progress', 0.0), text=f"🎵 Создаем транскрипцию: {processed_s / 60:.1f} мин")
+    partial = load_partial_transcript(job_id)
+    if partial:
+        st.info(f"📝 {processed_s / 60:.1f} мин: ...{partial[-500:]}")
+
+    early_minutes = get_ai_config().get('early_generation_minutes', 0)
+    if early_minutes and st.session_state.early_generation is None and processed_s >= early_minutes * 60:
+        st.session_state.early_generation = {'job_id': job_id, 'minutes': early_minutes,
+                                             'future': start_early_generation(partial)}
+    show_early_generation(job_id)
+
+
+def show_transcription_job(job_id):
+    """
+    Фоновая транскрипция, id которой записан в адресе страницы (?transcription_job=...).
+    Переживает перезагрузку: готовый результат забирается из файла задачи
+    """
+    job = get_transcription_job(job_id)
+    if job is None:
+        del st.query_params['transcription_job']
+        return
+
+    if job['status'] in ACTIVE_STATUSES:
+        poll_transcription_job(job_id)
+        return
+
+    if job['status'] == 'error':
+        st.error(f"Ошибка транскрипции: {job.get('error')}")
+        return
+
+    if st.session_state.video_transcript_job != job_id:
+        st.session_state.video_transcript = job['transcript']
+        st.session_state.video_transcript_segments = job.get('segments')
+        st.session_state.video_language = job.get('language')
+        st.session_state.video_transcript_job = job_id
+
+        # Ранний вариант сразу попадает в предложения; 🔁 сгенерирует по полной транскрипции
+        title_ai, desc_ai = show_early_generation(job_id, wait=True)
+        if title_ai:
+            st.session_state.generated_title = title_ai
+        if desc_ai:
+            st.session_state.generated_description = desc_ai
+        st.session_state.early_generation = None
+
+    st.success("✅ Транскрипция готова!")
+    with st.expander("📝 Просмотр транскрипции", expanded=False):
+        st.text_area("Транскрипция:", value=job['transcript'], height=100, disabled=True)
+    if job.get('profile_path'):
+        with st.expander("🔬 Профиль транскрипции", expanded=False):
+            show_profile(job['profile_path'], key=f"transcription_profile_{job_id}")
+
+
 def show_upload_tab():
     config = st.session_state.platforms_config
 
@@ -352,7 +499,7 @@ def show_upload_tab():
         with col1:
             if st.button("🔄 Перезапустить TikTok браузер", help="Закрывает и создает новый браузер TikTok"):
                 try:
-                    TikTokUploader.close_browser()
+                    close_tiktok_browser()
                     st.success("Браузер TikTok перезапущен!")
                 except Exception as e:
                     st.error(f"Ошибка: {e}")
@@ -360,7 +507,7 @@ def show_upload_tab():
         with col2:
             if st.button("❌ Закрыть все браузеры", help="Закрывает все открытые браузеры"):
                 try:
-                    TikTokUploader.close_browser()
+                    close_tiktok_browser()
                     st.success("Все браузеры закрыты!")
                 except Exception as e:
                     st.error(f"Ошибка: {e}")
@@ -376,31 +523,25 @@ def show_upload_tab():
             help="Поддерживаемые форматы: MP4, MOV, AVI, MKV"
         )
 
+        # Транскрипция идет в фоне: страница не блокируется, а перезагрузка ее не прерывает
+        if st.query_params.get('transcription_job'):
+            show_transcription_job(st.query_params['transcription_job'])
+
         if uploaded_file:
             col_video1, col_video2, col_video3 = st.columns([1, 1, 2])
             with col_video1:
                 st.video(uploaded_file, start_time=0)
 
             # Кнопка транскрипции
+            profile_transcription = st.checkbox("🔬 Профилировать транскрипцию", key="profile_transcription",
+                                                help="Записать профиль: где тратится время при распознавании")
             if st.button("🎵 Создать транскрипцию", help="Извлечь текст из аудиодорожки видео"):
                 if is_ai_configured():
-                    temp_video_path = f"temp/temp_analysis_{int(time.time())}.mp4"
-                    os.makedirs('temp', exist_ok=True)
-
-                    with open(temp_video_path, "wb") as f:
-                        f.write(uploaded_file.getvalue())
-
-                    try:
-                        with st.spinner("Создаем транскрипцию..."):
-                            transcript, _, _ = process_video_with_ai(temp_video_path)
-                            if transcript:
-                                st.session_state.video_transcript = transcript
-                                st.success("✅ Транскрипция готова!")
-                                with st.expander("📝 Просмотр транскрипции", expanded=False):
-                                    st.text_area("Транскрипция:", value=transcript, height=100, disabled=True)
-                    finally:
-                        if os.path.exists(temp_video_path):
-                            os.remove(temp_video_path)
+                    job_id = submit_transcription_job(uploaded_file.getvalue(), uploaded_file.name,
+                                                      profile_transcription)
+                    st.query_params['transcription_job'] = job_id
+                    st.session_state.early_generation = None
+                    st.rerun()
                 else:
                     st.warning("🤖 ChatGPT не подключен. Настройте в боковой панели для AI функций.")
 
@@ -432,23 +573,23 @@ def show_upload_tab():
                     if st.button("🤖", key="generate_title_btn",
                                  help="Сгенерировать название" if ai_configured else "Настройте ChatGPT в боковой панели",
                                  disabled=not ai_configured):
-                        if st.session_state.get('video_transcript'):
-                            with st.spinner("Генерируем название..."):
-                                title_ai, _ = generate_content_from_transcript(
-                                    st.session_state.video_transcript, "title"
-                                )
-                                if title_ai:
-                                    st.session_state.generated_title = title_ai
-                                    st.rerun()
-                        else:
-                            st.error("❌ Сначала создайте транскрипцию видео!")
+                        request_generation("title")
+                    if st.button("✨", key="generate_both_btn",
+                                 help="Сгенерировать название и описание" if ai_configured else "Настройте ChatGPT в боковой панели",
+                                 disabled=not ai_configured):
+                        request_generation("both")
+
+                # Сюда выводятся токены названия по мере генерации
+                title_stream = st.empty()
+                run_pending_generation(title_stream, ("title", "both"))
 
                 # Показываем предложенное название, если есть
                 if st.session_state.get('generated_title'):
                     st.success("✅ Предложенное название:")
                     st.info(st.session_state.generated_title)
+                    show_generation_stats()
 
-                    col_confirm1, col_confirm2 = st.columns(2)
+                    col_confirm1, col_confirm2, col_confirm3 = st.columns(3)
                     with col_confirm1:
                         if st.button("✅ Принять", key="accept_title"):
                             # Очищаем сгенерированное и обновляем поле
@@ -458,6 +599,12 @@ def show_upload_tab():
                         if st.button("❌ Отмена", key="decline_title"):
                             st.session_state.generated_title = ""
                             st.rerun()
+                    with col_confirm3:
+                        # Повторный клик по 🤖 вернет тот же ответ из кэша, здесь кэш игнорируется
+                        if st.button("🔁 Другой вариант", key="regenerate_title"):
+                            st.session_state.generated_title = ""
+                            request_generation("title", force_new=True)
+                            st.rerun()
 
                 # ОПИСАНИЕ
                 st.write("**Описание:**")
@@ -477,23 +624,18 @@ def show_upload_tab():
                     if st.button("🤖", key="generate_desc_btn",
                                  help="Сгенерировать описание" if ai_configured else "Настройте ChatGPT в боковой панели",
                                  disabled=not ai_configured):
-                        if st.session_state.get('video_transcript'):
-                            with st.spinner("Генерируем описание..."):
-                                _, desc_ai = generate_content_from_transcript(
-                                    st.session_state.video_transcript, "description"
-                                )
-                                if desc_ai:
-                                    st.session_state.generated_description = desc_ai
-                                    st.rerun()
-                        else:
-                            st.error("❌ Сначала создайте транскрипцию видео!")
+                        request_generation("description")
+
+                desc_stream = st.empty()
+                run_pending_generation(desc_stream, ("description",))
 
                 # Показываем предложенное описание, если есть
                 if st.session_state.get('generated_description'):
                     st.success("✅ Предложенное описание:")
                     st.info(st.session_state.generated_description)
+                    show_generation_stats()
 
-                    col_confirm1, col_confirm2 = st.columns(2)
+                    col_confirm1, col_confirm2, col_confirm3 = st.columns(3)
                     with col_confirm1:
                         if st.button("✅ Принять", key="accept_desc"):
                             # Добавляем к текущему описанию
@@ -506,6 +648,11 @@ def show_upload_tab():
                         if st.button("❌ Отмена", key="decline_desc"):
                             st.session_state.generated_description = ""
                             st.rerun()
+                    with col_confirm3:
+                        if st.button("🔁 Другой вариант", key="regenerate_desc"):
+                            st.session_state.generated_description = ""
+                            request_generation("description", force_new=True)
+                            st.rerun()
 
                 tags = st.text_input("Теги (через запятую)",
                                      value=default_settings['tags'])
@@ -576,7 +723,9 @@ def show_upload_tab():
                             try:
                                 queue_id = add_to_queue(
                                     uploaded_file, final_title, final_description, tags,
-                                    category, privacy, thumbnail, selected_platforms, made_for_kids
+                                    category, privacy, thumbnail, selected_platforms, made_for_kids,
+                                    transcript=st.session_state.get('video_transcript'),
+                                    language=st.session_state.get('video_language')
                                 )
                                 st.success(f"✅ Добавлено в очередь! ID: {queue_id[:8]}")
                                 st.info("📋 Откройте менеджер очереди для управления")
@@ -608,8 +757,10 @@ def show_upload_tab():
             st.info("Загрузок пока нет")
 
 
+@traced('publish.item', source='upload')
 def upload_video(file, title, description, tags, category, privacy, thumbnail, platforms, made_for_kids):
     video_id = f"video_{int(time.time())}"
+    annotate(video_id=video_id, platforms=platforms)
     config = st.session_state.platforms_config
 
     st.session_state.upload_status[video_id] = {
@@ -632,10 +783,10 @@ def upload_video(file, title, description, tags, category, privacy, thumbnail, p
     for platform in platforms:
         st.session_state.upload_status[video_id]['platforms'][platform] = "uploading"
 
-        with st.spinner(f"Загружаем на {platform}..."):
+        with st.spinner(f"Загружаем на {platform}..."), span('publish.platform', platform=platform) as platform_span:
             try:
                 if platform == "YouTube":
-                    uploader = YouTubeUploader()
+                    uploader = lazy_class('YouTubeUploader')()
                     uploader.authenticate(
                         config['youtube']['client_id'],
                         config['youtube']['client_secret']
@@ -644,7 +795,7 @@ def upload_video(file, title, description, tags, category, privacy, thumbnail, p
 
                 elif platform == "TikTok":
                     processed_video = processor.prepare_for_tiktok(temp_path)
-                    uploader = TikTokUploader()
+                    uploader = lazy_class('TikTokUploader')()
 
                     if not uploader._check_logged_in():
                         st.warning("⚠️ Сессия TikTok истекла, выполняется повторный вход...")
@@ -668,7 +819,7 @@ def upload_video(file, title, description, tags, category, privacy, thumbnail, p
 
                 elif platform == "Instagram":
                     processed_video = processor.prepare_for_instagram(temp_path)
-                    uploader = InstagramUploader()
+                    uploader = lazy_class('InstagramUploader')()
                     uploader.login(config['instagram']['username'], config['instagram']['password'])
 
                     instagram_caption = f"{title}\n\n{description}"
@@ -678,13 +829,16 @@ def upload_video(file, title, description, tags, category, privacy, thumbnail, p
 
                 if result:
                     st.session_state.upload_status[video_id]['platforms'][platform] = "success"
+                    platform_span['outcome'] = 'success'
                     st.success(f"✅ {platform}: Загружено успешно!")
                 else:
                     st.session_state.upload_status[video_id]['platforms'][platform] = "error"
+                    platform_span['outcome'] = 'error'
                     st.error(f"❌ {platform}: Ошибка загрузки")
 
             except Exception as e:
                 st.session_state.upload_status[video_id]['platforms'][platform] = "error"
+                platform_span.update(outcome='error', detail=str(e))
                 st.error(f"❌ Ошибка загрузки на {platform}: {str(e)}")
 
             time.sleep(1)
@@ -720,13 +874,25 @@ def init_session_state():
         st.session_state.editing_item = None
     if 'video_transcript' not in st.session_state:
         st.session_state.video_transcript = None
+    if 'video_transcript_segments' not in st.session_state:
+        st.session_state.video_transcript_segments = None
+    if 'video_language' not in st.session_state:
+        st.session_state.video_language = None
     if 'generated_title' not in st.session_state:
         st.session_state.generated_title = ""
     if 'generated_description' not in st.session_state:
         st.session_state.generated_description = ""
+    if 'pending_generation' not in st.session_state:
+        st.session_state.pending_generation = None
+    if 'video_transcript_job' not in st.session_state:
+        st.session_state.video_transcript_job = None
+    if 'early_generation' not in st.session_state:
+        st.session_state.early_generation = None
 
 
 def main():
+    # Проверка окружения (ffmpeg, whisper...) идет в фоне и не задерживает отрисовку
+    start_capability_probe()
     init_session_state()
 
     st.title("🎥 Multi-Platform Video Uploader")
@@ -750,7 +916,8 @@ def main():
         show_ai_config()
         return
 
-    tab1, tab2, tab3, tab4 = st.tabs(["📤 Загрузка", "📋 Очередь", "📺 Stream Notification", "⚙️ Default Settings"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📤 Загрузка", "📋 Очередь", "📺 Stream Notification",
+                                             "⚙️ Default Settings", "🩺 Диагностика"])
 
     with tab1:
         show_upload_tab()
@@ -764,13 +931,16 @@ def main():
     with tab4:
         show_default_settings_tab()
 
+    with tab5:
+        show_diagnostics_tab()
+
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
         print("Закрытие приложения...")
-        TikTokUploader.close_browser()
+        close_tiktok_browser()
     except Exception as e:
         print(f"Ошибка приложения: {e}")
-        TikTokUploader.close_browser()
\ No newline at end of file
+        close_tiktok_browser()
\ No newline at end of file
@@ -6,10 +6,12 @@ import time
 from datetime import datetime
 
 try:
-    from uploaders.youtube import YouTubeUploader
-    from uploaders.tiktok import TikTokUploader
-    from uploaders.instagram import InstagramUploader
+    from utils.lazy_imports import lazy_class
     from utils.VideoProcessor import VideoProcessor
+    from ai_assistant import is_ai_configured, process_video_with_ai, generate_metadata_batch
+    from utils.tracing import annotate, span, traced
+    from utils.profiler import profile_path_for, run_profiled
+    from diagnostics import show_profile
 except ImportError as e:
     st.error(f"Ошибка импорта модулей: {e}")
 
@@ -17,6 +19,7 @@ QUEUE_DIR = "queue"
 QUEUE_FILE = "queue/queue.json"
 
 
+@traced('queue.load')
 def load_queue():
     try:
         if os.path.exists(QUEUE_FILE):
@@ -27,6 +30,7 @@ def load_queue():
     return []
 
 
+@traced('queue.save')
 def save_queue(queue_data):
     try:
         os.makedirs(QUEUE_DIR, exist_ok=True)
@@ -36,7 +40,8 @@ def save_queue(queue_data):
         st.error(f"Ошибка сохранения очереди: {e}")
 
 
-def add_to_queue(file, title, description, tags, category, privacy, thumbnail, platforms, made_for_kids):
+def add_to_queue(file, title, description, tags, category, privacy, thumbnail, platforms, made_for_kids,
+                 transcript=None, language=None):
     queue_item_id = str(uuid.uuid4())
 
     os.makedirs(QUEUE_DIR, exist_ok=True)
@@ -62,6 +67,8 @@ def add_to_queue(file, title, description, tags, category, privacy, thumbnail, p
         'made_for_kids': made_for_kids,
         'video_path': video_path,
         'thumbnail_path': thumbnail_path,
+        'transcript': transcript,
+        'language': language,
         'created_at': datetime.now().isoformat(),
         'status': 'pending'
     }
@@ -88,6 +95,8 @@ def remove_from_queue(queue_item_id):
                 os.remove(item_to_remove['video_path'])
             if item_to_remove.get('thumbnail_path') and os.path.exists(item_to_remove['thumbnail_path']):
                 os.remove(item_to_remove['thumbnail_path'])
+            if item_to_remove.get('profile_path') and os.path.exists(item_to_remove['profile_path']):
+                os.remove(item_to_remove['profile_path'])
         except Exception as e:
             st.error(f"Ошибка удаления файлов: {e}")
 
@@ -97,6 +106,7 @@ def remove_from_queue(queue_item_id):
     return False
 
 
+@traced('queue.update_status')
 def update_queue_item_status(queue_item_id, status):
     queue = load_queue()
     for item in queue:
@@ -106,6 +116,142 @@ def update_queue_item_status(queue_item_id, status):
     save_queue(queue)
 
 
+def update_queue_item_ledger(queue_item_id, platform, status, media_id=None, duration_s=0.0, error=None):
+    """
+    Журнал публикации по платформам: статус, id на платформе, число попыток и длительность
+    последней. Пишется сразу после каждой платформы, чтобы успех не терялся при сбое на следующей
+    """
+    queue = load_queue()
+    for item in queue:
+        if item['id'] == queue_item_id:
+            entry = item.setdefault('ledger', {}).setdefault(platform, {'attempts': 0})
+            entry.update(status=status, media_id=media_id, duration_s=round(duration_s, 2), error=error,
+                         attempts=entry['attempts'] + 1, updated_at=datetime.now().isoformat())
+            break
+    save_queue(queue)
+
+
+def add_skipped_uploads(queue_item_id, count):
+    queue = load_queue()
+    for item in queue:
+        if item['id'] == queue_item_id:
+            item['skipped_uploads'] = item.get('skipped_uploads', 0) + count
+            break
+    save_queue(queue)
+
+
+def published_platforms(item):
+    """Платформы, на которые элемент уже загружен: повторная публикация их пропускает"""
+    ledger = item.get('ledger', {})
+    return [platform for platform in item['platforms'] if ledger.get(platform, {}).get('status') == 'success']
+
+
+def set_queue_item_transcript(queue_item_id, transcript, language=None):
+    queue = load_queue()
+    for item in queue:
+        if item['id'] == queue_item_id:
+            item['transcript'] = transcript
+            item['language'] = language
+            break
+    save_queue(queue)
+
+
+def set_queue_item_profile(queue_item_id, profile_path):
+    queue = load_queue()
+    for item in queue:
+        if item['id'] == queue_item_id:
+            item['profile_path'] = profile_path
+            item['profiled_at'] = datetime.now().isoformat()
+            break
+    save_queue(queue)
+
+
+def apply_generated_metadata(results, content_type="both", description_mode="replace"):
+    """Записывает сгенерированные названия/описания в элементы очереди за одно сохранение"""
+    queue = load_queue()
+    updated = 0
+    for item in queue:
+        generated = results.get(item['id'])
+        if not generated:
+            continue
+        if content_type in ("both", "title") and generated.get('title'):
+            item['title'] = generated['title']
+        if content_type in ("both", "description") and generated.get('description'):
+            if description_mode == "append" and item.get('description'):
+                item['description'] = f"{item['description']}\n\n{generated['description']}"
+            else:
+                item['description'] = generated['description']
+        updated += 1
+    save_queue(queue)
+    return updated
+
+
+def collect_queue_transcripts(items):
+    """Создает транскрипции для элементов очереди, у которых их еще нет"""
+    for item in items:
+        if item.get('transcript') or not os.path.exists(item['video_path']):
+            continue
+        st.info(f"🎵 Транскрипция: {item['title']}")
+        transcript, _, _ = process_video_with_ai(item['video_path'])
+        if transcript:
+            item['transcript'] = transcript
+            item['language'] = st.session_state.get('last_transcription_language')
+            set_queue_item_transcript(item['id'], transcript, item['language'])
+    return items
+
+
+def show_batch_metadata_panel(queue):
+    with st.expander("🤖 AI-метаданные для очереди", expanded=False):
+        if not is_ai_configured():
+            st.warning("🤖 ChatGPT не подключен. Настройте в боковой панели для AI функций.")
+            return
+
+        candidates = [item for item in queue if item['status'] in ['pending', 'failed', 'partial']]
+        if not candidates:
+            st.info("Нет элементов, ожидающих публикации")
+            return
+
+        labels = {item['id']: f"{item['title']} ({item['id'][:8]})" for item in candidates}
+        selected_ids = st.multiselect("Элементы:", list(labels), default=list(labels),
+                                      format_func=lambda item_id: labels[item_id],
+                                      key="batch_ai_items")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            content_type = st.radio("Что генерировать:", ["both", "title", "description"],
+                                    format_func=lambda value: {'both': 'Название и описание',
+                                                               'title': 'Только название',
+                                                               'description': 'Только описание'}[value],
+                                    key="batch_ai_content")
+        with col2:
+            description_mode = st.radio("Описание:", ["replace", "append"],
+                                        format_func=lambda value: {'replace': 'Заменить',
+                                                                   'append': 'Добавить к текущему'}[value],
+                                        key="batch_ai_description_mode")
+
+        without_transcript = sum(1 for item in candidates if item['id'] in selected_ids and not item.get('transcript'))
+        if without_transcript:
+            st.caption(f"Для {without_transcript} элементов сначала будет создана транскрипция")
+
+        if st.button("🤖 Сгенерировать для выбранных", disabled=not selected_ids):
+            items = collect_queue_transcripts([item for item in candidates if item['id'] in selected_ids])
+
+            progress_bar = st.progress(0)
+            with st.spinner("Генерируем метаданные..."):
+                results = generate_metadata_batch(
+                    items, progress_callback=lambda done, total: progress_bar.progress(done / total)
+                )
+            progress_bar.empty()
+
+            updated = apply_generated_metadata(results, content_type, description_mode)
+            if updated:
+                st.success(f"✅ Обновлено элементов: {updated} из {len(items)}")
+                time.sleep(1)
+                st.rerun()
+            else:
+                st.error("❌ Не удалось сгенерировать метаданные")
+
+
 def get_queue_item(queue_item_id):
     queue = load_queue()
     for item in queue:
@@ -114,32 +260,51 @@ def get_queue_item(queue_item_id):
     return None
 
 
-def publish_from_queue(item):
-    config = st.session_state.platforms_config
+@traced('publish.item', source='queue')
+def publish_from_queue(item, config=None, upload_status=None):
+    """
+    Публикует элемент очереди на его платформы. Платформы, успешные по журналу элемента
+    (item['ledger']), пропускаются: повтор после partial грузит только то, что не удалось.
+    config и upload_status по умолчанию берутся из сессии; бенчмарк публикации передает свои без Streamlit
+    """
+    if config is None:
+        config = st.session_state.platforms_config
+    if upload_status is None:
+        upload_status = st.session_state.upload_status
 
     video_id = f"queue_{item['id']}"
+    published = published_platforms(item)
+    annotate(item_id=item['id'], platforms=item['platforms'], skipped=published)
 
-    st.session_state.upload_status[video_id] = {
+    upload_status[video_id] = {
         'title': item['title'],
         'timestamp': datetime.now().strftime("%H:%M:%S"),
-        'platforms': {platform: "pending" for platform in item['platforms']}
+        'platforms': {platform: "success" if platform in published else "pending" for platform in item['platforms']}
     }
 
+    if published:
+        add_skipped_uploads(item['id'], len(published))
+        st.info(f"⏭️ Уже опубликовано, пропускаем: {', '.join(published)}")
+
     processor = VideoProcessor()
     is_for_kids = item['made_for_kids'].startswith("Да")
 
     update_queue_item_status(item['id'], 'processing')
 
-    success_count = 0
+    success_count = len(published)
     total_platforms = len(item['platforms'])
 
     for platform in item['platforms']:
-        st.session_state.upload_status[video_id]['platforms'][platform] = "uploading"
+        if platform in published:
+            continue
 
-        with st.spinner(f"Загружаем на {platform}..."):
+        upload_status[video_id]['platforms'][platform] = "uploading"
+        started = time.perf_counter()
+
+        with st.spinner(f"Загружаем на {platform}..."), span('publish.platform', platform=platform) as platform_span:
             try:
                 if platform == "YouTube":
-                    uploader = YouTubeUploader()
+                    uploader = lazy_class('YouTubeUploader')()
                     uploader.authenticate(
                         config['youtube']['client_id'],
                         config['youtube']['client_secret']
@@ -149,7 +314,7 @@ def publish_from_queue(item):
 
                 elif platform == "TikTok":
                     processed_video = processor.prepare_for_tiktok(item['video_path'])
-                    uploader = TikTokUploader()
+                    uploader = lazy_class('TikTokUploader')()
 
                     if not uploader._check_logged_in():
                         st.warning("⚠️ Сессия TikTok истекла, выполняется повторный вход...")
@@ -173,7 +338,7 @@ def publish_from_queue(item):
 
                 elif platform == "Instagram":
                     processed_video = processor.prepare_for_instagram(item['video_path'])
-                    uploader = InstagramUploader()
+                    uploader = lazy_class('InstagramUploader')()
                     uploader.login(config['instagram']['username'], config['instagram']['password'])
 
                     instagram_caption = f"{item['title']}\n\n{item['description']}"
@@ -182,15 +347,26 @@ def publish_from_queue(item):
                     result = uploader.upload(processed_video, instagram_caption, instagram_tags)
 
                 if result:
-                    st.session_state.upload_status[video_id]['platforms'][platform] = "success"
+                    upload_status[video_id]['platforms'][platform] = "success"
+                    platform_span['outcome'] = 'success'
+                    # YouTube и Instagram возвращают id загруженного видео, TikTok - только True
+                    update_queue_item_ledger(item['id'], platform, 'success',
+                                             media_id=None if result is True else str(result),
+                                             duration_s=time.perf_counter() - started)
                     st.success(f"✅ {platform}: Загружено успешно!")
                     success_count += 1
                 else:
-                    st.session_state.upload_status[video_id]['platforms'][platform] = "error"
+                    upload_status[video_id]['platforms'][platform] = "error"
+                    platform_span['outcome'] = 'error'
+                    update_queue_item_ledger(item['id'], platform, 'error', duration_s=time.perf_counter() - started,
+                                             error="Ошибка загрузки")
                     st.error(f"❌ {platform}: Ошибка загрузки")
 
             except Exception as e:
-                st.session_state.upload_status[video_id]['platforms'][platform] = "error"
+                upload_status[video_id]['platforms'][platform] = "error"
+                platform_span.update(outcome='error', detail=str(e))
+                update_queue_item_ledger(item['id'], platform, 'error', duration_s=time.perf_counter() - started,
+                                         error=str(e))
                 st.error(f"❌ Ошибка загрузки на {platform}: {str(e)}")
 
             time.sleep(1)
@@ -203,6 +379,21 @@ def publish_from_queue(item):
         update_queue_item_status(item['id'], 'failed')
 
 
+def publish_queue_item(item, profile=False, config=None, upload_status=None):
+    """
+    Публикация из интерфейса и CLI. С profile=True публикация идет под семплирующим
+    профилировщиком, профиль сохраняется рядом с видео элемента (queue/<id>_profile.json)
+    """
+    if not profile:
+        return publish_from_queue(item, config, upload_status)
+
+    profile_path = profile_path_for(item['video_path'])
+    try:
+        return run_profiled(profile_path, publish_from_queue, item, config, upload_status)
+    finally:
+        set_queue_item_profile(item['id'], profile_path)
+
+
 def show_queue_tab():
     st.header("📋 Очередь загрузки")
 
@@ -221,6 +412,8 @@ def show_queue_tab():
         if st.button("🔄 Обновить очередь"):
             st.rerun()
 
+    show_batch_metadata_panel(queue)
+
     st.divider()
 
     status_filter = st.selectbox(
@@ -264,6 +457,10 @@ def show_queue_tab():
                     st.write(f"**Категория:** {item['category']}")
                     st.write(f"**Приватность:** {item['privacy']}")
                     st.write(f"**Платформы:** {', '.join(item['platforms'])}")
+                    if item.get('ledger'):
+                        st.write("**Публикация:** " + ', '.join(
+                            f"{'✅' if item['ledger'][platform]['status'] == 'success' else '❌'} {platform}"
+                            for platform in item['platforms'] if platform in item['ledger']))
                     st.write(f"**Создано:** {datetime.fromisoformat(item['created_at']).strftime('%d.%m.%Y %H:%M')}")
 
                     status_colors = {
@@ -288,10 +485,17 @@ def show_queue_tab():
                 st.write("### Действия")
 
                 if item['status'] in ['pending', 'failed', 'partial']:
+                    published = published_platforms(item)
+                    if published:
+                        st.caption(f"Повтор загрузит только: "
+                                   f"{', '.join(p for p in item['platforms'] if p not in published)}")
+                    profile = st.checkbox("🔬 Профилировать", key=f"profile_{item['id']}",
+                                          help="Записать профиль публикации: где тратится время. "
+                                               "Смотрите в деталях элемента")
                     if st.button("🚀 Публиковать", key=f"publish_{item['id']}"):
                         if os.path.exists(item['video_path']):
                             try:
-                                publish_from_queue(item)
+                                publish_queue_item(item, profile)
                                 st.success("✅ Публикация запущена!")
                                 time.sleep(2)
                                 st.rerun()
@@ -338,6 +542,10 @@ def show_item_details(item):
             'Статус': item['status']
         })
 
+        if item.get('language'):
+            language = item['language']
+            st.caption(f"🌐 Язык: {language['language']} ({language['confidence']:.0%}, {language['method']})")
+
     with col2:
         st.write("**Описание:**")
         st.text_area("", value=item['description'], height=150, disabled=True)
@@ -350,6 +558,27 @@ def show_item_details(item):
         if item.get('thumbnail_path'):
             st.write(f"Превью: {item['thumbnail_path']}")
 
+    if item.get('ledger'):
+        st.write("**📒 Публикация по платформам:**")
+        st.dataframe(
+            [{
+                'Платформа': platform,
+                'Статус': entry['status'],
+                'ID на платформе': entry.get('media_id') or '',
+                'Попыток': entry['attempts'],
+                'Последняя, с': entry['duration_s'],
+                'Ошибка': entry.get('error') or '',
+            } for platform, entry in item['ledger'].items()],
+            width='stretch',
+            hide_index=True,
+        )
+        if item.get('skipped_uploads'):
+            st.caption(f"⏭️ Повторных загрузок пропущено: {item['skipped_uploads']}")
+
+    if item.get('profile_path'):
+        st.write(f"**🔬 Профиль публикации** ({datetime.fromisoformat(item['profiled_at']).strftime('%d.%m.%Y %H:%M')}):")
+        show_profile(item['profile_path'], key=f"profile_{item['id']}")
+
 
 def show_queue_stats():
     queue = load_queue()
@@ -364,7 +593,7 @@ def show_queue_stats():
         status = item['status']
         status_counts[status] = status_counts.get(status, 0) + 1
 
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
 
     with col1:
         st.metric("Всего", len(queue))
@@ -376,6 +605,9 @@ def show_queue_stats():
         st.metric("Завершено", status_counts.get('completed', 0))
     with col5:
         st.metric("Ошибки", status_counts.get('failed', 0))
+    with col6:
+        st.metric("Повторов пропущено", sum(item.get('skipped_uploads', 0) for item in queue),
+                  help="Загрузки, которых удалось избежать: платформа уже была успешной при повторной публикации")
 
 
 def main_queue():
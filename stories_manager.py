@@ -6,9 +6,10 @@ import time
 from datetime import datetime
 
 try:
-    from uploaders.instagram import InstagramUploader
+    from utils.lazy_imports import lazy_class
     from utils.VideoProcessor import VideoProcessor
     from default_settings import get_default_stream_settings
+    from utils.tracing import annotate, span, traced
 except ImportError as e:
     st.error(f"Ошибка импорта модулей: {e}")
 
@@ -103,8 +104,10 @@ def update_story_status(story_id, status):
     save_stories(stories)
 
 
+@traced('publish.story')
 def publish_story(item):
     config = st.session_state.platforms_config
+    annotate(item_id=item['id'], platforms=item['platforms'])
 
     if item['status'] == 'publishing':
         print("Сторис уже публикуется...")
@@ -116,34 +119,38 @@ def publish_story(item):
     update_story_status(item['id'], 'publishing')
 
     for platform in item['platforms']:
-        try:
-            if platform == "Instagram":
-                uploader = InstagramUploader()
-                login_success = uploader.login(config['instagram']['username'], config['instagram']['password'])
+        with span('publish.platform', platform=platform, kind='story') as platform_span:
+            try:
+                if platform == "Instagram":
+                    uploader = lazy_class('InstagramUploader')()
+                    login_success = uploader.login(config['instagram']['username'], config['instagram']['password'])
 
-                if not login_success:
-                    raise Exception("Не удалось войти в Instagram")
+                    if not login_success:
+                        raise Exception("Не удалось войти в Instagram")
 
-                story_config = item.get('story_config', {})
+                    story_config = item.get('story_config', {})
 
-                if story_config:
-                    result = uploader.upload_story_with_stickers(item['file_path'], story_config)
-                else:
-                    if item['type'] == 'video':
-                        processor = VideoProcessor()
-                        processed_file = processor.prepare_for_instagram_story(item['file_path'])
-                        result = uploader.upload_story(processed_file)
+                    if story_config:
+                        result = uploader.upload_story_with_stickers(item['file_path'], story_config)
                     else:
-                        result = uploader.upload_story(item['file_path'])
+                        if item['type'] == 'video':
+                            processor = VideoProcessor()
+                            processed_file = processor.prepare_for_instagram_story(item['file_path'])
+                            result = uploader.upload_story(processed_file)
+                        else:
+                            result = uploader.upload_story(item['file_path'])
 
-                if result:
-                    print(f"✅ {platform}: Сторис загружена! ID: {result}")
-                    success_count += 1
-                else:
-                    print(f"❌ {platform}: Ошибка загрузки сторис")
+                    if result:
+                        print(f"✅ {platform}: Сторис загружена! ID: {result}")
+                        platform_span['outcome'] = 'success'
+                        success_count += 1
+                    else:
+                        print(f"❌ {platform}: Ошибка загрузки сторис")
+                        platform_span['outcome'] = 'error'
 
-        except Exception as e:
-            print(f"❌ Ошибка загрузки в {platform}: {str(e)}")
+            except Exception as e:
+                print(f"❌ Ошибка загрузки в {platform}: {str(e)}")
+                platform_span.update(outcome='error', detail=str(e))
 
         time.sleep(2)
 
@@ -0,0 +1,48 @@
+﻿from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from utils.lazy_imports import is_module_available
+
+
+class Transcriber(ABC):
+    """
+    Интерфейс движка транскрипции. Движок получает float32 16 кГц моно
+    (DecodedAudio.float32()) и возвращает {'text', 'segments', 'language'},
+    где segments - список {'start', 'end', 'text'} в секундах от начала фрагмента.
+    Движок без какого-либо из абстрактных методов не создается вовсе
+    """
+
+    name = None
+    label = None
+    # Модуль, без которого движок не работает
+    package = None
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model_name: str, threads: int = 0):
+        self.model_name = model_name
+        self.threads = threads
+        self.model = None
+
+    @classmethod
+    def package_installed(cls) -> bool:
+        return bool(cls.package) and is_module_available(cls.package)
+
+    @classmethod
+    @abstractmethod
+    def is_available(cls) -> bool:
+        """Можно ли использовать движок в этом окружении"""
+
+    @abstractmethod
+    def load(self):
+        """Загружает модель и возвращает self"""
+
+    @abstractmethod
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None, **options) -> Dict[str, Any]:
+        """Распознает фрагмент: {'text', 'segments', 'language'}"""
+
+    @abstractmethod
+    def detect_language(self, audio) -> Optional[Dict[str, Any]]:
+        """Язык по нескольким окнам DecodedAudio: {'language', 'confidence', 'method', 'windows'}"""
@@ -0,0 +1,310 @@
+﻿"""
+Общий сервер моделей транскрипции на localhost.
+
+Модели загружаются один раз на сервер, а не в каждой сессии Streamlit и в каждом процессе.
+Запросы всех сессий стоят в одной очереди; обработчик берет подряд запросы к той же
+модели, что уже загружена и прогрета, и только потом переключается на другую.
+
+Запуск из корня проекта:
+    python -m transcribers.daemon --port 8767 --preload openai-whisper:medium
+    # в настройках AI: "Сервер моделей" = http://127.0.0.1:8767
+
+API:
+    POST /transcribe?backend=&model=&language=&initial_prompt=&options=<json>
+         тело - PCM int16 16 кГц моно; ответ {'result', 'queue_s', 'inference_s'}
+    POST /detect_language?backend=&model=&windows=<json>   тело - склеенные PCM окон записи,
+         windows - их границы [[начало, конец], ...] в секундах
+    GET  /stats - глубина очереди, загруженные модели, задержки последних запросов
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from transcribers.base import Transcriber
+
+DEFAULT_PORT = 8767
+
+# Сколько последних запросов учитывать в статистике задержек
+LATENCY_WINDOW = 200
+
+
+class InferenceQueue:
+    """Очередь запросов с группировкой: обработчик предпочитает запросы к своей текущей модели"""
+
+    def __init__(self):
+        self._items = []
+        self._condition = threading.Condition()
+
+    def put(self, request: Dict[str, Any]):
+        with self._condition:
+            self._items.append(request)
+            self._condition.notify()
+
+    def take(self, preferred_key=None) -> Dict[str, Any]:
+        with self._condition:
+            while not self._items:
+                self._condition.wait()
+            index = next((i for i, item in enumerate(self._items) if item['key'] == preferred_key), 0)
+            return self._items.pop(index)
+
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._items)
+
+
+class InferenceDaemon:
+    def __init__(self, workers: int = 1, threads: int = 0):
+        self.queue = InferenceQueue()
+        self.threads = threads
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'failures': 0, 'model_switches': 0, 'started_at': time.time()}
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+        self.loaded = set()
+        # У каждого обработчика свои экземпляры моделей: whisper вешает на модель хуки kv-кэша
+        # на время декодирования, и параллельные transcribe на одном экземпляре портят друг друга
+        self.worker_models = [{} for _ in range(max(1, workers))]
+        for i in range(len(self.worker_models)):
+            threading.Thread(target=self._work, args=(i,), name=f"inference-{i}", daemon=True).start()
+
+    def get_model(self, backend: str, model_name: str, worker: int = 0) -> Transcriber:
+        from transcribers.registry import get_transcriber_class
+
+        models = self.worker_models[worker]
+        if (backend, model_name) not in models:
+            models[(backend, model_name)] = get_transcriber_class(backend)(model_name, self.threads).load()
+            with self.lock:
+                self.loaded.add(f"{backend}:{model_name}")
+        return models[(backend, model_name)]
+
+    def preload(self, backend: str, model_name: str):
+        for worker in range(len(self.worker_models)):
+            self.get_model(backend, model_name, worker)
+
+    def submit(self, kind: str, backend: str, model_name: str, **params) -> Future:
+        future = Future()
+        self.queue.put({'kind': kind, 'key': (backend, model_name), 'params': params,
+                        'future': future, 'queued_at': time.perf_counter()})
+        return future
+
+    def _work(self, worker: int):
+        current_key = None
+        while True:
+            request = self.queue.take(current_key)
+            if current_key is not None and request['key'] != current_key:
+                with self.lock:
+                    self.stats['model_switches'] += 1
+            current_key = request['key']
+
+            started = time.perf_counter()
+            with self.lock:
+                self.in_flight += 1
+            try:
+                transcriber = self.get_model(*request['key'], worker)
+                params = request['params']
+                if request['kind'] == 'detect_language':
+                    result = transcriber.detect_language(params['audio'])
+                else:
+                    result = transcriber.transcribe(params['samples'], language=params.get('language'),
+                                                    initial_prompt=params.get('initial_prompt'),
+                                                    **params.get('options', {}))
+                self._record(request, started, failed=False)
+                request['future'].set_result((result, started - request['queued_at'],
+                                              time.perf_counter() - started))
+            except Exception as e:
+                self._record(request, started, failed=True)
+                request['future'].set_exception(e)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+    def _record(self, request, started, failed):
+        finished = time.perf_counter()
+        with self.lock:
+            self.stats['requests'] += 1
+            if failed:
+                self.stats['failures'] += 1
+            self.recent.append({'model': ':'.join(request['key']), 'kind': request['kind'],
+                                'queue_s': started - request['queued_at'], 'inference_s': finished - started})
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            recent = list(self.recent)
+            stats = {**self.stats, 'in_flight': self.in_flight, 'loaded_models': sorted(self.loaded)}
+        stats['queue_depth'] = self.queue.depth()
+        stats['uptime_s'] = time.time() - stats.pop('started_at')
+        for field in ('queue_s', 'inference_s'):
+            values = sorted(row[field] for row in recent)
+            stats[f'{field}_p50'] = values[len(values) // 2] if values else None
+            stats[f'{field}_p95'] = values[int(len(values) * 0.95)] if values else None
+        stats['recent'] = recent[-20:]
+        return stats
+
+
+def make_handler(daemon: InferenceDaemon):
+    from utils.audio import DecodedAudio
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path.rstrip('/')
+            if path == '/stats':
+                self._send_json(200, daemon.get_stats())
+            elif path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get('Content-Length', 0))
+            samples = np.frombuffer(self.rfile.read(length), dtype=np.int16)
+            backend, model_name = query.get('backend'), query.get('model')
+            if not backend or not model_name:
+                self._send_json(400, {'error': 'backend и model обязательны'})
+                return
+
+            path = url.path.rstrip('/')
+            if path == '/transcribe':
+                future = daemon.submit('transcribe', backend, model_name,
+                                       samples=samples.astype(np.float32) / 32768.0,
+                                       language=query.get('language') or None,
+                                       initial_prompt=query.get('initial_prompt') or None,
+                                       options=json.loads(query.get('options') or '{}'))
+            elif path == '/detect_language':
+                future = daemon.submit('detect_language', backend, model_name,
+                                       audio=DecodedAudio(samples, Transcriber.SAMPLE_RATE,
+                                                          windows=json.loads(query.get('windows') or 'null')))
+            else:
+                self._send_json(404, {'error': 'not found'})
+                return
+
+            try:
+                result, queue_s, inference_s = future.result()
+            except Exception as e:
+                self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+                return
+            self._send_json(200, {'result': result, 'queue_s': queue_s, 'inference_s': inference_s})
+
+    return Handler
+
+
+def start_daemon(port=DEFAULT_PORT, workers=1, threads=0, host='127.0.0.1'):
+    daemon = InferenceDaemon(workers, threads)
+    server = ThreadingHTTPServer((host, port), make_handler(daemon))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, daemon
+
+
+class DaemonTranscriber(Transcriber):
+    """Клиент сервера моделей: тот же интерфейс, что у локальных движков, модель живет в сервере"""
+
+    name = 'daemon'
+    label = 'Сервер моделей (localhost)'
+    package = 'requests'
+
+    def __init__(self, url: str, backend: str, model_name: str, threads: int = 0):
+        super().__init__(model_name, threads)
+        self.url = url.rstrip('/')
+        self.backend = backend
+        self.last_timing = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        # Доступность самого сервера проверяет load() запросом /health
+        return cls.package_installed()
+
+    def load(self):
+        import requests
+
+        self._session = requests.Session()
+        # Проверяем только доступность: модель сервер загрузит сам при первом запросе
+        self._session.get(f"{self.url}/health", timeout=3).raise_for_status()
+        return self
+
+    def _post(self, path, samples, **params):
+        response = self._session.post(
+            f"{self.url}/{path}",
+            params={'backend': self.backend, 'model': self.model_name, **params},
+            data=np.asarray(samples).astype(np.int16).tobytes(),
+            headers={'Content-Type': 'application/octet-stream'},
+            # Ответ ждем сколько угодно: запрос может стоять в очереди за чужими
+            timeout=(5, None),
+        )
+        payload = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"Сервер моделей: {payload.get('error')}")
+        self.last_timing = {'queue_s': payload['queue_s'], 'inference_s': payload['inference_s']}
+        return payload['result']
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None, **options) -> Dict[str, Any]:
+        pcm = np.clip(samples * 32768.0, -32768, 32767) if samples.dtype != np.int16 else samples
+        return self._post('transcribe', pcm, language=language or '', initial_prompt=initial_prompt or '',
+                          options=json.dumps(options))
+
+    def detect_language(self, audio) -> Optional[Dict[str, Any]]:
+        from utils.audio import DecodedAudio
+        from utils.language_id import detection_windows
+
+        audio = audio.resampled(self.SAMPLE_RATE)
+        windows = DecodedAudio.from_windows([audio.slice_samples(start_s, end_s)
+                                             for start_s, end_s in detection_windows(audio)], self.SAMPLE_RATE)
+        return self._post('detect_language', windows.samples, windows=json.dumps(windows.windows))
+
+
+def get_daemon_stats(url: str) -> Optional[Dict[str, Any]]:
+    import requests
+
+    try:
+        return requests.get(f"{url.rstrip('/')}/stats", timeout=2).json()
+    except Exception:
+        return None
+
+
+def main():
+    from transcribers.registry import DEFAULT_TRANSCRIBER
+
+    parser = argparse.ArgumentParser(description="Общий сервер моделей транскрипции")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=1, help="Обработчиков очереди (у каждого своя копия модели)")
+    parser.add_argument('--threads', type=int, default=0, help="Потоков CPU на модель, 0 - по умолчанию движка")
+    parser.add_argument('--preload', nargs='*', default=[],
+                        help=f"Загрузить заранее: движок:модель, например {DEFAULT_TRANSCRIBER}:medium")
+    args = parser.parse_args()
+
+    server, daemon = start_daemon(args.port, args.workers, args.threads)
+    for spec in args.preload:
+        backend, _, model_name = spec.rpartition(':')
+        print(f"Загружаем {backend or DEFAULT_TRANSCRIBER}:{model_name}...")
+        daemon.preload(backend or DEFAULT_TRANSCRIBER, model_name)
+
+    print(f"Сервер моделей: http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
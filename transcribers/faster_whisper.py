@@ -0,0 +1,74 @@
+﻿from typing import Any, Dict, Optional
+
+import numpy as np
+
+from transcribers.base import Transcriber
+
+
+class FasterWhisperTranscriber(Transcriber):
+    """
+    faster-whisper: те же модели Whisper на CTranslate2 с int8-квантованием весов.
+    На CPU в несколько раз быстрее и заметно экономнее по памяти, чем PyTorch fp32
+    """
+
+    name = 'faster-whisper'
+    label = 'faster-whisper (CTranslate2, int8 CPU)'
+    package = 'faster_whisper'
+
+    # Параметры openai-whisper, которые в faster-whisper называются иначе
+    OPTION_NAMES = {'logprob_threshold': 'log_prob_threshold'}
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return cls.package_installed()
+
+    def __init__(self, model_name: str, threads: int = 0, compute_type: str = 'int8'):
+        super().__init__(model_name, threads)
+        self.compute_type = compute_type
+
+    def load(self):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(self.model_name, device='cpu', compute_type=self.compute_type,
+                                  cpu_threads=self.threads)
+        return self
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None, **options) -> Dict[str, Any]:
+        options = {self.OPTION_NAMES.get(key, key): value for key, value in options.items()}
+        # beam_size=1 - жадное декодирование, как у openai-whisper с temperature=0
+        segments, info = self.model.transcribe(
+            samples,
+            language=language,
+            task='transcribe',
+            initial_prompt=initial_prompt,
+            **{'beam_size': 1, 'temperature': 0.0, **options}
+        )
+        # segments - ленивый генератор, декодирование идет при обходе
+        segments = [{'start': segment.start, 'end': segment.end, 'text': segment.text.strip()}
+                    for segment in segments]
+        return {
+            'text': ' '.join(segment['text'] for segment in segments if segment['text']),
+            'segments': segments,
+            'language': info.language,
+        }
+
+    def detect_language(self, audio) -> Optional[Dict[str, Any]]:
+        from utils.language_id import detection_windows
+
+        audio = audio.resampled(self.SAMPLE_RATE)
+        samples = audio.float32()
+        totals: Dict[str, float] = {}
+        windows = detection_windows(audio)
+
+        for start_s, end_s in windows:
+            window = samples[int(start_s * audio.sample_rate):int(end_s * audio.sample_rate)]
+            # Язык определяется сразу при вызове; сегменты не обходим, поэтому декодирования нет
+            _, info = self.model.transcribe(window, language=None, beam_size=1)
+            probabilities = dict(info.all_language_probs or [(info.language, info.language_probability)])
+            for language, probability in probabilities.items():
+                totals[language] = totals.get(language, 0.0) + probability
+
+        language = max(totals, key=totals.get)
+        return {'language': language, 'confidence': totals[language] / len(windows),
+                'method': self.name, 'windows': len(windows)}
@@ -0,0 +1,46 @@
+﻿from typing import Any, Dict, Optional
+
+import numpy as np
+
+from transcribers.base import Transcriber
+
+
+class OpenAIWhisperTranscriber(Transcriber):
+    """Эталонный openai-whisper на PyTorch (на CPU только fp32)"""
+
+    name = 'openai-whisper'
+    label = 'OpenAI Whisper (PyTorch, fp32)'
+    package = 'whisper'
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return cls.package_installed()
+
+    def load(self):
+        import torch
+        import whisper
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        self.model = whisper.load_model(self.model_name)
+        return self
+
+    def transcribe(self, samples: np.ndarray, language: Optional[str] = None,
+                   initial_prompt: Optional[str] = None, **options) -> Dict[str, Any]:
+        result = self.model.transcribe(
+            samples,
+            language=language,
+            task='transcribe',
+            initial_prompt=initial_prompt,
+            **{'fp16': False, 'temperature': 0.0, **options}
+        )
+        return {
+            'text': result['text'].strip(),
+            'segments': [{'start': segment['start'], 'end': segment['end'], 'text': segment['text'].strip()}
+                         for segment in result.get('segments', [])],
+            'language': result.get('language', language),
+        }
+
+    def detect_language(self, audio) -> Optional[Dict[str, Any]]:
+        from utils.language_id import detect_with_whisper
+        return detect_with_whisper(audio, self.model)
@@ -0,0 +1,37 @@
+﻿import importlib
+import threading
+from typing import Dict, Tuple, Type
+
+from transcribers.base import Transcriber
+
+# Модули грузятся лениво: тяжелые зависимости импортируются только в load()
+TRANSCRIBERS = {
+    'openai-whisper': ('transcribers.openai_whisper', 'OpenAIWhisperTranscriber'),
+    'faster-whisper': ('transcribers.faster_whisper', 'FasterWhisperTranscriber'),
+}
+
+DEFAULT_TRANSCRIBER = 'openai-whisper'
+
+_loaded: Dict[Tuple[str, str, int], Transcriber] = {}
+_lock = threading.Lock()
+
+
+def get_transcriber_class(name: str) -> Type[Transcriber]:
+    module_name, class_name = TRANSCRIBERS.get(name, TRANSCRIBERS[DEFAULT_TRANSCRIBER])
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def available_transcribers() -> Dict[str, bool]:
+    return {name: get_transcriber_class(name).is_available() for name in TRANSCRIBERS}
+
+
+def get_transcriber(name: str, model_name: str, threads: int = 0) -> Transcriber:
+    """
+    Загруженный движок. Модель держится в памяти процесса и переиспользуется
+    между запусками, а не загружается заново на каждое видео
+    """
+    key = (name, model_name, threads)
+    with _lock:
+        if key not in _loaded:
+            _loaded[key] = get_transcriber_class(name)(model_name, threads).load()
+        return _loaded[key]
@@ -0,0 +1,148 @@
+﻿import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.audio import DecodedAudio, plan_silence_splits
+
+# Короче этого шард не делаем: загрузка модели в процессе дороже выигрыша
+MIN_SHARD_S = 120
+
+# Где искать тишину для разреза перед границей шарда
+SHARD_SEARCH_S = 30
+
+# Движок, загруженный в процессе-обработчике (по одному на процесс)
+_worker_transcriber = None
+_worker_load_s = 0.0
+
+
+def default_threads_per_worker(workers: int) -> int:
+    """Делим ядра поровну: внутренние потоки torch плохо масштабируются дальше нескольких ядер"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def plan_shards(audio: DecodedAudio, workers: int, min_shard_s: float = MIN_SHARD_S) -> List[Tuple[int, int]]:
+    """
+    Делит запись не больше чем на workers шардов примерно равной длины, разрезая по тишине.
+    Возвращает список (начало, конец) в отсчетах
+    """
+    count = max(1, min(workers, int(audio.duration_s // min_shard_s)))
+    if count == 1:
+        return [(0, len(audio.samples))]
+
+    # Разрез ставится в окне [предел - search, предел], поэтому каждый шард не короче
+    # duration / count и шардов получается не больше count
+    search_s = min(SHARD_SEARCH_S, audio.duration_s / count / 2)
+    return plan_silence_splits(audio.samples, audio.sample_rate, audio.duration_s / count + search_s, search_s)
+
+
+def _init_worker(backend: str, model_name: str, threads: int):
+    """Инициализатор процесса: своя модель и свое число потоков на процесс"""
+    global _worker_transcriber, _worker_load_s
+    from transcribers.registry import get_transcriber
+
+    start = time.perf_counter()
+    _worker_transcriber = get_transcriber(backend, model_name, threads)
+    _worker_load_s = time.perf_counter() - start
+
+
+def _detect_language(windows: List[np.ndarray], sample_rate: int) -> Optional[Dict[str, Any]]:
+    return _worker_transcriber.detect_language(DecodedAudio.from_windows(windows, sample_rate))
+
+
+def _transcribe_shard(index: int, offset_s: float, samples: np.ndarray, language: Optional[str],
+                      initial_prompt: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+    # В процесс передаем int16 - вдвое меньше данных, чем float32
+    start = time.perf_counter()
+    result = _worker_transcriber.transcribe(samples.astype(np.float32) / 32768.0, language=language,
+                                            initial_prompt=initial_prompt, **options)
+    return {
+        'index': index,
+        'text': result['text'],
+        'language': result.get('language', language),
+        'segments': [{**segment, 'start': segment['start'] + offset_s, 'end': segment['end'] + offset_s}
+                     for segment in result['segments']],
+        'transcribe_s': time.perf_counter() - start,
+        'load_s': _worker_load_s,
+        'pid': os.getpid(),
+    }
+
+
+class ShardedTranscriber:
+    """
+    Транскрипция длинной записи в нескольких процессах. Запись делится по тишине на шарды,
+    каждый процесс загружает свою модель и распознает свой шард, результаты склеиваются
+    по времени. Используется как контекстный менеджер: пул живет до выхода из блока
+    """
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, backend: str, model_name: str, workers: int, threads: int = 0):
+        self.backend = backend
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.threads = threads or default_threads_per_worker(self.workers)
+        self._executor = None
+
+    def __enter__(self):
+        # spawn и на Linux: fork процесса Streamlit с фоновыми потоками небезопасен
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.backend, self.model_name, self.threads),
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(cancel_futures=True)
+        self._executor = None
+
+    def detect_language(self, audio: DecodedAudio) -> Optional[Dict[str, Any]]:
+        """Язык определяет один из процессов по окнам записи; в него уходят только сами окна"""
+        from utils.language_id import detection_windows
+
+        windows = [audio.slice_samples(start_s, end_s) for start_s, end_s in detection_windows(audio)]
+        return self._executor.submit(_detect_language, windows, audio.sample_rate).result()
+
+    def transcribe(self, audio: DecodedAudio, language: Optional[str] = None, initial_prompt: Optional[str] = None,
+                   on_shard: Optional[Callable[[Dict[str, Any], int], None]] = None, **options) -> Dict[str, Any]:
+        """
+        Возвращает {'text', 'segments', 'language', 'shards'}; таймкоды сегментов от начала записи.
+        on_shard(shard, total) вызывается по порядку шардов, как только готов очередной
+        """
+        shards = plan_shards(audio, self.workers)
+        pending = {
+            self._executor.submit(_transcribe_shard, index, start / audio.sample_rate,
+                                  audio.samples[start:end], language, initial_prompt, options)
+            for index, (start, end) in enumerate(shards)
+        }
+
+        done_shards: Dict[int, Dict[str, Any]] = {}
+        next_index = 0
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard = future.result()
+                done_shards[shard['index']] = shard
+            # Отдаем шарды строго по порядку, чтобы живая транскрипция шла с начала записи
+            while next_index in done_shards:
+                if on_shard:
+                    on_shard(done_shards[next_index], len(shards))
+                next_index += 1
+
+        ordered = [done_shards[index] for index in range(len(shards))]
+        segments = sorted((segment for shard in ordered for segment in shard['segments']),
+                          key=lambda segment: segment['start'])
+        return {
+            'text': ' '.join(shard['text'] for shard in ordered if shard['text']),
+            'segments': segments,
+            'language': ordered[0]['language'] if ordered else language,
+            'shards': [{'index': shard['index'], 'start': shards[shard['index']][0] / audio.sample_rate,
+                        'end': shards[shard['index']][1] / audio.sample_rate,
+                        'transcribe_s': shard['transcribe_s'], 'load_s': shard['load_s'], 'pid': shard['pid']}
+                       for shard in ordered],
+        }
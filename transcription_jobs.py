@@ -0,0 +1,187 @@
+﻿import streamlit as st
+import os
+import json
+import uuid
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from utils.profiler import profile_path_for, run_profiled
+
+JOBS_DIR = "jobs"
+
+# Одновременно идет одна транскрипция: внутри она сама может занять несколько процессов
+MAX_PARALLEL_JOBS = 1
+
+# Файлы завершенных задач старше этого срока удаляются при постановке новой
+JOB_RETENTION_DAYS = 7
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+_executor = None
+_executor_lock = threading.Lock()
+_job_lock = threading.Lock()
+
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _segments_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}_segments.jsonl")
+
+
+def load_partial_transcript(job_id):
+    """Текст готовых сегментов: они дописываются в jobs/<id>_segments.jsonl, а не в файл задачи"""
+    texts = []
+    try:
+        with open(_segments_path(job_id), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    texts.append(json.loads(line)['text'])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return ' '.join(texts)
+
+
+def load_job(job_id):
+    try:
+        with open(_job_path(job_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ошибка чтения задачи {job_id}: {e}")
+        return None
+
+
+def save_job(job):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job['updated_at'] = datetime.now().isoformat()
+    # Пишем через временный файл: страница читает задачу, пока процесс ее обновляет
+    tmp_path = f"{_job_path(job['id'])}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, _job_path(job['id']))
+
+
+def update_job(job_id, **fields):
+    with _job_lock:
+        job = load_job(job_id) or {'id': job_id}
+        job.update(fields)
+        save_job(job)
+        return job
+
+
+def _get_executor():
+    """Пул живет в процессе сервера Streamlit, а не в сессии: перезагрузка страницы его не трогает"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: fork процесса Streamlit с фоновыми потоками небезопасен
+            _executor = ProcessPoolExecutor(max_workers=MAX_PARALLEL_JOBS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _run_job(job_id):
+    """
+    Выполняется в процессе пула. Задача с profile_path идет под семплирующим профилировщиком;
+    дочерние процессы шардированной транскрипции в профиль не попадают
+    """
+    job = load_job(job_id)
+    if job and job.get('profile_path'):
+        run_profiled(job['profile_path'], _execute_job, job_id)
+    else:
+        _execute_job(job_id)
+
+
+def _execute_job(job_id):
+    """
+    Вызовы st.* здесь работают вхолостую (bare mode). session_state в процессе пула общий
+    для всех задач, поэтому настройки AI перечитываются с диска, а итоги прошлой задачи сбрасываются
+    """
+    from ai_assistant import load_ai_config, process_video_with_ai
+
+    st.session_state.ai_config = load_ai_config()
+    for key in ('last_transcription_segments', 'last_transcription_language'):
+        st.session_state.pop(key, None)
+    job = update_job(job_id, status='running', started_at=datetime.now().isoformat(), worker_pid=os.getpid())
+
+    def on_segment(segment):
+        # Сегмент дописывается в JSONL; в файле задачи - только прогресс фиксированного размера
+        with open(_segments_path(job_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'start': segment.get('start'), 'end': segment['end'], 'text': segment['text']},
+                               ensure_ascii=False) + '\n')
+        fields = {'processed_s': segment['end']}
+        if segment.get('total'):
+            fields['progress'] = (segment['index'] + 1) / segment['total']
+        update_job(job_id, **fields)
+
+    try:
+        transcript, _, _ = process_video_with_ai(job['video_path'], on_segment)
+        if transcript:
+            update_job(job_id, status='done', progress=1.0, transcript=transcript,
+                       segments=st.session_state.get('last_transcription_segments'),
+                       language=st.session_state.get('last_transcription_language'),
+                       finished_at=datetime.now().isoformat())
+        else:
+            update_job(job_id, status='error', error="Не удалось создать транскрипцию",
+                       finished_at=datetime.now().isoformat())
+    except Exception as e:
+        update_job(job_id, status='error', error=str(e), finished_at=datetime.now().isoformat())
+    finally:
+        if os.path.exists(job['video_path']):
+            os.remove(job['video_path'])
+
+
+def create_transcription_job(video_bytes, filename="video.mp4", profile=False):
+    """Сохраняет видео и файл задачи. С profile=True профиль ляжет рядом: jobs/<id>_profile.json"""
+    cleanup_jobs()
+    job_id = str(uuid.uuid4())
+    os.makedirs(JOBS_DIR, exist_ok=True)
+
+    video_path = os.path.join(JOBS_DIR, f"{job_id}{os.path.splitext(filename)[1] or '.mp4'}")
+    with open(video_path, "wb") as f:
+        f.write(video_bytes)
+
+    update_job(job_id, id=job_id, status='queued', filename=filename, video_path=video_path,
+               created_at=datetime.now().isoformat(), owner_pid=os.getpid(), progress=0.0,
+               processed_s=0.0,
+               profile_path=profile_path_for(_job_path(job_id)) if profile else None)
+    return job_id
+
+
+def submit_transcription_job(video_bytes, filename="video.mp4", profile=False):
+    """Ставит транскрипцию в фоновый пул. Возвращает id задачи"""
+    job_id = create_transcription_job(video_bytes, filename, profile)
+    _get_executor().submit(_run_job, job_id)
+    return job_id
+
+
+def get_transcription_job(job_id):
+    """
+    Состояние задачи из файла. Незавершенная задача, поставленная другим процессом сервера
+    (Streamlit перезапускали), уже никем не выполняется - помечаем ее прерванной
+    """
+    job = load_job(job_id)
+    if job and job['status'] in ACTIVE_STATUSES and job.get('owner_pid') != os.getpid():
+        job = update_job(job_id, status='error', error="Прервано перезапуском приложения")
+    return job
+
+
+def cleanup_jobs(max_age_days=JOB_RETENTION_DAYS):
+    if not os.path.isdir(JOBS_DIR):
+        return
+    cutoff = time.time() - max_age_days * 24 * 3600
+    for name in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
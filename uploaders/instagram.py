@@ -4,6 +4,8 @@ from instagrapi import Client
 from instagrapi.exceptions import LoginRequired
 from instagrapi.types import StoryMention, StoryMedia, StoryLink, StoryHashtag
 
+from utils.tracing import traced
+
 
 class InstagramUploader:
     def __init__(self):
@@ -11,6 +13,7 @@ class InstagramUploader:
         self.session_file = 'credentials/instagram_session.json'
         os.makedirs('credentials', exist_ok=True)
 
+    @traced('platform.login', falsy_is_error=True, platform='Instagram')
     def login(self, username, password):
         try:
             try:
@@ -33,6 +36,7 @@ class InstagramUploader:
             print(f"Instagram login error: {e}")
             return False
 
+    @traced('platform.upload', falsy_is_error=True, platform='Instagram')
     def upload(self, video_path, caption, hashtags=""):
         try:
             full_caption = f"{caption}\n\n{hashtags}" if hashtags else caption
@@ -51,6 +55,7 @@ class InstagramUploader:
             print(f"Instagram upload error: {e}")
             return None
 
+    @traced('platform.upload', falsy_is_error=True, platform='Instagram', kind='story')
     def upload_story(self, file_path, text=None, hashtags=None, mentions=None, links=None):
         try:
             extra_data = {}
@@ -127,6 +132,7 @@ class InstagramUploader:
             print(f"Instagram story upload error: {e}")
             return None
 
+    @traced('platform.upload', falsy_is_error=True, platform='Instagram', kind='story')
     def upload_story_with_stickers(self, file_path, story_config=None):
         """
         Загрузка сторис с расширенными настройками
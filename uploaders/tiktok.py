@@ -10,6 +10,8 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 import random
 import atexit
 
+from utils.tracing import traced
+
 
 class TikTokDriverManager:
     _instance = None
@@ -116,6 +118,7 @@ class TikTokUploader:
     def driver(self):
         return self.driver_manager.get_driver()
 
+    @traced('platform.login', falsy_is_error=True, platform='TikTok')
     def login(self, username="", password=""):
         driver = self.driver
         if not driver:
@@ -173,6 +176,7 @@ class TikTokUploader:
             print(f"Ошибка при входе в TikTok: {e}")
             return False
 
+    @traced('platform.check_login', platform='TikTok')
     def _check_logged_in(self):
         try:
             driver = self.driver
@@ -362,6 +366,7 @@ class TikTokUploader:
             element.send_keys(char)
             time.sleep(random.uniform(0.05, 0.15))
 
+    @traced('platform.upload', falsy_is_error=True, platform='TikTok')
     def prepare_for_upload(self, video_path, caption, hashtags=""):
         print(f"🎬 TikTok Upload подготовка:")
         print(f"   Video: {video_path}")
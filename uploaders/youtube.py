@@ -7,6 +7,8 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 
+from utils.tracing import traced
+
 
 class YouTubeUploader:
     SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
@@ -16,6 +18,7 @@ class YouTubeUploader:
         self.credentials_file = 'credentials/youtube_credentials.json'
         self.token_file = 'credentials/youtube_token.json'
 
+    @traced('platform.login', falsy_is_error=True, platform='YouTube')
     def authenticate(self, client_id, client_secret):
         credentials_data = {
             "installed": {
@@ -49,6 +52,7 @@ class YouTubeUploader:
         self.service = build('youtube', 'v3', credentials=creds)
         return True
 
+    @traced('platform.upload', falsy_is_error=True, platform='YouTube')
     def upload(self, video_path, title, description, tags, category, privacy, made_for_kids=False):
         if not self.service:
             raise Exception("YouTube service not authenticated. Call authenticate() first.")
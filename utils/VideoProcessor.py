@@ -1,28 +1,34 @@
 ﻿import os
 import shutil
 
+from utils.tracing import traced
+
 
 class VideoProcessor:
     def __init__(self):
         self.temp_dir = "temp_processed"
         os.makedirs(self.temp_dir, exist_ok=True)
 
+    @traced('rendition.prepare', platform='TikTok')
     def prepare_for_tiktok(self, video_path):
         output_path = os.path.join(self.temp_dir, f"tiktok_{os.path.basename(video_path)}")
         shutil.copy2(video_path, output_path)
         print(f"TikTok: Video copied to {output_path}")
         return output_path
 
+    @traced('rendition.prepare', platform='Instagram')
     def prepare_for_instagram(self, video_path):
         output_path = os.path.join(self.temp_dir, f"instagram_{os.path.basename(video_path)}")
         shutil.copy2(video_path, output_path)
         print(f"Instagram: Video copied to {output_path}")
         return output_path
 
+    @traced('rendition.prepare', platform='YouTube')
     def prepare_for_youtube(self, video_path):
         print(f"YouTube: Using original video {video_path}")
         return video_path
 
+    @traced('rendition.prepare', platform='Instagram', kind='story')
     def prepare_for_instagram_story(self, file_path):
         file_extension = os.path.splitext(file_path)[1].lower()
 
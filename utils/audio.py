@@ -0,0 +1,399 @@
+﻿import hashlib
+import os
+import queue
+import re
+import subprocess
+import threading
+import wave
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.capabilities import find_ffmpeg
+
+# Лимит OpenAI на размер одного загружаемого файла
+OPENAI_MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+# Opus в режиме voip: ~3 КБ/с против 32 КБ/с у 16 кГц PCM
+SPEECH_CODEC_BITRATE = "24k"
+
+# Окно, по которому ищем тишину для разреза
+SILENCE_WINDOW_S = 0.05
+
+
+def read_wav_pcm(audio_path: str) -> Tuple[np.ndarray, int]:
+    """Читает WAV (PCM 16 бит) в моно-массив int16"""
+    with wave.open(audio_path, 'rb') as wav:
+        sample_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"Ожидался 16-битный PCM, получено {wav.getsampwidth() * 8} бит")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def window_rms(samples: np.ndarray, window: int) -> np.ndarray:
+    """Громкость (RMS) по окнам фиксированной длины"""
+    count = len(samples) // window
+    if count == 0:
+        return np.zeros(0)
+    frames = samples[:count * window].astype(np.float32).reshape(count, window)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def plan_silence_splits(samples: np.ndarray, sample_rate: int, max_part_s: float,
+                        search_s: float = 30.0) -> List[Tuple[int, int]]:
+    """
+    Делит аудио на части не длиннее max_part_s. Каждый разрез ставится в самое тихое
+    окно за последние search_s секунд перед пределом, чтобы не резать слова.
+    Возвращает список (начало, конец) в отсчетах
+    """
+    total = len(samples)
+    max_part = int(max_part_s * sample_rate)
+    if total <= max_part:
+        return [(0, total)]
+
+    window = max(1, int(SILENCE_WINDOW_S * sample_rate))
+    rms = window_rms(samples, window)
+    search = min(int(search_s * sample_rate), max_part // 2)
+
+    parts = []
+    start = 0
+    while total - start > max_part:
+        limit = start + max_part
+        first_window = (limit - search) // window
+        last_window = limit // window
+        candidates = rms[first_window:last_window]
+        if len(candidates):
+            cut = (first_window + int(np.argmin(candidates))) * window + window // 2
+        else:
+            cut = limit
+        parts.append((start, cut))
+        start = cut
+    parts.append((start, total))
+    return parts
+
+
+def encode_speech(samples: np.ndarray, sample_rate: int, bitrate: str = SPEECH_CODEC_BITRATE,
+                  ffmpeg_path: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    Сжимает PCM в Opus (ogg) через ffmpeg без временных файлов.
+    Без ffmpeg возвращает WAV. Возвращает (байты, расширение файла)
+    """
+    ffmpeg_path = ffmpeg_path or find_ffmpeg()
+    if ffmpeg_path:
+        cmd = [
+            ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+            '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+            '-c:a', 'libopus', '-b:a', bitrate, '-application', 'voip',
+            '-f', 'ogg', 'pipe:1'
+        ]
+        result = subprocess.run(cmd, input=samples.astype(np.int16).tobytes(), capture_output=True)
+        if result.returncode == 0 and result.stdout:
+            return result.stdout, 'ogg'
+        print(f"Не удалось сжать аудио в Opus: {result.stderr.decode('utf-8', 'ignore')[:300]}")
+
+    return pcm_to_wav_bytes(samples, sample_rate), 'wav'
+
+
+def pcm_to_wav_bytes(samples: np.ndarray, sample_rate: int) -> bytes:
+    import io
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def resample_linear(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Простая передискретизация линейной интерполяцией (для речи достаточно)"""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    target_length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.linspace(0, len(samples) - 1, target_length)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+
+class DecodedAudio:
+    """
+    Аудио, декодированное один раз: моно PCM int16 и частота дискретизации.
+    Все методы транскрипции берут данные отсюда, производные формы
+    (float32 для Whisper, другая частота, сжатые части) считаются лениво и кэшируются
+    """
+
+    # Сколько раз декодировался исходный файл - для бенчмарка и проверки цепочки
+    decode_count = 0
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, source: Optional[str] = None,
+                 fingerprint: Optional[str] = None, windows: Optional[List[Tuple[float, float]]] = None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source = source
+        self._float32 = None
+        self._resampled = {}
+        self._compressed = {}
+        # Для частично декодированной записи (окна) ключ кэша задается снаружи - по файлу
+        self._fingerprint = fingerprint
+        # Границы склеенных окон (с): детектор языка берет их как есть, не выбирая окна заново
+        self.windows = windows
+
+    @classmethod
+    def from_windows(cls, windows: List[np.ndarray], sample_rate: int, source: Optional[str] = None,
+                     fingerprint: Optional[str] = None) -> 'DecodedAudio':
+        """Склеивает отдельно декодированные окна записи, запоминая их границы"""
+        bounds, start = [], 0
+        for window in windows:
+            bounds.append((start / sample_rate, (start + len(window)) / sample_rate))
+            start += len(window)
+        return cls(np.concatenate(windows), sample_rate, source, fingerprint, bounds)
+
+    @classmethod
+    def from_file(cls, path: str, sample_rate: int = 16000) -> 'DecodedAudio':
+        """Декодирует аудио (или звуковую дорожку видео) через ffmpeg; WAV читается и без него"""
+        ffmpeg_path = find_ffmpeg()
+        if ffmpeg_path:
+            cmd = [
+                ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin',
+                '-i', path, '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+                '-ac', '1', '-ar', str(sample_rate), 'pipe:1'
+            ]
+            result = subprocess.run(cmd, capture_output=True)
+            if result.returncode == 0:
+                cls.decode_count += 1
+                return cls(np.frombuffer(result.stdout, dtype=np.int16), sample_rate, path)
+            if not path.lower().endswith('.wav'):
+                raise RuntimeError(f"FFmpeg ошибка: {result.stderr.decode('utf-8', 'ignore')[:300]}")
+
+        samples, source_rate = read_wav_pcm(path)
+        cls.decode_count += 1
+        return cls(resample_linear(samples, source_rate, sample_rate), sample_rate, path)
+
+    def fingerprint(self) -> str:
+        """Хэш PCM: одинаковое аудио из разных файлов дает один ключ кэша"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(str(self.sample_rate).encode())
+            digest.update(self.samples.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def nbytes(self) -> int:
+        return self.samples.nbytes
+
+    def float32(self) -> np.ndarray:
+        """Нормированный float32 - формат, который Whisper принимает вместо пути к файлу"""
+        if self._float32 is None:
+            self._float32 = self.samples.astype(np.float32) / 32768.0
+        return self._float32
+
+    def resampled(self, sample_rate: int) -> 'DecodedAudio':
+        if sample_rate == self.sample_rate:
+            return self
+        if sample_rate not in self._resampled:
+            self._resampled[sample_rate] = DecodedAudio(
+                resample_linear(self.samples, self.sample_rate, sample_rate), sample_rate, self.source,
+                windows=self.windows)
+        return self._resampled[sample_rate]
+
+    def slice_samples(self, start_s: float, end_s: float) -> np.ndarray:
+        return self.samples[int(start_s * self.sample_rate):int(end_s * self.sample_rate)]
+
+    def pcm_bytes(self, start_s: float = 0.0, end_s: Optional[float] = None) -> bytes:
+        end_s = self.duration_s if end_s is None else end_s
+        return self.slice_samples(start_s, end_s).tobytes()
+
+    def compressed(self, start: int, end: int, bitrate: str = SPEECH_CODEC_BITRATE) -> Tuple[bytes, str]:
+        """Сжатый фрагмент [start, end) в отсчетах; повторный запрос берется из кэша"""
+        key = (start, end, bitrate)
+        if key not in self._compressed:
+            self._compressed[key] = encode_speech(self.samples[start:end], self.sample_rate, bitrate)
+        return self._compressed[key]
+
+
+def as_decoded_audio(audio) -> DecodedAudio:
+    """Принимает путь к файлу или уже декодированное аудио"""
+    if isinstance(audio, DecodedAudio):
+        return audio
+    return DecodedAudio.from_file(audio)
+
+
+# Сколько PCM читаем из ffmpeg за раз и сколько таких кусков может ждать обработки
+STREAM_CHUNK_S = 5
+STREAM_MAX_CHUNKS = 12
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Длительность по заголовку контейнера, без декодирования"""
+    ffmpeg_path = find_ffmpeg()
+    if ffmpeg_path:
+        result = subprocess.run([ffmpeg_path, '-hide_banner', '-nostdin', '-i', path],
+                                capture_output=True)
+        match = re.search(rb'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+        if match:
+            hours, minutes, seconds = match.groups()
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    if path.lower().endswith('.wav'):
+        with wave.open(path, 'rb') as wav:
+            return wav.getnframes() / wav.getframerate()
+    return None
+
+
+def file_fingerprint(path: str, sample_bytes: int = 1024 * 1024) -> str:
+    """Ключ файла без декодирования: размер, начало и конец. Для потоковой обработки вместо хэша PCM"""
+    digest = hashlib.sha256(str(os.path.getsize(path)).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_bytes))
+        f.seek(max(0, os.path.getsize(path) - sample_bytes))
+        digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+def decode_window(path: str, start_s: float, duration_s: float, sample_rate: int = 16000) -> np.ndarray:
+    """Декодирует только фрагмент записи (ffmpeg перематывает к началу без декодирования)"""
+    ffmpeg_path = find_ffmpeg()
+    if ffmpeg_path:
+        cmd = [
+            ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-ss', f"{start_s:.3f}", '-t', f"{duration_s:.3f}", '-i', path, '-vn',
+            '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode == 0:
+            return np.frombuffer(result.stdout, dtype=np.int16)
+        raise RuntimeError(f"FFmpeg ошибка: {result.stderr.decode('utf-8', 'ignore')[:300]}")
+
+    with wave.open(path, 'rb') as wav:
+        source_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        wav.setpos(min(wav.getnframes(), int(start_s * source_rate)))
+        samples = np.frombuffer(wav.readframes(int(duration_s * source_rate)), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return resample_linear(samples, source_rate, sample_rate)
+
+
+class PCMStream:
+    """
+    Потоковое декодирование: фоновый поток читает PCM из ffmpeg в ограниченную очередь,
+    а потребитель забирает окна по мере поступления. Когда очередь полна, поток и ffmpeg
+    ждут - в памяти не больше STREAM_MAX_CHUNKS кусков и одного окна, сколько бы ни длилась запись.
+    Без ffmpeg так же читается WAV
+    """
+
+    def __init__(self, path: str, sample_rate: int = 16000, start_s: float = 0.0,
+                 chunk_s: float = STREAM_CHUNK_S, max_chunks: int = STREAM_MAX_CHUNKS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.start_s = start_s
+        self.chunk_samples = int(chunk_s * sample_rate)
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._stop = threading.Event()
+        self._process = None
+        self.max_buffered_bytes = 0
+        self._thread = threading.Thread(target=self._read, name="pcm-reader", daemon=True)
+        self._thread.start()
+
+    def _put(self, chunk):
+        # Ждем места в очереди, но не дольше, чем живет потребитель
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(chunk, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        try:
+            ffmpeg_path = find_ffmpeg()
+            if ffmpeg_path:
+                self._read_ffmpeg(ffmpeg_path)
+            else:
+                self._read_wav()
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def _read_ffmpeg(self, ffmpeg_path):
+        cmd = [
+            ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-ss', f"{self.start_s:.3f}", '-i', self.path, '-vn',
+            '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(self.sample_rate), 'pipe:1'
+        ]
+        self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        chunk_bytes = self.chunk_samples * 2
+        while True:
+            data = self._process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            # Нечетный хвост не встречается: ffmpeg пишет целые отсчеты
+            if not self._put(np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16)):
+                break
+        self._process.stdout.close()
+        if self._process.wait() != 0 and not self._stop.is_set():
+            raise RuntimeError(f"FFmpeg ошибка: {self._process.stderr.read().decode('utf-8', 'ignore')[:300]}")
+
+    def _read_wav(self):
+        with wave.open(self.path, 'rb') as wav:
+            source_rate = wav.getframerate()
+            channels = wav.getnchannels()
+            wav.setpos(min(wav.getnframes(), int(self.start_s * source_rate)))
+            frames = int(self.chunk_samples * source_rate / self.sample_rate)
+            while True:
+                data = wav.readframes(frames)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype=np.int16)
+                if channels > 1:
+                    samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+                if not self._put(resample_linear(samples, source_rate, self.sample_rate)):
+                    break
+
+    def chunks(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def windows(self, window_s: float, step_s: float):
+        """
+        Окна длиной window_s с шагом step_s, как при нарезке целой записи:
+        (начало в секундах от начала записи, PCM int16). Последние окна короче
+        """
+        window = int(window_s * self.sample_rate)
+        step = int(step_s * self.sample_rate)
+        buffer = np.zeros(0, dtype=np.int16)
+        position = 0
+        try:
+            for chunk in self.chunks():
+                buffer = np.concatenate([buffer, chunk])
+                self.max_buffered_bytes = max(self.max_buffered_bytes,
+                                              buffer.nbytes + self._chunks.qsize() * self.chunk_samples * 2)
+                while len(buffer) >= window:
+                    yield self.start_s + position / self.sample_rate, buffer[:window]
+                    buffer = buffer[step:]
+                    position += step
+            while len(buffer):
+                yield self.start_s + position / self.sample_rate, buffer[:window]
+                buffer = buffer[step:]
+                position += step
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._process and self._process.poll() is None:
+            self._process.kill()
@@ -0,0 +1,189 @@
+﻿import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from datetime import datetime
+from importlib import metadata
+from typing import Any, Dict, Optional
+
+CAPABILITIES_FILE = "config/capabilities.json"
+
+# Пакеты, от версий которых зависит результат проверки
+TRACKED_PACKAGES = ['openai-whisper', 'faster-whisper', 'ctranslate2', 'torch', 'SpeechRecognition', 'pydub',
+                    'moviepy', 'openai']
+
+# Модули, которые проверяем реальным импортом в отдельном процессе:
+# find_spec не ловит сломанные установки torch/whisper
+IMPORT_CHECKS = {
+    'whisper': 'whisper',
+    'faster_whisper': 'faster_whisper',
+    'speech_recognition': 'speech_recognition',
+    'moviepy': 'moviepy',
+}
+
+_lock = threading.Lock()
+_probe_thread: Optional[threading.Thread] = None
+_result: Optional[Dict[str, Any]] = None
+
+
+def find_ffmpeg() -> Optional[str]:
+    path = shutil.which('ffmpeg')
+    if path:
+        return os.path.abspath(path)
+    # ffmpeg_installer кладет ffmpeg.exe в корень проекта
+    if os.path.exists('ffmpeg.exe'):
+        return os.path.abspath('ffmpeg.exe')
+    return None
+
+
+def _package_version(package: str) -> Optional[str]:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment_fingerprint() -> Dict[str, Any]:
+    ffmpeg_path = find_ffmpeg()
+    ffmpeg_mtime = None
+    if ffmpeg_path:
+        try:
+            ffmpeg_mtime = os.path.getmtime(ffmpeg_path)
+        except OSError:
+            pass
+
+    return {
+        'python': sys.executable,
+        'ffmpeg_path': ffmpeg_path,
+        'ffmpeg_mtime': ffmpeg_mtime,
+        'packages': {package: _package_version(package) for package in TRACKED_PACKAGES},
+    }
+
+
+def _check_import(module_name: str) -> bool:
+    try:
+        result = subprocess.run([sys.executable, '-c', f'import {module_name}'],
+                                capture_output=True, timeout=120)
+        return result.returncode == 0
+    except Exception:
+        return False
+
+
+def _probe_ffmpeg(ffmpeg_path: Optional[str]):
+    if not ffmpeg_path:
+        return False, "FFmpeg не найден"
+    try:
+        result = subprocess.run([ffmpeg_path, '-version'], capture_output=True, text=True, timeout=30)
+        return result.returncode == 0, result.stdout.split('\n')[0]
+    except Exception as e:
+        return False, f"Ошибка запуска FFmpeg: {e}"
+
+
+def probe_capabilities(fingerprint: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Выполняет полную (медленную) проверку окружения"""
+    fingerprint = fingerprint or environment_fingerprint()
+
+    methods = {name: _check_import(module) for name, module in IMPORT_CHECKS.items()}
+    methods['ffmpeg'], ffmpeg_version = _probe_ffmpeg(fingerprint['ffmpeg_path'])
+
+    return {
+        'fingerprint': fingerprint,
+        'methods': methods,
+        'ffmpeg_version': ffmpeg_version,
+        'probed_at': datetime.now().isoformat(),
+    }
+
+
+def load_cached_capabilities() -> Optional[Dict[str, Any]]:
+    try:
+        if os.path.exists(CAPABILITIES_FILE):
+            with open(CAPABILITIES_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Ошибка загрузки кэша возможностей: {e}")
+    return None
+
+
+def save_cached_capabilities(capabilities: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(CAPABILITIES_FILE), exist_ok=True)
+        with open(CAPABILITIES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(capabilities, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"Ошибка сохранения кэша возможностей: {e}")
+
+
+def _fallback_capabilities(error: Exception) -> Dict[str, Any]:
+    """Результат на случай сбоя проверки: все методы считаем недоступными, в кэш не пишем"""
+    methods = {name: False for name in IMPORT_CHECKS}
+    methods['ffmpeg'] = False
+    return {
+        'fingerprint': None,
+        'methods': methods,
+        'ffmpeg_version': f"Ошибка проверки окружения: {error}",
+        'error': str(error),
+        'probed_at': datetime.now().isoformat(),
+    }
+
+
+def _run_probe(force: bool):
+    global _result
+    try:
+        fingerprint = environment_fingerprint()
+
+        cached = None if force else load_cached_capabilities()
+        if cached and cached.get('fingerprint') == fingerprint:
+            capabilities = cached
+        else:
+            capabilities = probe_capabilities(fingerprint)
+            save_cached_capabilities(capabilities)
+    except Exception as e:
+        print(f"Ошибка проверки окружения: {e}")
+        capabilities = _fallback_capabilities(e)
+
+    with _lock:
+        _result = capabilities
+
+
+def start_capability_probe(force: bool = False) -> threading.Thread:
+    """
+    Запускает проверку в фоне один раз на процесс (повторный вызов ничего не делает).
+    force=True проверяет заново; идущую проверку сначала дожидается: она могла начаться
+    до изменения окружения (например, до установки FFmpeg)
+    """
+    global _probe_thread, _result
+    with _lock:
+        current = _probe_thread
+        if current is not None and not force:
+            return current
+    if current is not None:
+        current.join()
+
+    with _lock:
+        if _probe_thread is not current:
+            # Пока ждали, новую проверку уже запустил другой вызов - она тоже началась после нашего запроса
+            return _probe_thread
+        if force:
+            _result = None
+        _probe_thread = threading.Thread(target=_run_probe, args=(force,),
+                                         name="capability-probe", daemon=True)
+        _probe_thread.start()
+        return _probe_thread
+
+
+def get_capabilities(wait: bool = True, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Возвращает результат проверки; при wait=True дожидается фонового потока"""
+    thread = start_capability_probe()
+    if wait:
+        thread.join(timeout)
+    with _lock:
+        return _result
+
+
+def refresh_capabilities() -> Optional[Dict[str, Any]]:
+    """Принудительно перепроверяет окружение (например, после установки FFmpeg)"""
+    start_capability_probe(force=True).join()
+    with _lock:
+        return _result
@@ -0,0 +1,122 @@
+﻿import json
+import os
+import re
+from typing import Dict, Optional
+
+GLOSSARY_FILE = "config/glossary.json"
+
+# Словарь замен для частых ошибок транскрипции смешанной речи.
+# Используется, если пользователь еще не создал config/glossary.json
+DEFAULT_GLOSSARY = {
+    # Социальные сети
+    'ютуб': 'YouTube',
+    'ютьюб': 'YouTube',
+    'ю-туб': 'YouTube',
+    'тикток': 'TikTok',
+    'тик-ток': 'TikTok',
+    'инстаграм': 'Instagram',
+    'инста': 'Instagram',
+
+    # Технические термины
+    'апи': 'API',
+    'эйпиай': 'API',
+    'юай': 'UI',
+    'юикс': 'UX',
+    'апдейт': 'update',
+    'аплоад': 'upload',
+    'даунлоад': 'download',
+    'стрим': 'stream',
+    'контент': 'content',
+    'браузер': 'browser',
+    'юзер': 'user',
+    'юзеры': 'users',
+
+    # Частые английские слова
+    'окей': 'okay',
+    'оке': 'OK',
+    'плиз': 'please',
+    'сори': 'sorry',
+    'хай': 'hi',
+    'бай': 'bye',
+
+    # Исправление слитного написания
+    'видеона': 'видео на',
+    'этовидео': 'это видео',
+    'навидео': 'на видео',
+
+    'хардскилл': 'hardskill',
+    'лид': 'lead',
+    'дев': 'dev',
+    'арты': 'arts',
+    'юайка': 'UI',
+}
+
+# Один проход вместо двух: схлопываем пробелы и убираем пробел перед знаком препинания
+WHITESPACE_PATTERN = re.compile(r'\s+([.,!?]?)')
+
+
+class GlossaryEngine:
+    """Компилирует весь словарь в одно регулярное выражение и применяет его за один проход"""
+
+    def __init__(self, replacements: Dict[str, str]):
+        self.replacements = {wrong.lower(): correct for wrong, correct in replacements.items() if wrong}
+        self.pattern = self._compile(self.replacements)
+
+    @staticmethod
+    def _compile(replacements: Dict[str, str]) -> Optional[re.Pattern]:
+        if not replacements:
+            return None
+        # Длинные варианты первыми, чтобы 'юзеры' не перехватывалось 'юзер'
+        alternatives = sorted(replacements, key=len, reverse=True)
+        return re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in alternatives) + r')\b',
+                          flags=re.IGNORECASE)
+
+    def _replace(self, match):
+        return self.replacements[match.group(0).lower()]
+
+    def apply(self, text: str) -> str:
+        if not text:
+            return ''
+        if self.pattern is not None:
+            text = self.pattern.sub(self._replace, text)
+        text = WHITESPACE_PATTERN.sub(lambda m: m.group(1) or ' ', text)
+        return text.strip()
+
+    def count_hits(self, text: str) -> int:
+        """Количество срабатываний словаря в тексте"""
+        if not text or self.pattern is None:
+            return 0
+        return sum(1 for _ in self.pattern.finditer(text))
+
+
+_engine_cache = {'mtime': None, 'engine': None}
+
+
+def load_glossary() -> Dict[str, str]:
+    try:
+        if os.path.exists(GLOSSARY_FILE):
+            with open(GLOSSARY_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Ошибка загрузки словаря: {e}")
+    return dict(DEFAULT_GLOSSARY)
+
+
+def save_glossary(glossary: Dict[str, str]) -> bool:
+    try:
+        os.makedirs(os.path.dirname(GLOSSARY_FILE), exist_ok=True)
+        with open(GLOSSARY_FILE, 'w', encoding='utf-8') as f:
+            json.dump(glossary, f, indent=2, ensure_ascii=False)
+        return True
+    except Exception as e:
+        print(f"Ошибка сохранения словаря: {e}")
+        return False
+
+
+def get_glossary_engine() -> GlossaryEngine:
+    """Возвращает скомпилированный словарь; перекомпилирует только при изменении файла"""
+    mtime = os.path.getmtime(GLOSSARY_FILE) if os.path.exists(GLOSSARY_FILE) else None
+    if _engine_cache['engine'] is None or _engine_cache['mtime'] != mtime:
+        _engine_cache['engine'] = GlossaryEngine(load_glossary())
+        _engine_cache['mtime'] = mtime
+    return _engine_cache['engine']
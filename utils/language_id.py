@@ -0,0 +1,174 @@
+﻿import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.response_cache import CACHE_DIR
+
+LANGUAGE_CACHE_FILE = os.path.join(CACHE_DIR, "languages.json")
+
+# Сколько окон и какой длины слушаем для определения языка
+DETECTION_WINDOWS = 3
+DETECTION_WINDOW_S = 30
+
+# verbose_json OpenAI возвращает название языка, Whisper - код
+LANGUAGE_NAMES = {
+    'russian': 'ru',
+    'english': 'en',
+    'ukrainian': 'uk',
+    'belarusian': 'be',
+    'kazakh': 'kk',
+    'german': 'de',
+    'spanish': 'es',
+}
+
+# Коды языков для Google Speech Recognition
+SPEECH_RECOGNITION_CODES = {
+    'ru': 'ru-RU',
+    'en': 'en-US',
+    'uk': 'uk-UA',
+    'be': 'be-BY',
+    'kk': 'kk-KZ',
+    'de': 'de-DE',
+    'es': 'es-ES',
+}
+
+_cache_lock = threading.Lock()
+
+
+def normalize_language(language: Optional[str]) -> Optional[str]:
+    if not language:
+        return None
+    language = language.lower()
+    return LANGUAGE_NAMES.get(language, language)
+
+
+def sample_windows(duration_s: float, count: int = DETECTION_WINDOWS,
+                   window_s: float = DETECTION_WINDOW_S) -> List[float]:
+    """Начала окон, равномерно разнесенных по записи (вступление часто без речи)"""
+    if duration_s <= window_s:
+        return [0.0]
+    count = max(1, min(count, int(duration_s // window_s)))
+    step = (duration_s - window_s) / (count + 1)
+    return [step * (i + 1) for i in range(count)]
+
+
+def detection_windows(audio) -> List[Tuple[float, float]]:
+    """
+    Окна (начало, конец в с) для детектора: если audio - уже склеенные окна записи
+    (DecodedAudio.from_windows), берем их границы, иначе выбираем окна по всей записи
+    """
+    if audio.windows:
+        return audio.windows
+    return [(start_s, min(start_s + DETECTION_WINDOW_S, audio.duration_s))
+            for start_s in sample_windows(audio.duration_s)]
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        if os.path.exists(LANGUAGE_CACHE_FILE):
+            with open(LANGUAGE_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Ошибка загрузки кэша языков: {e}")
+    return {}
+
+
+def get_cached_language(fingerprint: str) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        return _load_cache().get(fingerprint)
+
+
+def save_cached_language(fingerprint: str, result: Dict[str, Any]):
+    with _cache_lock:
+        data = _load_cache()
+        data[fingerprint] = result
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Уникальное имя: кэш пишут и приложение, и процесс фоновых задач, и сервер моделей
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=CACHE_DIR, suffix='.tmp',
+                                             delete=False) as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(f.name, LANGUAGE_CACHE_FILE)
+        except Exception as e:
+            print(f"Ошибка сохранения кэша языков: {e}")
+
+
+def detect_with_whisper(audio, model) -> Dict[str, Any]:
+    """Усредняет вероятности языков Whisper по нескольким окнам"""
+    import whisper
+
+    audio = audio.resampled(whisper.audio.SAMPLE_RATE)
+    samples = audio.float32()
+    totals: Dict[str, float] = {}
+    windows = detection_windows(audio)
+
+    for start_s, end_s in windows:
+        window = whisper.pad_or_trim(samples[int(start_s * audio.sample_rate):int(end_s * audio.sample_rate)])
+        # large-v3 ждет 128 мел-полос, остальные модели - 80
+        mel = whisper.log_mel_spectrogram(window, n_mels=model.dims.n_mels).to(model.device)
+        _, probs = model.detect_language(mel)
+        for language, probability in probs.items():
+            totals[language] = totals.get(language, 0.0) + probability
+
+    language = max(totals, key=totals.get)
+    return {'language': language, 'confidence': totals[language] / len(windows),
+            'method': 'whisper', 'windows': len(windows)}
+
+
+def detect_with_openai(audio, client) -> Dict[str, Any]:
+    """Распознает короткие окна через API без фиксированного языка и голосует по ответам"""
+    from utils.audio import encode_speech
+
+    windows = detection_windows(audio)
+    futures = []
+    for i, (start_s, end_s) in enumerate(windows):
+        data, extension = encode_speech(audio.slice_samples(start_s, end_s), audio.sample_rate)
+        futures.append(client.submit(client.atranscribe(data, filename=f"language_{i}.{extension}",
+                                                        model="whisper-1", response_format="verbose_json")))
+
+    votes: Dict[str, int] = {}
+    for future in futures:
+        language = normalize_language(future.result().get('language'))
+        if language:
+            votes[language] = votes.get(language, 0) + 1
+
+    if not votes:
+        return None
+    language = max(votes, key=votes.get)
+    return {'language': language, 'confidence': votes[language] / len(windows),
+            'method': 'openai', 'windows': len(windows)}
+
+
+def detect_language(audio, transcriber=None, client=None) -> Optional[Dict[str, Any]]:
+    """
+    Определяет язык по нескольким окнам записи один раз на файл: результат кэшируется
+    по отпечатку аудио. transcriber - загруженный движок из transcribers, client - OpenAIClient.
+    Возвращает {'language', 'confidence', 'method', 'windows'} или None
+    """
+    fingerprint = audio.fingerprint()
+    cached = get_cached_language(fingerprint)
+    if cached:
+        return cached
+
+    start_time = time.perf_counter()
+    try:
+        if transcriber is not None:
+            result = transcriber.detect_language(audio)
+        elif client is not None:
+            result = detect_with_openai(audio, client)
+        else:
+            return None
+    except Exception as e:
+        print(f"Ошибка определения языка: {e}")
+        return None
+
+    if not result:
+        return None
+    result['detection_s'] = round(time.perf_counter() - start_time, 3)
+    save_cached_language(fingerprint, result)
+    print(f"Язык: {result['language']} ({result['confidence']:.0%}, {result['method']}, "
+          f"{result['detection_s']:.1f} с)")
+    return result
@@ -0,0 +1,49 @@
+﻿import importlib
+import importlib.util
+import sys
+import time
+from typing import Dict
+
+# Классы, которые тянут тяжелые SDK (googleapiclient, selenium, instagrapi).
+# Модули импортируются только при первом реальном обращении.
+LAZY_CLASSES = {
+    'YouTubeUploader': 'uploaders.youtube',
+    'TikTokUploader': 'uploaders.tiktok',
+    'InstagramUploader': 'uploaders.instagram',
+}
+
+_import_times: Dict[str, float] = {}
+
+
+def import_module_timed(module_name: str):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_times[module_name] = time.perf_counter() - start
+    print(f"Lazy import: {module_name} ({_import_times[module_name]:.2f}s)")
+    return module
+
+
+def lazy_class(class_name: str):
+    module = import_module_timed(LAZY_CLASSES[class_name])
+    return getattr(module, class_name)
+
+
+def is_module_loaded(module_name: str) -> bool:
+    return module_name in sys.modules
+
+
+def is_module_available(module_name: str) -> bool:
+    """Проверяет наличие пакета без его импорта"""
+    if module_name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def get_import_times() -> Dict[str, float]:
+    return dict(_import_times)
@@ -0,0 +1,187 @@
+﻿import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+CACHE_DIR = "cache"
+RTF_FILE = "cache/whisper_rtf.json"
+SELECTION_LOG_FILE = "cache/model_selection.jsonl"
+
+# От меньшей модели к большей
+WHISPER_MODELS = ('tiny', 'base', 'small', 'medium', 'large')
+
+# Примерный пик памяти процесса с загруженной моделью, ГБ
+MODEL_MEMORY_GB = {
+    'openai-whisper': {'tiny': 1.0, 'base': 1.2, 'small': 2.0, 'medium': 5.0, 'large': 10.0},
+    'faster-whisper': {'tiny': 0.4, 'base': 0.5, 'small': 0.9, 'medium': 1.8, 'large': 3.5},
+}
+
+# Стартовые оценки real-time factor на REFERENCE_CORES ядрах, пока нет своих замеров
+PRIOR_RTF = {
+    'openai-whisper': {'tiny': 0.06, 'base': 0.12, 'small': 0.35, 'medium': 1.0, 'large': 2.2},
+    'faster-whisper': {'tiny': 0.02, 'base': 0.04, 'small': 0.12, 'medium': 0.35, 'large': 0.8},
+}
+REFERENCE_CORES = 8
+
+# Вес нового замера в скользящем среднем RTF
+RTF_SMOOTHING = 0.3
+
+# Запас памяти под само приложение и систему
+MEMORY_RESERVE_GB = 1.0
+
+_lock = threading.Lock()
+
+
+def cpu_cores() -> int:
+    return os.cpu_count() or 1
+
+
+def available_memory_gb() -> Optional[float]:
+    """Свободная память; None, если определить не удалось"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available / 1024 ** 3
+    except ImportError:
+        pass
+    try:
+        if hasattr(os, 'sysconf') and 'SC_AVPHYS_PAGES' in os.sysconf_names:
+            return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 3
+        if os.name == 'nt':
+            import ctypes
+
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                            ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                            ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                            ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                            ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+            status = MemoryStatus()
+            status.dwLength = ctypes.sizeof(MemoryStatus)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullAvailPhys / 1024 ** 3
+    except Exception as e:
+        print(f"Не удалось определить свободную память: {e}")
+    return None
+
+
+def _rtf_key(backend: str, model_name: str, threads: int) -> str:
+    return f"{backend}:{model_name}:{threads}"
+
+
+def _load_rtf() -> Dict[str, Any]:
+    try:
+        if os.path.exists(RTF_FILE):
+            with open(RTF_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"Ошибка чтения замеров RTF: {e}")
+    return {}
+
+
+def record_rtf(backend: str, model_name: str, threads: int, audio_s: float, inference_s: float):
+    """Запоминает фактический RTF прогона (время распознавания / длительность аудио)"""
+    if audio_s <= 0:
+        return
+    rtf = inference_s / audio_s
+    with _lock:
+        data = _load_rtf()
+        entry = data.get(_rtf_key(backend, model_name, threads))
+        if entry:
+            entry['rtf'] = (1 - RTF_SMOOTHING) * entry['rtf'] + RTF_SMOOTHING * rtf
+            entry['runs'] += 1
+        else:
+            entry = {'rtf': rtf, 'runs': 1}
+        entry['updated_at'] = datetime.now().isoformat()
+        data[_rtf_key(backend, model_name, threads)] = entry
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Уникальное имя: замеры пишут и приложение, и процесс фоновых задач
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=CACHE_DIR, suffix='.tmp',
+                                             delete=False) as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(f.name, RTF_FILE)
+        except Exception as e:
+            print(f"Ошибка сохранения замеров RTF: {e}")
+
+
+def estimate_rtf(backend: str, model_name: str, threads: int, learned: Optional[Dict[str, Any]] = None):
+    """RTF из своих замеров, а без них - стартовая оценка с поправкой на число ядер. Возвращает (rtf, источник)"""
+    learned = _load_rtf() if learned is None else learned
+    entry = learned.get(_rtf_key(backend, model_name, threads))
+    if entry:
+        return entry['rtf'], f"замер ({entry['runs']} прогонов)"
+
+    priors = PRIOR_RTF.get(backend, PRIOR_RTF['openai-whisper'])
+    # Внутренние потоки масштабируются хуже линейного, поэтому степень меньше 1
+    scale = (REFERENCE_CORES / max(1, min(threads, REFERENCE_CORES))) ** 0.75
+    return priors[model_name] * scale, "оценка"
+
+
+def select_model(duration_s: float, backend: str, target_s: float, workers: int = 1,
+                 threads: int = 0, check_memory: bool = True) -> Dict[str, Any]:
+    """
+    Самая большая модель, которая помещается в память и укладывается в target_s секунд
+    на запись длиной duration_s. Если ни одна не укладывается - самая быстрая из помещающихся.
+    Возвращает выбор с причиной и расчетом по всем кандидатам
+    """
+    workers = max(1, workers)
+    cores = cpu_cores()
+    threads = threads or max(1, cores // workers)
+    memory_gb = available_memory_gb() if check_memory else None
+    learned = _load_rtf()
+    memory_table = MODEL_MEMORY_GB.get(backend, MODEL_MEMORY_GB['openai-whisper'])
+
+    candidates: List[Dict[str, Any]] = []
+    for model_name in WHISPER_MODELS:
+        rtf, source = estimate_rtf(backend, model_name, threads, learned)
+        needed_gb = memory_table[model_name] * workers
+        candidates.append({
+            'model': model_name,
+            'rtf': round(rtf, 4),
+            'rtf_source': source,
+            'expected_s': round(duration_s * rtf / workers, 1),
+            'memory_gb': needed_gb,
+            'fits_memory': memory_gb is None or needed_gb + MEMORY_RESERVE_GB <= memory_gb,
+        })
+
+    fitting = [c for c in candidates if c['fits_memory']] or candidates[:1]
+    on_time = [c for c in fitting if c['expected_s'] <= target_s]
+    if on_time:
+        chosen = on_time[-1]
+        reason = (f"{chosen['model']}: самая большая модель, которая успевает за {target_s / 60:.0f} мин "
+                  f"(~{chosen['expected_s'] / 60:.1f} мин, RTF {chosen['rtf']:.2f} - {chosen['rtf_source']})")
+    else:
+        chosen = fitting[0]
+        reason = (f"{chosen['model']}: ни одна модель не успевает за {target_s / 60:.0f} мин, "
+                  f"берем самую быструю (~{chosen['expected_s'] / 60:.1f} мин)")
+    if len(fitting) < len(candidates):
+        reason += f"; не помещаются в {memory_gb:.1f} ГБ свободной памяти: " + \
+                  ", ".join(c['model'] for c in candidates if not c['fits_memory'])
+
+    return {
+        'model': chosen['model'],
+        'reason': reason,
+        'backend': backend,
+        'duration_s': round(duration_s, 1),
+        'target_s': target_s,
+        'cores': cores,
+        'workers': workers,
+        'threads': threads,
+        'available_memory_gb': round(memory_gb, 2) if memory_gb is not None else None,
+        'candidates': candidates,
+    }
+
+
+def log_selection(selection: Dict[str, Any]):
+    """Журнал выборов модели: почему для записи взята именно эта модель"""
+    entry = {'timestamp': datetime.now().isoformat(), **selection}
+    try:
+        with _lock:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(SELECTION_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    except Exception as e:
+        print(f"Ошибка записи журнала выбора модели: {e}")
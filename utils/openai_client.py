@@ -0,0 +1,251 @@
+﻿import asyncio
+import json
+import os
+import queue
+import random
+import threading
+from typing import Any, Dict, Optional
+
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+
+# Статусы, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class OpenAIError(Exception):
+    def __init__(self, message, status=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class _EventLoopThread:
+    """
+    Один фоновый event loop на процесс. Синхронный код Streamlit отправляет в него
+    корутины, а aiohttp-сессия с пулом соединений живет внутри этого цикла.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="openai-client-loop", daemon=True)
+        self.thread.start()
+        # Ключ - лимит из настроек: после его изменения новые запросы идут через новый пул и
+        # семафор, а начатые дорабатывают на старых
+        self._sessions = {}
+        self._semaphores = {}
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def get_session(self, pool_size):
+        import aiohttp
+
+        session = self._sessions.get(pool_size)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=pool_size, keepalive_timeout=60)
+            session = self._sessions[pool_size] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    def get_semaphore(self, max_concurrency):
+        # Общий лимит на процесс: все сессии Streamlit и фоновые задачи с этим лимитом делят его
+        if max_concurrency not in self._semaphores:
+            self._semaphores[max_concurrency] = asyncio.Semaphore(max_concurrency)
+        return self._semaphores[max_concurrency]
+
+
+_loop_thread: Optional[_EventLoopThread] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop_thread() -> _EventLoopThread:
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _EventLoopThread()
+        return _loop_thread
+
+
+class OpenAIClient:
+    """
+    Асинхронный клиент OpenAI REST API.
+    Ключ передается в заголовке каждого запроса, глобальный openai.api_key не используется.
+    """
+
+    def __init__(self, api_key, api_base=DEFAULT_API_BASE, timeout=60.0, max_retries=4,
+                 max_concurrency=4, pool_size=20, backoff_base=1.0, backoff_max=30.0):
+        self.api_key = api_key
+        self.api_base = (api_base or DEFAULT_API_BASE).rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._loop_thread = _get_loop_thread()
+
+    def _headers(self):
+        return {'Authorization': f'Bearer {self.api_key}'}
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        # Экспоненциальная задержка с полным джиттером
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    async def _send(self, session, semaphore, method, url, client_timeout, json_body=None, form_factory=None):
+        """
+        Отправляет запрос с повторами; возвращает открытый ответ со статусом < 400 и занятым
+        слотом semaphore - вызывающий освобождает его после чтения тела. Слот берется на каждую
+        попытку отдельно: пауза перед повтором не держит его и не тормозит остальные запросы
+        """
+        import aiohttp
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            await semaphore.acquire()
+            try:
+                # Форму собираем заново на каждую попытку: тело multipart одноразовое
+                data = form_factory() if form_factory else None
+                response = await session.request(method, url, json=json_body, data=data,
+                                                 headers=self._headers(), timeout=client_timeout)
+                if response.status < 400:
+                    return response
+
+                body = await response.text()
+                retry_after = response.headers.get('Retry-After')
+                response.release()
+                last_error = OpenAIError(f"HTTP {response.status}: {body[:500]}", status=response.status,
+                                         retryable=response.status in RETRY_STATUSES)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = OpenAIError(f"Сетевая ошибка: {type(e).__name__}: {e}", retryable=True)
+            except BaseException:
+                semaphore.release()
+                raise
+            semaphore.release()
+
+            if not last_error.retryable or attempt == self.max_retries:
+                break
+
+            delay = self._backoff_delay(attempt, retry_after)
+            print(f"OpenAI: попытка {attempt + 1} не удалась ({last_error}), повтор через {delay:.1f} с")
+            await asyncio.sleep(delay)
+
+        raise last_error
+
+    async def _request(self, method, path, timeout=None, json_body=None, form_factory=None):
+        import aiohttp
+
+        session = await self._loop_thread.get_session(self.pool_size)
+        semaphore = self._loop_thread.get_semaphore(self.max_concurrency)
+        url = f"{self.api_base}/{path.lstrip('/')}"
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+
+        response = await self._send(session, semaphore, method, url, client_timeout, json_body, form_factory)
+        try:
+            return await response.json(content_type=None)
+        finally:
+            response.release()
+            semaphore.release()
+
+    async def achat(self, timeout=None, **params) -> Dict[str, Any]:
+        return await self._request('POST', 'chat/completions', timeout=timeout, json_body=params)
+
+    async def astream_chat(self, timeout=None, **params):
+        """Потоковый ChatCompletion: отдает разобранные SSE-чанки по мере поступления"""
+        import aiohttp
+
+        session = await self._loop_thread.get_session(self.pool_size)
+        semaphore = self._loop_thread.get_semaphore(self.max_concurrency)
+        url = f"{self.api_base}/chat/completions"
+        # Для потока ограничиваем паузу между чанками, а не общее время ответа
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_read=timeout or self.timeout)
+        body = {**params, 'stream': True, 'stream_options': {'include_usage': True}}
+
+        response = await self._send(session, semaphore, 'POST', url, client_timeout, json_body=body)
+        try:
+            async for raw_line in response.content:
+                line = raw_line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                yield json.loads(data)
+        finally:
+            response.release()
+            semaphore.release()
+
+    async def atranscribe(self, audio, filename=None, timeout=None, **params) -> Dict[str, Any]:
+        """audio - путь к файлу или bytes"""
+        import aiohttp
+
+        if isinstance(audio, (bytes, bytearray)):
+            audio_bytes = bytes(audio)
+            filename = filename or 'audio.wav'
+        else:
+            with open(audio, 'rb') as f:
+                audio_bytes = f.read()
+            filename = filename or os.path.basename(audio)
+
+        def form_factory():
+            form = aiohttp.FormData()
+            for key, value in params.items():
+                if value is not None:
+                    form.add_field(key, str(value))
+            form.add_field('file', audio_bytes, filename=filename)
+            return form
+
+        return await self._request('POST', 'audio/transcriptions', timeout=timeout, form_factory=form_factory)
+
+    def submit(self, coro):
+        """Запускает корутину в общем цикле и возвращает concurrent.futures.Future"""
+        return self._loop_thread.submit(coro)
+
+    def chat(self, timeout=None, **params) -> Dict[str, Any]:
+        """Синхронная обертка для Streamlit и фоновых потоков"""
+        return self.submit(self.achat(timeout=timeout, **params)).result()
+
+    def stream_chat(self, timeout=None, **params):
+        """Синхронный генератор поверх astream_chat для кода Streamlit"""
+        events = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self.astream_chat(timeout=timeout, **params):
+                    events.put(('chunk', chunk))
+                events.put(('done', None))
+            except Exception as e:
+                events.put(('error', e))
+
+        self.submit(pump())
+        while True:
+            kind, value = events.get()
+            if kind == 'chunk':
+                yield value
+            elif kind == 'error':
+                raise value
+            else:
+                return
+
+    def transcribe(self, audio, filename=None, timeout=None, **params) -> Dict[str, Any]:
+        return self.submit(self.atranscribe(audio, filename=filename, timeout=timeout, **params)).result()
+
+
+def get_openai_client(config: Dict[str, Any], api_key: Optional[str] = None) -> OpenAIClient:
+    """Клиент с настройками из ai_config; все клиенты делят один пул соединений"""
+    return OpenAIClient(
+        api_key=api_key or config.get('openai_api_key'),
+        api_base=config.get('openai_api_base') or DEFAULT_API_BASE,
+        timeout=config.get('openai_timeout_s', 60),
+        max_retries=config.get('openai_max_retries', 4),
+        max_concurrency=config.get('openai_max_concurrency', 4),
+    )
@@ -0,0 +1,118 @@
+﻿import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+CACHE_DIR = "cache"
+RESPONSE_CACHE_FILE = "cache/openai_responses.json"
+USAGE_LOG_FILE = "cache/openai_usage.jsonl"
+
+
+def make_cache_key(payload: Dict[str, Any]) -> str:
+    """Хэш запроса: промпт, системный промпт и параметры модели"""
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+# Общая блокировка на модуль: get_response_cache() создает новый ResponseCache на каждый вызов,
+# и писатели из разных потоков (map-reduce, пакетная и ранняя генерация) должны видеть одну
+_cache_lock = threading.Lock()
+
+
+class ResponseCache:
+    def __init__(self, cache_file=RESPONSE_CACHE_FILE, ttl_seconds=24 * 3600):
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Ошибка загрузки кэша ответов: {e}")
+        return {}
+
+    def _save(self, data: Dict[str, Any]):
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            os.makedirs(cache_dir, exist_ok=True)
+            # Уникальное имя: другой процесс (пул транскрипции) не подменит наш недописанный файл
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=cache_dir, suffix='.tmp',
+                                             delete=False) as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(f.name, self.cache_file)
+        except Exception as e:
+            print(f"Ошибка сохранения кэша ответов: {e}")
+
+    def _is_fresh(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry.get('created_at', 0) < self.ttl_seconds
+
+    @property
+    def enabled(self) -> bool:
+        # TTL 0 в настройках - кэш выключен: не читаем и не переписываем файл впустую
+        return self.ttl_seconds > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with _cache_lock:
+            entry = self._load().get(key)
+        if entry and self._is_fresh(entry, time.time()):
+            return entry['value']
+        return None
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        with _cache_lock:
+            now = time.time()
+            # Заодно выбрасываем устаревшие записи, чтобы файл не рос бесконечно
+            data = {k: v for k, v in self._load().items() if self._is_fresh(v, now)}
+            data[key] = {'value': value, 'created_at': now}
+            self._save(data)
+
+
+_usage_lock = threading.Lock()
+
+
+def record_usage(entry: Dict[str, Any]):
+    """Дописывает в журнал расход токенов и задержку одного вызова"""
+    entry = {'timestamp': datetime.now().isoformat(), **entry}
+    try:
+        with _usage_lock:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(USAGE_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    except Exception as e:
+        print(f"Ошибка записи журнала использования: {e}")
+
+
+def get_usage_summary() -> Dict[str, Any]:
+    summary = {'calls': 0, 'cache_hits': 0, 'total_tokens': 0, 'avg_latency_s': 0.0}
+    latencies = []
+    try:
+        if not os.path.exists(USAGE_LOG_FILE):
+            return summary
+        with open(USAGE_LOG_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                summary['calls'] += 1
+                if entry.get('cached'):
+                    summary['cache_hits'] += 1
+                    continue
+                summary['total_tokens'] += entry.get('total_tokens') or 0
+                if entry.get('latency_s') is not None:
+                    latencies.append(entry['latency_s'])
+    except Exception as e:
+        print(f"Ошибка чтения журнала использования: {e}")
+    if latencies:
+        summary['avg_latency_s'] = sum(latencies) / len(latencies)
+    return summary
@@ -0,0 +1,162 @@
+﻿import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+TRACE_DIR = "cache"
+TRACE_FILE = "cache/traces.jsonl"
+
+# Ротация журнала: при превышении размера файл сдвигается в traces.jsonl.1 и т.д.
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+# Текущий span потока/задачи: вложенные span получают тот же trace_id и ссылку на родителя
+_current_span = contextvars.ContextVar('current_span', default=None)
+_lock = threading.Lock()
+
+
+def _rotate():
+    if not os.path.exists(TRACE_FILE) or os.path.getsize(TRACE_FILE) < TRACE_MAX_BYTES:
+        return
+    for index in range(TRACE_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{TRACE_FILE}.{index}"):
+            os.replace(f"{TRACE_FILE}.{index}", f"{TRACE_FILE}.{index + 1}")
+    os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+
+
+def _write(entry: Dict[str, Any]):
+    try:
+        with _lock:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            _rotate()
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+    except Exception as e:
+        print(f"Ошибка записи трассировки: {e}")
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    Замеряет этап и пишет его в журнал одной строкой JSONL. Внутри блока в возвращенный
+    словарь можно добавить поля (например, id загруженного видео). Исключение помечает
+    span ошибкой и пробрасывается дальше
+    """
+    parent = _current_span.get()
+    ids = {
+        'span_id': uuid.uuid4().hex[:16],
+        'trace_id': parent['ids']['trace_id'] if parent else uuid.uuid4().hex[:16],
+        'parent_id': parent['ids']['span_id'] if parent else None,
+    }
+    fields = dict(attrs)
+    token = _current_span.set({'ids': ids, 'fields': fields})
+    status, error = 'ok', None
+    started_at = datetime.now()
+    started = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        status, error = 'error', f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _write({'timestamp': started_at.isoformat(), 'stage': stage,
+                'duration_s': round(time.perf_counter() - started, 4), 'status': status, 'error': error,
+                'pid': os.getpid(), **ids, **fields})
+
+
+def traced(stage: str, falsy_is_error: bool = False, **attrs):
+    """
+    Декоратор: весь вызов функции - один span. falsy_is_error - для функций, которые сообщают
+    о сбое не исключением, а результатом False/None (вход и загрузка в uploaders): такой
+    результат помечает span ошибкой (outcome='error')
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, **attrs) as fields:
+                result = func(*args, **kwargs)
+                if falsy_is_error and not result:
+                    fields.setdefault('outcome', 'error')
+                return result
+        return wrapper
+    return decorator
+
+
+def annotate(**fields):
+    """Добавляет поля в текущий span (например, id элемента очереди внутри @traced-функции)"""
+    current = _current_span.get()
+    if current is not None:
+        current['fields'].update(fields)
+
+
+def is_failed(entry: Dict[str, Any]) -> bool:
+    """Ошибка - исключение в span или неудачный итог, отмеченный кодом (outcome='error')"""
+    return entry['status'] == 'error' or entry.get('outcome') == 'error'
+
+
+def read_spans(since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Все span из журнала и его ротированных копий, от старых к новым"""
+    paths = [f"{TRACE_FILE}.{index}" for index in range(TRACE_BACKUPS, 0, -1)] + [TRACE_FILE]
+    spans = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if since is None or entry['timestamp'] >= since.isoformat():
+                        spans.append(entry)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            print(f"Ошибка чтения трассировки {path}: {e}")
+    return spans
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize_spans(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """p50/p95 по этапам; этапы с платформой (publish.platform и т.п.) считаются отдельно по платформам"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in spans:
+        key = f"{entry['stage']} [{entry['platform']}]" if entry.get('platform') else entry['stage']
+        groups.setdefault(key, []).append(entry)
+
+    rows = []
+    for key, entries in groups.items():
+        durations = sorted(entry['duration_s'] for entry in entries)
+        rows.append({
+            'stage': key,
+            'count': len(entries),
+            'errors': sum(1 for entry in entries if is_failed(entry)),
+            'p50_s': _percentile(durations, 0.5),
+            'p95_s': _percentile(durations, 0.95),
+            'max_s': durations[-1],
+            'total_s': round(sum(durations), 3),
+        })
+    return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+
+def recent_traces(spans: List[Dict[str, Any]], limit: int = 10, prefix: str = 'publish.') -> List[Dict[str, Any]]:
+    """Последние корневые span (по умолчанию - публикации целиком) с их вложенными этапами"""
+    children: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in spans:
+        children.setdefault(entry['trace_id'], []).append(entry)
+    roots = [entry for entry in spans if entry.get('parent_id') is None and entry['stage'].startswith(prefix)]
+    return [{**root, 'children': [entry for entry in children[root['trace_id']] if entry is not root]}
+            for root in roots[-limit:][::-1]]
+
+
+def since_hours(hours: float) -> datetime:
+    return datetime.now() - timedelta(hours=hours)
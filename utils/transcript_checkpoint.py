@@ -0,0 +1,81 @@
+﻿import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+CHECKPOINT_DIR = "cache/transcripts"
+
+# Незавершенные транскрипции старше этого срока уже никто не продолжит
+CHECKPOINT_RETENTION_DAYS = 14
+
+
+class TranscriptCheckpoint:
+    """
+    Готовые сегменты транскрипции на диске: одна строка JSONL на сегмент, дописывается
+    сразу после распознавания. Файл определяется отпечатком аудио и параметрами
+    транскрипции - другая модель или другая нарезка начинают с нуля
+    """
+
+    def __init__(self, fingerprint: str, params: Dict[str, Any], directory: str = CHECKPOINT_DIR):
+        params_key = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        self.path = os.path.join(directory, f"{fingerprint[:32]}-{params_key}.jsonl")
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Сегменты, записанные прошлым запуском, по порядку и без пропусков"""
+        segments = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        segment = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Процесс упал посреди записи строки - все до нее годится
+                        break
+                    if segment.get('index') != len(segments):
+                        break
+                    segments.append(segment)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"Ошибка чтения чекпоинта {self.path}: {e}")
+            return []
+
+        # Обрезаем битый хвост, чтобы следующие сегменты дописывались после целых строк
+        if segments:
+            self._rewrite(segments)
+        return segments
+
+    def _rewrite(self, segments: List[Dict[str, Any]]):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for segment in segments:
+                f.write(json.dumps(segment, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def append(self, segment: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(segment, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self):
+        """Транскрипция завершена - продолжать нечего"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_checkpoints(max_age_days: int = CHECKPOINT_RETENTION_DAYS, directory: str = CHECKPOINT_DIR):
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - max_age_days * 24 * 3600
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass